@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Benchmark ścieżek krytycznych parsowania i analizy Inwestor Pro.
+
+Mierzy funkcje `decode_html`, `clean_and_extract_text`, `find_subpage_links`,
+`extract_key_phrases`, `extract_facts`, `analyze_subpages_content`,
+`combine_content_from_pages` oraz `build_ranked_prompt` na korpusie
+z `benchmarks/corpus.py`.
+Wyniki są zapisywane do `benchmarks/results/<commit>.json`, dzięki czemu
+można je porównać z poprzednim commitem (`--compare`).
+
+Przykład:
+    python benchmarks/bench_hot_paths.py --repeat 5
+    python benchmarks/bench_hot_paths.py --compare benchmarks/results/abc1234.json
+
+Autor: Inwestor Pro Team
+Wersja: 1.0.0
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import inwestor_pro  # noqa: E402
+from corpus import BASE_URL, load_corpus  # noqa: E402
+
+
+def _time_call(fn, repeat: int) -> dict:
+    """
+    Wykonuje funkcję `repeat` razy i zwraca statystyki czasu.
+
+    Args:
+        fn: Funkcja bez argumentów
+        repeat: Liczba powtórzeń
+
+    Returns:
+        dict: Mediana, minimum i pojedyncze pomiary w milisekundach
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "runs_ms": [round(t, 3) for t in timings],
+    }
+
+
+def build_cases(corpus: dict) -> list:
+    """
+    Buduje listę przypadków (nazwa, funkcja) dla całego korpusu.
+
+    Teksty dla funkcji analitycznych są wyliczane raz, poza pomiarem,
+    aby mierzyć wyłącznie daną funkcję.
+
+    Args:
+        corpus: Korpus {nazwa: html}
+
+    Returns:
+        list: Lista krotek (nazwa_przypadku, funkcja_bez_argumentów)
+    """
+    texts = {
+        name: inwestor_pro.clean_and_extract_text(html, BASE_URL)
+        for name, html in corpus.items()
+    }
+    cases = []
+    for name, html in corpus.items():
+        raw = html.encode("utf-8")
+        cases.append(
+            (
+                f"decode_html/{name}",
+                lambda r=raw: inwestor_pro.decode_html(r, "text/html"),
+            )
+        )
+        cases.append(
+            (
+                f"clean_and_extract_text/{name}",
+                lambda h=html: inwestor_pro.clean_and_extract_text(h, BASE_URL),
+            )
+        )
+        cases.append(
+            (
+                f"find_subpage_links/{name}",
+                lambda h=html: inwestor_pro.find_subpage_links(h, BASE_URL, 5),
+            )
+        )
+        cases.append(
+            (
+                f"extract_key_phrases/{name}",
+                lambda t=texts[name]: inwestor_pro.extract_key_phrases(t),
+            )
+        )
+        cases.append(
+            (
+                f"extract_facts/{name}",
+                lambda t=texts[name]: inwestor_pro.extract_facts(t),
+            )
+        )
+
+    all_texts = list(texts.values())
+    main_text, subpages = all_texts[0], all_texts[1:]
+    cases.append(
+        (
+            "analyze_subpages_content/corpus",
+            lambda: inwestor_pro.analyze_subpages_content(all_texts),
+        )
+    )
+    cases.append(
+        (
+            "combine_content_from_pages/corpus",
+            lambda: inwestor_pro.combine_content_from_pages(
+                main_text, subpages, BASE_URL
+            ),
+        )
+    )
+    pages = list(texts.items())
+    cases.append(
+        (
+            "build_ranked_prompt/corpus",
+            lambda: inwestor_pro.build_ranked_prompt(pages, BASE_URL, 4),
+        )
+    )
+    return cases
+
+
+def current_commit() -> str:
+    """Zwraca skrócony hash bieżącego commitu lub "worktree"."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return result.stdout.strip() or "worktree"
+    except (OSError, subprocess.CalledProcessError):
+        return "worktree"
+
+
+def run_benchmarks(corpus: dict, repeat: int = 5, only: str = "") -> dict:
+    """
+    Uruchamia wszystkie przypadki benchmarku.
+
+    Args:
+        corpus: Korpus {nazwa: html}
+        repeat: Liczba powtórzeń każdego przypadku
+        only: Uruchom tylko przypadki zawierające ten napis
+
+    Returns:
+        dict: Raport z metadanymi i wynikami {przypadek: statystyki}
+    """
+    results = {}
+    for name, fn in build_cases(corpus):
+        if only and only not in name:
+            continue
+        fn()  # rozgrzewka
+        results[name] = _time_call(fn, repeat)
+    return {
+        "commit": current_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "repeat": repeat,
+        "corpus_bytes": {
+            name: len(html.encode("utf-8")) for name, html in corpus.items()
+        },
+        "results": results,
+    }
+
+
+def compare_reports(baseline: dict, report: dict) -> list:
+    """
+    Porównuje mediany dwóch raportów.
+
+    Args:
+        baseline: Raport odniesienia (np. z poprzedniego commitu)
+        report: Bieżący raport
+
+    Returns:
+        list: Lista krotek (przypadek, mediana_przed, mediana_po, zmiana_%)
+    """
+    rows = []
+    for name, current in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        change = (current["median_ms"] / max(before["median_ms"], 1e-9) - 1) * 100
+        rows.append((name, before["median_ms"], current["median_ms"], change))
+    return rows
+
+
+def main() -> int:
+    """
+    Uruchamia benchmark, zapisuje wyniki i opcjonalnie porównuje je
+    z raportem odniesienia.
+
+    Returns:
+        int: 1 gdy któryś przypadek zwolnił ponad --max-regression, 0 wpp.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark ścieżek krytycznych")
+    parser.add_argument("--repeat", type=int, default=5, help="Liczba powtórzeń")
+    parser.add_argument("--corpus-dir", default="", help="Katalog z plikami HTML")
+    parser.add_argument("--only", default="", help="Filtr nazw przypadków")
+    parser.add_argument("--json", help="Ścieżka raportu (domyślnie: results/)")
+    parser.add_argument("--compare", help="Raport JSON do porównania")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=None,
+        help="Dopuszczalne spowolnienie mediany w procentach",
+    )
+    args = parser.parse_args()
+
+    report = run_benchmarks(load_corpus(args.corpus_dir), args.repeat, args.only)
+
+    print(f"{'przypadek':<48}{'mediana ms':>12}{'min ms':>10}")
+    for name, stats in report["results"].items():
+        print(f"{name:<48}{stats['median_ms']:>12.2f}{stats['min_ms']:>10.2f}")
+
+    path = Path(args.json or RESULTS_DIR / f"{report['commit']}.json")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wyniki zapisane do pliku: {path}")
+
+    if not args.compare:
+        return 0
+
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+    print(f"\nPorownanie z {baseline.get('commit', args.compare)}:")
+    regressions = []
+    for name, before, after, change in compare_reports(baseline, report):
+        print(f"{name:<48}{before:>10.2f} -> {after:>10.2f}  {change:+7.1f}%")
+        if args.max_regression is not None and change > args.max_regression:
+            regressions.append(name)
+
+    if regressions:
+        print("REGRESJA: " + ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Benchmark całego przebiegu `main()` Inwestor Pro offline (kaseta --replay).
+
+Przebieg jest odtwarzany z kasety nagrań (`--record` / `--replay`), więc
+wynik nie zależy od sieci ani od czasu odpowiedzi API OpenAI. Bez
+`--cassette` kaseta jest nagrywana z korpusu `benchmarks/corpus.py`,
+serwowanego przez lokalny serwer HTTP, z syntetyczną odpowiedzią modelu.
+Opóźnienia odpowiedzi można pominąć (`--latency 0`), odtworzyć z nagrania
+(`--latency recorded`) lub ustawić na stałą wartość w sekundach.
+
+Przykład:
+    python benchmarks/bench_pipeline.py --repeat 5
+    python inwestor_pro.py --url https://startup.pl --record kaseta
+    python benchmarks/bench_pipeline.py --cassette kaseta \\
+        --url https://startup.pl --latency recorded
+
+Autor: Inwestor Pro Team
+Wersja: 1.0.0
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import inwestor_pro  # noqa: E402
+from bench_hot_paths import current_commit  # noqa: E402
+from corpus import SECTIONS, load_corpus  # noqa: E402
+
+# Strony korpusu serwowane jako podstrony (po kolei dla SECTIONS)
+SUBPAGE_PAGES = ("huge_catalogue", "nested_builder", "link_farm")
+
+
+def serve_corpus(corpus: dict) -> tuple:
+    """
+    Uruchamia lokalny serwer HTTP z korpusem jako stroną firmy.
+
+    Strona główna to `small_landing`, a podstrony z menu (SECTIONS) to
+    kolejno strony SUBPAGE_PAGES.
+
+    Args:
+        corpus: Korpus {nazwa: html}
+
+    Returns:
+        tuple: (serwer, bazowy URL)
+    """
+    pages = {"/": corpus["small_landing"]}
+    for i, section in enumerate(SECTIONS):
+        pages[f"/{section}"] = corpus[SUBPAGE_PAGES[i % len(SUBPAGE_PAGES)]]
+    encoded = {path: html.encode("utf-8") for path, html in pages.items()}
+
+    class CorpusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):  # noqa: N802
+            body = encoded.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CorpusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class SyntheticClient:
+    """Klient udający API OpenAI: stała broszura i stałe zużycie tokenów."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @staticmethod
+    def create(**request) -> SimpleNamespace:
+        brochure = "\n\n".join(
+            f"## {name}\n\nSyntetyczna tresc sekcji {name}."
+            for name in inwestor_pro.BROCHURE_SECTIONS
+        )
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=brochure))],
+            usage=SimpleNamespace(
+                prompt_tokens=sum(len(m["content"]) for m in request["messages"]) // 4,
+                completion_tokens=len(brochure) // 4,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=0),
+            ),
+        )
+
+
+def run_main(argv: list) -> None:
+    """Wykonuje main() z podanymi argumentami, bez wypisywania postępu."""
+    with patch.object(sys, "argv", ["inwestor_pro.py", *argv]):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            code = inwestor_pro.main()
+    if code != 0:
+        raise RuntimeError(f"main() zakonczone kodem {code}:\n{output.getvalue()}")
+
+
+def record_corpus_cassette(root: Path, corpus: dict) -> str:
+    """
+    Nagrywa kasetę przebiegu main() dla korpusu serwowanego lokalnie.
+
+    Nagranie przechodzi przez main() z tymi samymi ustawieniami co
+    odtworzenie, więc prompt (i klucz nagrania LLM) jest identyczny.
+
+    Args:
+        root: Katalog kasety
+        corpus: Korpus {nazwa: html}
+
+    Returns:
+        str: URL strony, dla którego nagrano kasetę
+    """
+    server, url = serve_corpus(corpus)
+    try:
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "bench"}):
+            with patch.object(
+                inwestor_pro, "create_openai_client", lambda key: SyntheticClient()
+            ):
+                run_main(["--url", url, "--record", str(root)])
+    finally:
+        server.shutdown()
+        server.server_close()
+    return url
+
+
+def replay_main(url: str, cassette: Path, latency: str) -> None:
+    """Wykonuje main() dla URL z odpowiedziami odtwarzanymi z kasety."""
+    run_main(["--url", url, "--replay", str(cassette), "--replay-latency", latency])
+
+
+def run_benchmark(url: str, cassette: Path, latency: str, repeat: int) -> dict:
+    """
+    Mierzy czas main() odtwarzanego z kasety.
+
+    Args:
+        url: URL nagranej strony
+        cassette: Katalog kasety
+        latency: Opóźnienie odtwarzania (--replay-latency)
+        repeat: Liczba powtórzeń
+
+    Returns:
+        dict: Raport z metadanymi i wynikiem {przypadek: statystyki}
+    """
+    replay_main(url, cassette, latency)  # rozgrzewka
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        replay_main(url, cassette, latency)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "commit": current_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "repeat": repeat,
+        "results": {
+            f"main_replay/latency={latency}": {
+                "median_ms": round(statistics.median(timings), 3),
+                "min_ms": round(min(timings), 3),
+                "runs_ms": [round(t, 3) for t in timings],
+            }
+        },
+    }
+
+
+def main() -> int:
+    """Nagrywa (lub wczytuje) kasetę i mierzy odtwarzany przebieg main()."""
+    parser = argparse.ArgumentParser(description="Benchmark przebiegu z kasety")
+    parser.add_argument("--repeat", type=int, default=5, help="Liczba powtórzeń")
+    parser.add_argument("--cassette", help="Kaseta nagrana przez --record")
+    parser.add_argument("--url", help="URL nagrany w kasecie (z --cassette)")
+    parser.add_argument(
+        "--latency",
+        default="0",
+        help="Opóźnienie odtwarzania: recorded lub sekundy (domyślnie: 0)",
+    )
+    parser.add_argument("--corpus-dir", default="", help="Katalog z plikami HTML")
+    parser.add_argument("--json", help="Ścieżka raportu JSON")
+    args = parser.parse_args()
+
+    if bool(args.cassette) != bool(args.url):
+        parser.error("--cassette i --url podaje sie razem")
+
+    recorded = Path(args.cassette).resolve() if args.cassette else None
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Broszury i stan przebiegów trafiają do katalogu tymczasowego
+        os.chdir(work_dir)
+        try:
+            if recorded:
+                cassette, url = recorded, args.url
+            else:
+                cassette = Path(work_dir) / "kaseta"
+                url = record_corpus_cassette(cassette, load_corpus(args.corpus_dir))
+            report = run_benchmark(url, cassette, args.latency, args.repeat)
+        finally:
+            os.chdir(old_cwd)
+
+    print(f"{'przypadek':<48}{'mediana ms':>12}{'min ms':>10}")
+    for name, stats in report["results"].items():
+        print(f"{name:<48}{stats['median_ms']:>12.2f}{stats['min_ms']:>10.2f}")
+
+    if args.json:
+        path = Path(args.json)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Wyniki zapisane do pliku: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
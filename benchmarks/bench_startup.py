@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Benchmark czasu zimnego startu Inwestor Pro.
+
+Mierzy czas importu modułu (na podstawie `python -X importtime`) oraz czas
+wykonania `inwestor_pro.py --help` w świeżych procesach. Kończy się kodem 1,
+gdy mediana przekroczy budżet lub gdy przy starcie ładowane są ciężkie
+zależności, które powinny być importowane leniwie.
+
+Przykład:
+    python benchmarks/bench_startup.py --runs 7 --json bench_startup.json
+
+Autor: Inwestor Pro Team
+Wersja: 1.0.0
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Moduły, które nie mogą być importowane przy starcie aplikacji
+LAZY_MODULES = ("openai", "requests", "bs4", "dotenv")
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Parsuje wyjście `python -X importtime`.
+
+    Args:
+        stderr: Standardowe wyjście błędów procesu
+
+    Returns:
+        list: Lista słowników {"module", "self_us", "cumulative_us", "depth"}
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:") :].split("|")
+            entries.append(
+                {
+                    "module": name.strip(),
+                    "self_us": int(self_us),
+                    "cumulative_us": int(cumulative_us),
+                    # Wcięcie nazwy modułu oznacza głębokość importu
+                    "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                }
+            )
+        except ValueError:
+            continue
+    return entries
+
+
+def measure_import(runs: int) -> dict:
+    """
+    Mierzy czas importu inwestor_pro w świeżych procesach.
+
+    Args:
+        runs: Liczba powtórzeń
+
+    Returns:
+        dict: Mediana czasu importu, najcięższe moduły i moduły leniwe
+            załadowane przy starcie
+    """
+    totals = []
+    entries = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import inwestor_pro"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        entries = parse_importtime(result.stderr)
+        own = [e for e in entries if e["module"] == "inwestor_pro"]
+        totals.append(own[-1]["cumulative_us"] / 1000 if own else 0.0)
+
+    loaded = {e["module"].split(".")[0] for e in entries}
+    top_level = [e for e in entries if e["depth"] == 0]
+    heaviest = sorted(top_level, key=lambda e: e["cumulative_us"], reverse=True)
+    return {
+        "median_ms": statistics.median(totals),
+        "runs_ms": totals,
+        "heaviest": heaviest[:10],
+        "lazy_modules_loaded": sorted(loaded.intersection(LAZY_MODULES)),
+    }
+
+
+def measure_help(runs: int) -> dict:
+    """
+    Mierzy czas wykonania `inwestor_pro.py --help` (start interpretera
+    + import + argparse).
+
+    Args:
+        runs: Liczba powtórzeń
+
+    Returns:
+        dict: Mediana i pojedyncze pomiary w milisekundach
+    """
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "inwestor_pro.py", "--help"],
+            cwd=ROOT,
+            capture_output=True,
+            check=True,
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": statistics.median(timings), "runs_ms": timings}
+
+
+def main() -> int:
+    """
+    Uruchamia benchmark i porównuje wynik z budżetem.
+
+    Returns:
+        int: 0 gdy budżet został dotrzymany, 1 w przeciwnym razie
+    """
+    parser = argparse.ArgumentParser(description="Benchmark zimnego startu")
+    parser.add_argument("--runs", type=int, default=5, help="Liczba powtórzeń")
+    parser.add_argument(
+        "--import-budget-ms",
+        type=float,
+        default=100.0,
+        help="Budżet mediany czasu importu inwestor_pro (domyślnie: 100 ms)",
+    )
+    parser.add_argument(
+        "--help-budget-ms",
+        type=float,
+        default=400.0,
+        help="Budżet mediany czasu `--help` (domyślnie: 400 ms)",
+    )
+    parser.add_argument("--json", help="Zapisz raport do pliku JSON")
+    args = parser.parse_args()
+
+    import_report = measure_import(args.runs)
+    help_report = measure_help(args.runs)
+    report = {
+        "python": sys.version.split()[0],
+        "import": import_report,
+        "help": help_report,
+        "budget": {
+            "import_ms": args.import_budget_ms,
+            "help_ms": args.help_budget_ms,
+        },
+    }
+
+    print(f"Import inwestor_pro: {import_report['median_ms']:.1f} ms (mediana)")
+    print(f"inwestor_pro.py --help: {help_report['median_ms']:.1f} ms (mediana)")
+    print("Najciezsze importy:")
+    for entry in import_report["heaviest"][:5]:
+        print(f"  {entry['cumulative_us'] / 1000:8.1f} ms  {entry['module']}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    failures = []
+    if import_report["lazy_modules_loaded"]:
+        failures.append(
+            "moduly ladowane przy starcie: "
+            + ", ".join(import_report["lazy_modules_loaded"])
+        )
+    if import_report["median_ms"] > args.import_budget_ms:
+        failures.append(
+            f"import {import_report['median_ms']:.1f} ms > "
+            f"{args.import_budget_ms:.1f} ms"
+        )
+    if help_report["median_ms"] > args.help_budget_ms:
+        failures.append(
+            f"--help {help_report['median_ms']:.1f} ms > "
+            f"{args.help_budget_ms:.1f} ms"
+        )
+
+    if failures:
+        print("REGRESJA: " + "; ".join(failures))
+        return 1
+    print("Budzet czasu startu dotrzymany.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
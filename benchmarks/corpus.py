@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Generator korpusu stron do benchmarków Inwestor Pro.
+
+Korpus jest generowany deterministycznie (stałe ziarno), więc wyniki
+z różnych commitów dotyczą dokładnie tych samych danych. Zawiera typowe
+przypadki spotykane na stronach firm:
+
+- small_landing: krótka strona docelowa startupu,
+- huge_catalogue: bardzo długi katalog produktów z opisami i cenami,
+- nested_builder: głęboko zagnieżdżony markup z kreatorów stron,
+- link_farm: strona z tysiącami linków (mapa strony, stopka, menu).
+
+Przykład:
+    python benchmarks/corpus.py --write benchmarks/corpus
+
+Autor: Inwestor Pro Team
+Wersja: 1.0.0
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+
+BASE_URL = "https://benchmark-startup.pl"
+SEED = 20251001
+
+WORDS = (
+    "firma platforma klienci inwestycja rozwiązanie technologia rynek zespół "
+    "przychody wzrost produkt usługa innowacja dane analiza chmura sprzedaż "
+    "partnerzy finansowanie strategia skalowanie automatyzacja bezpieczeństwo "
+    "integracja wdrożenie model subskrypcja marża eksport doświadczenie"
+).split()
+
+SECTIONS = ("o-nas", "zespol", "oferta", "cennik", "kariera", "blog", "kontakt")
+
+
+def _sentence(rng: random.Random, length: int = 12) -> str:
+    """Zwraca zdanie złożone z losowych słów słownika."""
+    words = [rng.choice(WORDS) for _ in range(length)]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random, sentences: int = 4) -> str:
+    """Zwraca akapit złożony z kilku zdań."""
+    return " ".join(_sentence(rng, rng.randint(8, 16)) for _ in range(sentences))
+
+
+def _page(title: str, body: str) -> str:
+    """Składa kompletny dokument HTML z nagłówkiem, skryptami i stopką."""
+    return f"""<!DOCTYPE html>
+<html lang="pl">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>body {{ font-family: sans-serif; }} .hero {{ padding: 4rem; }}</style>
+<script>window.dataLayer = window.dataLayer || []; function gtag(){{}}</script>
+</head>
+<body>
+<nav>{"".join(f'<a href="/{s}">{s}</a>' for s in SECTIONS)}</nav>
+{body}
+<footer><p>© Benchmark Startup</p><a href="/polityka">Polityka</a></footer>
+</body>
+</html>
+"""
+
+
+def small_landing(rng: random.Random) -> str:
+    """Krótka strona docelowa (kilka sekcji, kilkanaście linków)."""
+    sections = "".join(
+        f'<section class="hero"><h2>{_sentence(rng, 4)}</h2>'
+        f"<p>{_paragraph(rng)}</p>"
+        f'<a href="/{rng.choice(SECTIONS)}">Dowiedz się więcej</a></section>'
+        for _ in range(5)
+    )
+    body = f"<main><h1>Benchmark Startup</h1>{sections}</main>"
+    return _page("Benchmark Startup", body)
+
+
+def huge_catalogue(rng: random.Random, products: int = 3000) -> str:
+    """Długi katalog produktów (ponad 1 MB HTML)."""
+    items = "".join(
+        f'<div class="product"><h3>Produkt {i}</h3>'
+        f"<p>{_paragraph(rng, 3)}</p>"
+        f'<span class="price">{rng.randint(10, 99999)} PLN</span>'
+        f'<a href="/produkty/{i}">Szczegóły</a></div>'
+        for i in range(products)
+    )
+    return _page("Katalog", f"<main><h1>Katalog produktów</h1>{items}</main>")
+
+
+def nested_builder(rng: random.Random, depth: int = 60, blocks: int = 120) -> str:
+    """Głęboko zagnieżdżony markup typowy dla kreatorów stron."""
+    parts = []
+    for i in range(blocks):
+        opening = "".join(
+            f'<div class="elementor-col-{d} wrap-{i}">' for d in range(depth)
+        )
+        closing = "</div>" * depth
+        parts.append(f"{opening}<span>{_sentence(rng)}</span>{closing}")
+    return _page("Kreator", f"<main>{''.join(parts)}</main>")
+
+
+def link_farm(rng: random.Random, links: int = 5000) -> str:
+    """Strona z tysiącami linków wewnętrznych i zewnętrznych."""
+    anchors = []
+    for i in range(links):
+        kind = i % 5
+        if kind == 0:
+            href = f"https://zewnetrzny-{i}.com/strona"
+        elif kind == 1:
+            href = f"#sekcja-{i}"
+        elif kind == 2:
+            href = f"/{rng.choice(SECTIONS)}/{i}"
+        elif kind == 3:
+            href = f"{BASE_URL}/blog/wpis-{i}"
+        else:
+            href = f"/pliki/dokument-{i}.pdf"
+        anchors.append(f'<li><a href="{href}">{rng.choice(WORDS)} {i}</a></li>')
+    return _page("Mapa strony", f"<main><ul>{''.join(anchors)}</ul></main>")
+
+
+GENERATORS = {
+    "small_landing": small_landing,
+    "huge_catalogue": huge_catalogue,
+    "nested_builder": nested_builder,
+    "link_farm": link_farm,
+}
+
+
+def build_corpus(seed: int = SEED) -> dict:
+    """
+    Generuje korpus stron.
+
+    Args:
+        seed: Ziarno generatora liczb losowych
+
+    Returns:
+        dict: {nazwa: html}
+    """
+    return {
+        name: generator(random.Random(f"{seed}-{name}"))
+        for name, generator in GENERATORS.items()
+    }
+
+
+def load_corpus(directory: str = "") -> dict:
+    """
+    Wczytuje korpus z katalogu (pliki *.html) lub generuje go w pamięci.
+
+    Args:
+        directory: Katalog z plikami HTML (pusty = generowanie)
+
+    Returns:
+        dict: {nazwa: html}
+    """
+    if not directory:
+        return build_corpus()
+    return {
+        path.stem: path.read_text(encoding="utf-8")
+        for path in sorted(Path(directory).glob("*.html"))
+    }
+
+
+def main() -> int:
+    """Zapisuje wygenerowany korpus do katalogu."""
+    parser = argparse.ArgumentParser(description="Generator korpusu benchmarków")
+    parser.add_argument("--write", required=True, help="Katalog docelowy")
+    args = parser.parse_args()
+
+    target = Path(args.write)
+    target.mkdir(parents=True, exist_ok=True)
+    for name, html in build_corpus().items():
+        (target / f"{name}.html").write_text(html, encoding="utf-8")
+        print(f"{name}.html: {len(html.encode('utf-8')) / 1024:.0f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
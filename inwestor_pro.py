@@ -8,18 +8,66 @@ Wersja: 1.0.0
 """
 
 import argparse
+import codecs
+import csv
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import math
+import mmap
 import os
+import queue
 import re
 import sys
+import threading
+import time
+import unicodedata
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field, replace
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
-from urllib.parse import urljoin, urlparse
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional, Union
+from urllib.parse import unquote, urljoin, urlparse
 
-import openai
-import requests
-from bs4 import BeautifulSoup
-from dotenv import load_dotenv
+# Ciężkie zależności (openai, requests, bs4, dotenv, sqlite3, ...) są
+# importowane leniwie w funkcjach, które ich używają - dzięki temu --help,
+# błędy walidacji i tryby bez sieci startują w kilkadziesiąt milisekund.
+if TYPE_CHECKING:
+    import sqlite3
+
+    import requests
+
+OPENAI_MODEL = "gpt-4o-mini"
+
+# Timeout żądania do API OpenAI w sekundach (domyślna wartość biblioteki)
+LLM_TIMEOUT = 600.0
+
+# Cennik modeli w USD za 1 mln tokenów: (wejście, wejście z cache, wyjście)
+OPENAI_PRICING = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+}
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+)
+
+
+def load_dotenv(*args: Any, **kwargs: Any) -> bool:
+    """
+    Ładuje zmienne środowiskowe z pliku .env (leniwy import python-dotenv).
+
+    Returns:
+        bool: True jeśli ustawiono co najmniej jedną zmienną
+    """
+    from dotenv import load_dotenv as dotenv_load
+
+    return dotenv_load(*args, **kwargs)
 
 
 def load_api_key() -> Optional[str]:
@@ -41,6 +89,44 @@ def load_api_key() -> Optional[str]:
         return None
 
 
+def get_output_path(filename: str) -> Path:
+    """
+    Zwraca ścieżkę pliku broszury w katalogu wyniki/YYYY-MM-DD/.
+
+    Args:
+        filename: Nazwa pliku (z rozszerzeniem .md lub bez)
+
+    Returns:
+        Path: Pełna ścieżka do pliku wynikowego
+    """
+    # Struktura katalogów: wyniki/YYYY-MM-DD/
+    today = datetime.now().strftime("%Y-%m-%d")
+    if not filename.endswith(".md"):
+        filename += ".md"
+    return Path("wyniki") / today / filename
+
+
+def default_output_filename(url: str, include_path: bool = False) -> str:
+    """
+    Tworzy domyślną nazwę pliku broszury na podstawie URL.
+
+    Args:
+        url: URL analizowanej strony
+        include_path: Czy dołączyć ścieżkę URL (rozróżnia strony
+            z tej samej domeny w trybie wsadowym)
+
+    Returns:
+        str: Nazwa pliku bez rozszerzenia, np. broszura_example_com
+    """
+    parsed = urlparse(url)
+    name = f"broszura_{parsed.netloc.replace('.', '_').replace(':', '_')}"
+    if include_path:
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", parsed.path).strip("_")
+        if slug:
+            name += f"_{slug}"
+    return name
+
+
 def save_markdown_file(filename: str, content: str) -> bool:
     """
     Zapisuje broszurę do pliku w strukturze katalogów wyniki/YYYY-MM-DD/.
@@ -53,16 +139,8 @@ def save_markdown_file(filename: str, content: str) -> bool:
         bool: True jeśli zapisano pomyślnie, False w przypadku błędu
     """
     try:
-        # Utwórz strukturę katalogów: wyniki/YYYY-MM-DD/
-        today = datetime.now().strftime("%Y-%m-%d")
-        output_dir = Path("wyniki") / today
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        # Utwórz pełną ścieżkę do pliku
-        if not filename.endswith(".md"):
-            filename += ".md"
-
-        output_path = output_dir / filename
+        output_path = get_output_path(filename)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Zapisz plik
         with open(output_path, "w", encoding="utf-8") as f:
@@ -128,7 +206,7 @@ def analyze_subpages_content(subpages_content: list) -> str:
     Analizuje treść podstron i tworzy podsumowanie kluczowych informacji.
 
     Args:
-        subpages_content: Lista treści z podstron
+        subpages_content: Lista treści z podstron (napisy lub PageRecord)
 
     Returns:
         str: Podsumowanie analizy podstron
@@ -138,11 +216,10 @@ def analyze_subpages_content(subpages_content: list) -> str:
 
     analysis = "=== ANALIZA PODSTRON ===\n\n"
 
-    for i, content in enumerate(subpages_content, 1):
-        if content:
-            # Podstawowe statystyki
-            word_count = len(content.split())
-            char_count = len(content)
+    for i, page in enumerate(subpages_content, 1):
+        if page:
+            # Podstawowe statystyki (PageRecord ma je policzone wcześniej)
+            content, char_count, word_count = _page_stats(page)
 
             analysis += f"**Podstrona {i}:**\n"
             analysis += f"- Długość treści: {char_count} znaków, "
@@ -159,6 +236,23 @@ def analyze_subpages_content(subpages_content: list) -> str:
     return analysis
 
 
+def _page_stats(page: Any) -> tuple:
+    """
+    Zwraca (tekst, liczba znaków, liczba słów) dla napisu lub PageRecord.
+
+    Dla PageRecord statystyki są odczytywane z rekordu, bez ponownego
+    skanowania tekstu.
+    """
+    if isinstance(page, PageRecord):
+        return page.text, page.char_count, page.word_count
+    return page, len(page), len(page.split())
+
+
+def _page_text(page: Any) -> str:
+    """Zwraca tekst napisu lub PageRecord (wczytując go leniwie z dysku)."""
+    return page.text if isinstance(page, PageRecord) else page
+
+
 def extract_key_phrases(text: str, max_phrases: int = 10) -> list:
     """
     Wyodrębnia kluczowe frazy z tekstu.
@@ -247,6 +341,439 @@ def extract_key_phrases(text: str, max_phrases: int = 10) -> list:
     return [word for word, freq in sorted_words[:max_phrases]]
 
 
+# Wzorce faktów do wstępnej ekstrakcji - kompilowane raz, przy imporcie.
+# Fakty liczbowe (kwoty, procenty, zespół, klienci) są wyszukiwane jednym
+# przebiegiem: wzorzec zaczyna się od klasy znaków [€$\d], co pozwala
+# silnikowi re szybko pomijać tekst bez cyfr. Liczba nie może zaczynać się
+# w środku innej liczby (np. "023 100 klientów" z "W 2023 100 klientów").
+# Dla "firm" dopuszczalne są tylko polskie końcówki (bez "firmware").
+_FACT_NUMBER_TAIL = r"(?:\d{0,2}(?:[ \u00a0.,]\d{3})+|\d*)(?:[.,]\d+)?"
+_FACT_NUMBER = r"\d" + _FACT_NUMBER_TAIL
+_FACT_MULTIPLIER = (
+    r"(?:\s?(?:tys\.|(?i:mln|mld|tys|milion\w*|miliard\w*|million|billion|bn|k|m)"
+    r"\b))?"
+)
+_FACT_CURRENCY = r"(?:PLN|zł(?:otych)?|EUR|euro|USD|(?i:dolar\w*))\b|€"
+_FACT_MONEY = (
+    rf"[€$]\s?{_FACT_NUMBER}{_FACT_MULTIPLIER}"
+    rf"|{_FACT_NUMBER}{_FACT_MULTIPLIER}\s?(?:{_FACT_CURRENCY})"
+)
+
+_FACT_NUMERIC_RE = re.compile(
+    rf"[€$\d](?:(?<=[€$])\s?{_FACT_NUMBER}{_FACT_MULTIPLIER}(?P<money_prefix>)"
+    rf"|(?<=\d)(?<![\d.,]\d){_FACT_NUMBER_TAIL}{_FACT_MULTIPLIER}\+?\s?(?:"
+    rf"(?P<money>{_FACT_CURRENCY})"
+    r"|(?P<percent>%|(?i:proc\.|procent\w*|percent\b))"
+    r"|(?P<headcount>(?i:pracownik\w*|os[óo]b\w*|specjalist\w*|ekspert\w*"
+    r"|in[żz]ynier\w*|programist\w*|employees|people|engineers)\b)"
+    r"|(?P<clients>(?i:klient\w*|u[żz]ytkownik\w*|firm(?:a|y|ie|ę|ą|om|ami|ach)?"
+    r"|customers|clients|users)\b)))"
+)
+_FACT_PATTERNS = (
+    (
+        "funding",
+        re.compile(
+            r"(?i:\b(?:rund\w*\s+(?:finansowania\s+)?(?:pre-seed|seed"
+            r"|seri[ai]\s+[A-E]\b)|pre-seed|seed\s+round|series\s+[A-E]\b"
+            r"|seri[ai]\s+[A-E]\b|(?:pozyska\w*|zebra\w*|raised)\s+(?:\w+\s+){0,3}?"
+            rf"(?:{_FACT_MONEY})))"
+        ),
+    ),
+    # Lata 1980-2049, niebędące częścią dłuższej liczby
+    (
+        "year",
+        re.compile(r"[12](?<![\d.,][12])(?:(?<=1)9[89]|(?<=2)0[0-4])\d(?![\d.,]?\d)"),
+    ),
+    ("nip", re.compile(r"NIP\W{0,3}((?:\d[ -]?){9}\d)\b")),
+    ("krs", re.compile(r"KRS\W{0,3}(\d{10})\b")),
+    ("email", re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}\b")),
+)
+_NUMERIC_KINDS = {"money_prefix": "money"}
+
+FACT_LABELS = {
+    "money": "Kwoty",
+    "percent": "Wartości procentowe",
+    "funding": "Finansowanie",
+    "headcount": "Zespół",
+    "clients": "Klienci i użytkownicy",
+    "year": "Lata",
+    "nip": "NIP",
+    "krs": "KRS",
+    "email": "Kontakt",
+}
+
+_NIP_WEIGHTS = (6, 5, 7, 2, 3, 4, 5, 6, 7)
+
+
+def _valid_nip(digits: str) -> bool:
+    """Sprawdza sumę kontrolną numeru NIP (10 cyfr)."""
+    checksum = sum(int(d) * w for d, w in zip(digits, _NIP_WEIGHTS)) % 11
+    return checksum == int(digits[9])
+
+
+def _iter_facts(text: str) -> Iterator[tuple]:
+    """Zwraca pary (rodzaj, wartość) dla wszystkich faktów w tekście."""
+    for match in _FACT_NUMERIC_RE.finditer(text):
+        kind = _NUMERIC_KINDS.get(match.lastgroup, match.lastgroup)
+        yield kind, " ".join(match.group(0).split())
+    for kind, pattern in _FACT_PATTERNS:
+        if kind == "email" and "@" not in text:
+            continue
+        for match in pattern.finditer(text):
+            if kind == "nip":
+                value = re.sub(r"\D", "", match.group(1))
+                if not _valid_nip(value):
+                    continue
+            elif kind == "krs":
+                value = match.group(1)
+            else:
+                value = " ".join(match.group(0).split())
+            yield kind, value
+
+
+def extract_facts(texts: Union[str, list], max_per_kind: int = 10) -> dict:
+    """
+    Wyodrębnia z tekstu fakty liczbowe i identyfikatory: kwoty (PLN, EUR,
+    USD), wartości procentowe, rundy finansowania, liczebność zespołu,
+    liczbę klientów, lata oraz NIP, KRS i adresy e-mail.
+
+    Args:
+        texts: Tekst lub lista tekstów stron
+        max_per_kind: Maksymalna liczba faktów jednego rodzaju
+
+    Returns:
+        dict: {rodzaj: lista unikalnych wartości w kolejności wystąpienia},
+            rodzaje w kolejności FACT_LABELS
+    """
+    if isinstance(texts, str):
+        texts = [texts]
+
+    found: dict[str, list] = {}
+    seen: set = set()
+    for text in texts:
+        for kind, value in _iter_facts(text or ""):
+            values = found.setdefault(kind, [])
+            key = (kind, value.lower())
+            if len(values) >= max_per_kind or key in seen:
+                continue
+            seen.add(key)
+            values.append(value)
+    return {kind: found[kind] for kind in FACT_LABELS if kind in found}
+
+
+def format_fact_table(facts: dict) -> str:
+    """
+    Formatuje fakty jako zwartą tabelę Markdown.
+
+    Args:
+        facts: Wynik extract_facts
+
+    Returns:
+        str: Tabela faktów lub pusty napis, gdy nie znaleziono faktów
+    """
+    if not facts:
+        return ""
+    rows = [
+        f"| {FACT_LABELS[kind]} | {'; '.join(values)} |"
+        for kind, values in facts.items()
+    ]
+    return (
+        "=== KLUCZOWE FAKTY (wyodrębnione automatycznie) ===\n"
+        "| Kategoria | Wartości |\n|---|---|\n" + "\n".join(rows)
+    )
+
+
+def build_fact_prompt(facts: dict, text: str, excerpt_chars: int) -> str:
+    """
+    Składa treść dla modelu z tabeli faktów i skróconego fragmentu tekstu.
+
+    Args:
+        facts: Wynik extract_facts
+        text: Pełna połączona treść stron
+        excerpt_chars: Długość fragmentu tekstu w znakach
+
+    Returns:
+        str: Tabela faktów i fragment tekstu (pełny tekst, gdy jest krótszy)
+    """
+    table = format_fact_table(facts)
+    excerpt = truncate_text(text, excerpt_chars)
+    if len(excerpt) < len(text):
+        excerpt += (
+            f"\n\n[Tekst skrocony do {excerpt_chars} znakow - dane liczbowe "
+            "znajduja sie w tabeli kluczowych faktow]"
+        )
+    return f"{table}\n\n{excerpt}" if table else excerpt
+
+
+# Profile zapytań dla sekcji broszury - fragmenty tekstu są oceniane
+# względem tych słów (rdzenie polskie i angielskie)
+SECTION_QUERIES = {
+    "Analiza Rynku i Pozycji": (
+        "rynek rynku rynkowy branża branży segment konkurencja konkurencyjny "
+        "lider pozycja trendy popyt market industry competitors leader"
+    ),
+    "Kluczowe Metryki i Dane": (
+        "przychody przychodów wzrost wynik klientów użytkowników sprzedaż "
+        "milionów procent rekord wyniki finansowe revenue growth customers "
+        "users metrics"
+    ),
+    "Model Biznesowy": (
+        "model biznesowy oferta cennik ceny subskrypcja abonament licencja "
+        "usługi produkt sprzedaż klient partnerzy pricing subscription "
+        "business offer"
+    ),
+    "Zespół i Kompetencje": (
+        "zespół zespołu założyciel założyciele prezes zarząd doświadczenie "
+        "eksperci specjaliści kompetencje kariera team founder ceo cto "
+        "experience"
+    ),
+    "Ryzyka i Wyzwania": (
+        "ryzyko ryzyka wyzwania regulacje przepisy zależność konkurencja "
+        "bezpieczeństwo niepewność koszty risk risks challenges regulation"
+    ),
+}
+
+PASSAGE_CHARS = 500
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+# Rdzeń słowa to jego pierwsze 6 liter - prosta obsługa polskiej odmiany
+_TERM_RE = re.compile(r"([^\W\d_]{3,6})[^\W\d_]*")
+
+
+def _terms(text: str) -> list:
+    """Zwraca rdzenie słów tekstu (słowa co najmniej 3-literowe)."""
+    return _TERM_RE.findall(text.lower())
+
+
+def chunk_passages(pages: list, max_chars: int = PASSAGE_CHARS) -> list:
+    """
+    Dzieli teksty stron na fragmenty złożone z całych zdań.
+
+    Args:
+        pages: Lista krotek (url, tekst)
+        max_chars: Docelowa maksymalna długość fragmentu
+
+    Returns:
+        list: Lista krotek (url, fragment) w kolejności stron
+    """
+    passages = []
+    for url, text in pages:
+        current = ""
+        for sentence in _SENTENCE_END_RE.split(text or ""):
+            if current and len(current) + len(sentence) >= max_chars:
+                passages.append((url, current))
+                current = ""
+            current = f"{current} {sentence}" if current else sentence
+        if current:
+            passages.append((url, current))
+    return passages
+
+
+class PassageIndex:
+    """
+    Indeks TF-IDF fragmentów tekstu z wyszukiwaniem podobieństwem
+    kosinusowym.
+
+    Z zainstalowanym NumPy wagi są trzymane jako rzadka macierz (tablice
+    wierszy, kolumn i wartości), a wszystkie zapytania są oceniane jednym
+    zwektoryzowanym przebiegiem. Bez NumPy używane są słowniki Pythona
+    (ten sam wynik, wolniej przy setkach stron).
+    """
+
+    def __init__(self, passages: list):
+        self.size = len(passages)
+        self.vocabulary: dict[str, int] = {}
+        vocabulary = self.vocabulary
+        counts = [
+            {
+                vocabulary.setdefault(term, len(vocabulary)): n
+                for term, n in Counter(_terms(text)).items()
+            }
+            for text in passages
+        ]
+
+        np = _numpy_module()
+        self._np = np
+        if np is not None:
+            self._build_numpy(np, counts)
+        else:
+            self._build_python(counts)
+
+    def _build_numpy(self, np: Any, counts: list) -> None:
+        lengths = np.fromiter((len(c) for c in counts), dtype=np.int64, count=self.size)
+        self._rows = np.repeat(np.arange(self.size), lengths)
+        self._cols = np.fromiter(
+            (column for c in counts for column in c), dtype=np.int64
+        )
+        tf = np.fromiter((n for c in counts for n in c.values()), dtype=np.float64)
+        df = np.bincount(self._cols, minlength=len(self.vocabulary))
+        self._idf = np.log((1 + self.size) / (1 + df)) + 1.0
+        weights = (1.0 + np.log(tf)) * self._idf[self._cols]
+        norms = np.sqrt(
+            np.bincount(self._rows, weights=weights**2, minlength=self.size)
+        )
+        self._weights = weights / np.where(norms > 0, norms, 1.0)[self._rows]
+
+    def _build_python(self, counts: list) -> None:
+        df: dict[int, int] = {}
+        for passage_counts in counts:
+            for column in passage_counts:
+                df[column] = df.get(column, 0) + 1
+        self._idf = {
+            column: math.log((1 + self.size) / (1 + n)) + 1.0
+            for column, n in df.items()
+        }
+        self._vectors = []
+        for passage_counts in counts:
+            vector = {
+                column: (1.0 + math.log(n)) * self._idf[column]
+                for column, n in passage_counts.items()
+            }
+            norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+            self._vectors.append({c: w / norm for c, w in vector.items()})
+
+    def _query_vector(self, text: str) -> dict:
+        """Wektor TF-IDF zapytania (tylko słowa ze słownika), znormalizowany."""
+        counts: dict[int, int] = {}
+        for term in _terms(text):
+            column = self.vocabulary.get(term)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        vector = {
+            column: (1.0 + math.log(n)) * float(self._idf[column])
+            for column, n in counts.items()
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {column: w / norm for column, w in vector.items()}
+
+    def scores(self, queries: list) -> Any:
+        """
+        Ocenia wszystkie fragmenty względem wszystkich zapytań naraz.
+
+        Args:
+            queries: Lista tekstów zapytań
+
+        Returns:
+            Macierz podobieństw kosinusowych [zapytanie][fragment]
+            (numpy.ndarray z NumPy, w przeciwnym razie lista list)
+        """
+        vectors = [self._query_vector(query) for query in queries]
+        if self._np is None:
+            return [
+                [
+                    sum(w * vector.get(c, 0.0) for c, w in passage.items())
+                    for passage in self._vectors
+                ]
+                for vector in vectors
+            ]
+
+        np = self._np
+        query_matrix = np.zeros((len(queries), len(self.vocabulary)))
+        for i, vector in enumerate(vectors):
+            if vector:
+                query_matrix[i, list(vector)] = list(vector.values())
+        # Iloczyny wag fragmentów i zapytań dla niezerowych pozycji macierzy
+        # rzadkiej, zsumowane jednym bincount dla wszystkich zapytań
+        products = self._weights * query_matrix[:, self._cols]
+        offsets = np.arange(len(queries))[:, None] * self.size
+        return np.bincount(
+            (self._rows + offsets).ravel(),
+            weights=products.ravel(),
+            minlength=len(queries) * self.size,
+        ).reshape(len(queries), self.size)
+
+    def top(self, queries: list, k: int) -> list:
+        """
+        Zwraca indeksy k najtrafniejszych fragmentów dla każdego zapytania.
+
+        Args:
+            queries: Lista tekstów zapytań
+            k: Liczba fragmentów na zapytanie
+
+        Returns:
+            list: Dla każdego zapytania lista par (indeks, podobieństwo)
+                malejąco wg trafności, bez fragmentów o zerowym podobieństwie
+        """
+        scores = self.scores(queries)
+        if self._np is not None:
+            order = self._np.argsort(-scores, axis=1, kind="stable")[:, :k]
+            return [
+                [(int(i), float(scores[q, i])) for i in row if scores[q, i] > 0]
+                for q, row in enumerate(order)
+            ]
+        ranked = []
+        for row in scores:
+            order = sorted(range(self.size), key=lambda i: (-row[i], i))
+            ranked.append([(i, row[i]) for i in order[:k] if row[i] > 0])
+        return ranked
+
+
+def build_ranked_prompt(
+    pages: list,
+    base_url: str,
+    top_k: int,
+    queries: Optional[dict] = None,
+) -> str:
+    """
+    Składa treść dla modelu z najtrafniejszych fragmentów dla każdej
+    sekcji broszury zamiast pełnej treści wszystkich stron.
+
+    Args:
+        pages: Lista krotek (url, tekst); pierwsza to strona główna
+        base_url: Bazowy URL
+        top_k: Liczba fragmentów na sekcję
+        queries: Profile zapytań {sekcja: słowa} (domyślnie SECTION_QUERIES)
+
+    Returns:
+        str: Wprowadzenie ze strony głównej i fragmenty pogrupowane wg sekcji
+    """
+    queries = queries or SECTION_QUERIES
+    passages = chunk_passages(pages)
+    if not passages:
+        return ""
+
+    index = PassageIndex([text for _, text in passages])
+    ranked = index.top(list(queries.values()), top_k * len(queries) + 1)
+
+    # Pierwszy fragment strony głównej zwykle przedstawia firmę. Pozostałe
+    # są przydzielane zachłannie od najwyższego podobieństwa, więc fragment
+    # trafia do sekcji, do której pasuje najbardziej
+    used = {0}
+    selected: list = [[] for _ in queries]
+    candidates = sorted(
+        (-score, section, i)
+        for section, pairs in enumerate(ranked)
+        for i, score in pairs
+    )
+    for _, section, i in candidates:
+        if i not in used and len(selected[section]) < top_k:
+            used.add(i)
+            selected[section].append(i)
+
+    content = f"""=== ANALIZA STRONY INTERNETOWEJ ===
+URL GŁÓWNEJ STRONY: {base_url}
+DATA ANALIZY: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+
+=== WPROWADZENIE (początek strony głównej) ===
+{passages[0][1]}
+
+"""
+    for section, indices in zip(queries, selected):
+        if not indices:
+            continue
+        content += f"=== FRAGMENTY: {section} ===\n"
+        for i in sorted(indices):
+            url, text = passages[i]
+            content += f"[{url}] {text}\n\n"
+
+    content += (
+        f"=== PODSUMOWANIE STRUKTURY ===\n"
+        f"- Wybrane fragmenty: {len(used)} z {len(passages)} "
+        f"({len(pages)} stron)\n\n"
+    )
+    return content
+
+
 def enhance_brochure_formatting(brochure_content: str) -> str:
     """
     Ulepsza formatowanie broszury dla bardziej profesjonalnego wyglądu.
@@ -284,13 +811,114 @@ def enhance_brochure_formatting(brochure_content: str) -> str:
     return enhanced_content
 
 
-def generate_brochure(text_content: str, api_key: str) -> Optional[str]:
+def create_openai_client(api_key: str) -> Any:
+    """
+    Tworzy klienta OpenAI współdzielonego między wieloma broszurami.
+
+    Args:
+        api_key: Klucz API OpenAI
+
+    Returns:
+        openai.OpenAI: Skonfigurowany klient
+    """
+    import openai
+
+    return openai.OpenAI(api_key=api_key)
+
+
+def estimate_llm_cost(
+    model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0
+) -> Optional[float]:
+    """
+    Szacuje koszt wywołania modelu na podstawie OPENAI_PRICING.
+
+    Args:
+        model: Nazwa modelu
+        prompt_tokens: Liczba tokenów wejściowych (łącznie z cache)
+        completion_tokens: Liczba tokenów wyjściowych
+        cached_tokens: Liczba tokenów wejściowych obsłużonych z cache
+
+    Returns:
+        float: Koszt w USD lub None, jeśli model nie ma cennika
+    """
+    pricing = OPENAI_PRICING.get(model)
+    if pricing is None:
+        return None
+    input_price, cached_price, output_price = pricing
+    cost = (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    )
+    return round(cost / 1_000_000, 8)
+
+
+def _int_attr(obj: Any, name: str) -> int:
+    """Zwraca atrybut liczbowy obiektu lub 0, jeśli go brak."""
+    value = getattr(obj, name, 0)
+    return value if isinstance(value, int) else 0
+
+
+def llm_usage_record(
+    response: Any, model: str, latency: float, prompt_chars: int
+) -> dict:
+    """
+    Tworzy rekord zużycia tokenów na podstawie response.usage.
+
+    Args:
+        response: Odpowiedź chat.completions.create
+        model: Nazwa modelu
+        latency: Czas oczekiwania na odpowiedź w sekundach
+        prompt_chars: Długość przekazanej treści (combined_text) w znakach
+
+    Returns:
+        dict: {"model", "prompt_tokens", "completion_tokens", "cached_tokens",
+            "latency_s", "prompt_chars", "cost_usd", "cached_result"}
+    """
+    usage = getattr(response, "usage", None)
+    prompt_tokens = _int_attr(usage, "prompt_tokens")
+    completion_tokens = _int_attr(usage, "completion_tokens")
+    cached_tokens = _int_attr(
+        getattr(usage, "prompt_tokens_details", None), "cached_tokens"
+    )
+    return {
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cached_tokens": cached_tokens,
+        "latency_s": round(latency, 6),
+        "prompt_chars": prompt_chars,
+        "cost_usd": estimate_llm_cost(
+            model, prompt_tokens, completion_tokens, cached_tokens
+        ),
+        "cached_result": False,
+    }
+
+
+def generate_brochure(
+    text_content: str,
+    api_key: str,
+    client: Any = None,
+    usage: Optional[dict] = None,
+    timeout: float = LLM_TIMEOUT,
+    sections: Optional[list] = None,
+    max_retries: Optional[int] = None,
+) -> Optional[str]:
     """
     Generuje broszurę inwestycyjną używając OpenAI API.
 
     Args:
         text_content: Oczyszczony tekst do analizy
         api_key: Klucz API OpenAI
+        client: Opcjonalny, współdzielony klient OpenAI (tryb wsadowy)
+        usage: Opcjonalny słownik uzupełniany rekordem zużycia tokenów,
+            opóźnienia i kosztu (llm_usage_record)
+        timeout: Timeout żądania w sekundach (skracany przez --site-deadline)
+        sections: Wygeneruj tylko te sekcje (BROCHURE_SECTIONS), bez
+            nagłówka i stopki broszury (--incremental)
+        max_retries: Liczba ponowień żądania przez klienta (None = domyślna
+            klienta OpenAI; 0 przy --site-deadline, by ponowienia po timeout
+            nie przekroczyły limitu strony)
 
     Returns:
         str: Wygenerowana broszura w formacie Markdown lub None w przypadku błędu
@@ -298,32 +926,58 @@ def generate_brochure(text_content: str, api_key: str) -> Optional[str]:
     if not text_content or not api_key:
         return None
 
+    import openai
+
     try:
         # Konfiguruj klienta OpenAI
-        client = openai.OpenAI(api_key=api_key)
-
-        # Przygotuj wiadomości
+        if client is None:
+            client = openai.OpenAI(api_key=api_key)
+        if max_retries is not None and hasattr(client, "with_options"):
+            client = client.with_options(max_retries=max_retries)
+
+        # Przygotuj wiadomości; lista sekcji jest na końcu, by początek promptu
+        # (prompt systemowy i treść) mógł trafić do cache promptów API
+        user_content = (
+            f"Przeanalizuj następującą treść strony internetowej "
+            f"i wygeneruj broszurę inwestycyjną:\n\n{text_content}"
+        )
+        max_tokens = 3000
+        if sections:
+            user_content += (
+                f"\n\nWYGENERUJ TYLKO NASTĘPUJĄCE SEKCJE (nagłówki ##, w tej "
+                f"kolejności): {', '.join(sections)}"
+            )
+            max_tokens = max(600, 3000 * len(sections) // len(BROCHURE_SECTIONS))
         messages = [
             {"role": "system", "content": get_system_prompt()},
-            {
-                "role": "user",
-                "content": f"Przeanalizuj następującą treść strony internetowej "
-                f"i wygeneruj broszurę inwestycyjną:\n\n{text_content}",
-            },
+            {"role": "user", "content": user_content},
         ]
 
         # Wywołaj API
+        started = time.perf_counter()
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=OPENAI_MODEL,
             messages=messages,
-            max_tokens=3000,
+            max_tokens=max_tokens,
             temperature=0.6,
+            timeout=timeout,
         )
+        if usage is not None:
+            usage.update(
+                llm_usage_record(
+                    response,
+                    OPENAI_MODEL,
+                    time.perf_counter() - started,
+                    len(text_content),
+                )
+            )
 
         brochure_content = response.choices[0].message.content
 
         # Post-process broszurę dla lepszego formatowania
         if brochure_content:
+            if sections:
+                return brochure_content
             return enhance_brochure_formatting(brochure_content)
         return None
 
@@ -344,175 +998,5511 @@ def generate_brochure(text_content: str, api_key: str) -> Optional[str]:
         return None
 
 
-def main():
-    """
-    Główna funkcja aplikacji - punkt wejścia dla CLI.
-    """
-    parser = argparse.ArgumentParser(
-        description="Inwestor Pro - Generator perswazyjnych broszur",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
-Przyklady uzycia:
-  python inwestor_pro.py --url https://example.com
-  python inwestor_pro.py --url https://startup.pl --output broszura.md
-        """,
-    )
+# Sekcje broszury z get_system_prompt() w kolejności
+BROCHURE_SECTIONS = (
+    "Tytuł Broszury",
+    "Executive Summary",
+    "Analiza Rynku i Pozycji",
+    "Propozycje Wartości",
+    "Kluczowe Metryki i Dane",
+    "Analiza Podstron",
+    "Model Biznesowy",
+    "Zespół i Kompetencje",
+    "Ryzyka i Wyzwania",
+    "Perspektywy Rozwoju",
+    "Rekomendacja Inwestycyjna",
+)
 
-    parser.add_argument(
-        "--url", required=True, help="URL strony internetowej do analizy"
-    )
+# Sekcje opisujące głównie stronę główną (tytuł, oferta, kierunek rozwoju)
+MAIN_PAGE_SECTIONS = ("Tytuł Broszury", "Propozycje Wartości", "Perspektywy Rozwoju")
 
-    parser.add_argument(
-        "--output",
-        help="Nazwa pliku wyjsciowego (domyslnie: broszura_[domena].md)",
-    )
+# Sekcje podsumowujące całą treść - regenerowane przy każdej zmianie
+SUMMARY_SECTIONS = (
+    "Executive Summary",
+    "Analiza Podstron",
+    "Rekomendacja Inwestycyjna",
+)
 
-    parser.add_argument(
-        "--verbose",
-        action="store_true",
-        help="Wyswietl szczegolowe informacje o procesie",
-    )
+# Minimalna zmiana treści strony (content_change), która dotyka jej sekcji
+SECTION_CHANGE_THRESHOLD = 0.05
 
-    parser.add_argument(
-        "--max-subpages",
-        type=int,
-        default=5,
-        help="Maksymalna liczba podstron do analizy (domyslnie: 5)",
-    )
+# Powyżej tej części sekcji do regeneracji generowana jest cała broszura
+INCREMENTAL_MAX_SHARE = 0.75
 
-    args = parser.parse_args()
+# Katalog stanu --incremental (niezależny od daty w ścieżce broszury)
+SECTION_STATE_DIR = Path("wyniki") / ".sekcje"
 
-    # Walidacja URL
-    if not is_valid_url(args.url):
-        print("Blad: Podany URL nie jest prawidlowy.", file=sys.stderr)
-        sys.exit(1)
 
-    print("Inwestor Pro v1.0.0")
-    print(f"Analizuje strone: {args.url}")
+def split_brochure_sections(markdown: str) -> dict:
+    """
+    Dzieli broszurę (lub odpowiedź z wybranymi sekcjami) na sekcje.
 
-    # Załaduj klucz API
-    print("Ladowanie klucza API...")
-    api_key = load_api_key()
-    if not api_key:
-        return 1
+    Nagłówek sekcji to linia "##", której tekst (bez numeracji
+    i pogrubienia) jest równy nazwie sekcji z BROCHURE_SECTIONS; linia "#"
+    może być tylko nagłówkiem "Tytuł Broszury". Model zwykle zaczyna
+    broszurę samym tytułem (np. "# Firma X – Perspektywy Rozwoju AI"), bez
+    nagłówka "Tytuł Broszury", więc tekst przed pierwszą rozpoznaną sekcją
+    staje się sekcją tytułu, jeśli nie ma jej w odpowiedzi.
+    Nagłówek i stopka z enhance_brochure_formatting są pomijane.
 
-    # Pobierz zawartość strony
-    print("Pobieranie zawartosci strony...")
-    html_content = fetch_html(args.url)
+    Args:
+        markdown: Treść broszury w formacie Markdown
 
-    if not html_content:
-        print("Blad: Nie udalo sie pobrac zawartosci strony.")
-        return 1
+    Returns:
+        dict: {nazwa sekcji: blok Markdown z nagłówkiem}
+    """
+    footer = markdown.rfind("\n---\n\n*Broszura wygenerowana automatycznie")
+    if footer != -1:
+        markdown = markdown[:footer]
+    if markdown.startswith("# Broszura Inwestycyjna\n*Wygenerowana przez"):
+        markdown = markdown.partition("\n---\n\n")[2]
+
+    names = {_link_key(section): section for section in BROCHURE_SECTIONS}
+    title = BROCHURE_SECTIONS[0]
+    blocks: dict[str, list] = {}
+    preamble: list = []
+    current = None
+    for line in markdown.splitlines():
+        heading = re.match(r"(#{1,2})\s+(.*)", line)
+        if heading:
+            # Tytuł "# ..." często zawiera nazwę sekcji - bez dopasowań
+            # częściowych, a "#" może oznaczać tylko sekcję tytułu
+            matched = names.get(re.sub(r"^\d+-", "", _link_key(heading.group(2))))
+            if len(heading.group(1)) == 1 and matched != title:
+                matched = None
+            if matched is not None:
+                current = matched
+                blocks[current] = []
+        if current is not None:
+            blocks[current].append(line)
+        else:
+            preamble.append(line)
+    if title not in blocks and "\n".join(preamble).strip():
+        blocks = {title: preamble, **blocks}
+    return {name: "\n".join(lines).strip() for name, lines in blocks.items()}
+
+
+def join_brochure_sections(sections: dict) -> str:
+    """Składa broszurę z sekcji (w kolejności BROCHURE_SECTIONS)."""
+    return enhance_brochure_formatting(
+        "\n\n".join(sections[name] for name in BROCHURE_SECTIONS if sections.get(name))
+    )
 
-    # Znajdź linki do podstron
-    print("Wyszukiwanie linkow do podstron...")
-    subpage_links = find_subpage_links(html_content, args.url, args.max_subpages)
-    if subpage_links:
-        print(f"Znaleziono {len(subpage_links)} podstron do analizy:")
-        for i, link in enumerate(subpage_links, 1):
-            print(f"  {i}. {link}")
-    else:
-        print("Nie znaleziono podstron do analizy.")
 
-    # Wyczyść i ekstraktuj tekst z głównej strony
-    print("Czyszczenie i ekstraktowanie tekstu z glownej strony...")
-    main_clean_text = clean_and_extract_text(html_content, args.url)
+def attribute_sections(pages: list, per_section: int = 2) -> dict:
+    """
+    Przypisuje strony do sekcji broszury, na które ich treść wpływa.
 
-    if not main_clean_text:
-        print("Blad: Nie udalo sie wyodrebnic tekstu ze strony.")
-        return 1
+    Strona główna zasila MAIN_PAGE_SECTIONS; sekcje z SECTION_QUERIES są
+    przypisywane do per_section stron z najtrafniejszymi fragmentami
+    (PassageIndex).
 
-    # Pobierz zawartość z podstron
-    subpages_content = []
-    if subpage_links:
-        print("Pobieranie zawartosci z podstron...")
-        for i, subpage_url in enumerate(subpage_links, 1):
-            print(f"Pobieranie podstrony {i}/{len(subpage_links)}: {subpage_url}")
-            subpage_html = fetch_subpage_content(subpage_url)
-
-            if subpage_html:
-                subpage_text = clean_and_extract_text(subpage_html, subpage_url)
-                if subpage_text:
-                    subpages_content.append(subpage_text)
-                    print(f"  [OK] Pobrano {len(subpage_text)} znakow")
-                else:
-                    print("  [ERROR] Nie udalo sie wyodrebnic tekstu")
-                    subpages_content.append("")
-            else:
-                print("  [ERROR] Nie udalo sie pobrac zawartosci")
-                subpages_content.append("")
+    Args:
+        pages: Lista krotek (url, tekst); pierwsza to strona główna
+        per_section: Liczba stron przypisywanych do sekcji
 
-    # Połącz treść z głównej strony i podstron
-    print("Laczenie tresci z wszystkich stron...")
-    combined_text = combine_content_from_pages(
-        main_clean_text, subpages_content, args.url
-    )
+    Returns:
+        dict: {url: lista sekcji}
+    """
+    attribution: dict[str, list] = {url: [] for url, _ in pages}
+    if pages:
+        attribution[pages[0][0]].extend(MAIN_PAGE_SECTIONS)
+    passages = chunk_passages(pages)
+    if not passages:
+        return attribution
+
+    index = PassageIndex([text for _, text in passages])
+    ranked = index.top(list(SECTION_QUERIES.values()), len(passages))
+    for section, pairs in zip(SECTION_QUERIES, ranked):
+        urls: list = []
+        for i, _ in pairs:
+            url = passages[i][0]
+            if url not in urls:
+                urls.append(url)
+            if len(urls) == per_section:
+                break
+        for url in urls:
+            attribution[url].append(section)
+    return attribution
+
+
+def affected_sections(previous: dict, current: dict) -> list:
+    """
+    Wyznacza sekcje broszury dotknięte zmianami treści stron.
 
-    # Dodaj analizę podstron
-    if subpages_content:
-        print("Analizowanie tresci z podstron...")
-        subpages_analysis = analyze_subpages_content(subpages_content)
-        combined_text += f"\n\n{subpages_analysis}"
+    Args:
+        previous: Stan stron z poprzedniego uruchomienia
+            {url: {"fingerprint": [...], "sections": [...]}}
+        current: Bieżący stan stron w tym samym formacie
 
-    print(
-        f"Pobrano i wyczyszczono {len(combined_text)} znakow tekstu "
-        f"(glowna strona + {len(subpages_content)} podstron)."
-    )
+    Returns:
+        list: Sekcje do regeneracji (w kolejności BROCHURE_SECTIONS)
+    """
+    affected = set()
+    for url in set(previous) | set(current):
+        old, new = previous.get(url), current.get(url)
+        if old and new:
+            change = content_change(old["fingerprint"], new["fingerprint"])
+            if change < SECTION_CHANGE_THRESHOLD:
+                continue
+        for entry in (old, new):
+            if entry:
+                affected.update(entry["sections"])
+    if affected:
+        affected.update(SUMMARY_SECTIONS)
+    return [name for name in BROCHURE_SECTIONS if name in affected]
 
-    if args.verbose:
-        try:
-            print(f"Przykladowy tekst: {combined_text[:200]}...")
-        except UnicodeEncodeError:
-            print("Przykladowy tekst: [tekst zawiera znaki specjalne]")
 
-    # Generuj broszurę inwestycyjną
-    print("Generowanie broszury inwestycyjnej...")
-    brochure = generate_brochure(combined_text, api_key)
+def section_state_path(url: str) -> Path:
+    """Zwraca ścieżkę pliku stanu --incremental dla strony."""
+    return SECTION_STATE_DIR / f"{content_hash(normalize_url(url))[:32]}.json"
 
-    if not brochure:
-        print("Blad: Nie udalo sie wygenerowac broszury.")
-        return 1
 
-    # Zapisz broszurę do pliku
-    output_filename = (
-        args.output or f"broszura_{urlparse(args.url).netloc.replace('.', '_')}"
-    )
+def load_section_state(path: Path) -> Optional[dict]:
+    """
+    Wczytuje stan --incremental z poprzedniego uruchomienia.
 
-    if not save_markdown_file(output_filename, brochure):
-        return 1
+    Args:
+        path: Ścieżka pliku stanu
 
-    print("Broszura inwestycyjna zostala wygenerowana pomyslnie!")
-    return 0
+    Returns:
+        dict: Stan ({"pages", "sections"}) lub None, gdy go brak lub jest
+            uszkodzony
+    """
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ostrzezenie: pomijam uszkodzony stan sekcji {path}: {e}")
+        return None
+    if not isinstance(state.get("pages"), dict) or not state.get("sections"):
+        return None
+    return state
 
 
-def fetch_html(url: str, timeout: int = 30) -> Optional[str]:
+def content_hash(data: Any) -> str:
     """
-    Pobiera zawartość HTML strony internetowej.
+    Zwraca skrót SHA-256 treści (napisy są kodowane jako UTF-8).
 
     Args:
-        url: URL strony do pobrania
-        timeout: Timeout w sekundach (domyślnie 30)
+        data: Treść (str lub bytes)
 
     Returns:
-        str: Zawartość HTML strony lub None w przypadku błędu
+        str: Skrót w postaci szesnastkowej
     """
-    try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
 
-        response = requests.get(url, headers=headers, timeout=timeout)
-        response.raise_for_status()
 
-        # Sprawdź czy odpowiedź to HTML
-        content_type = response.headers.get("content-type", "").lower()
-        if "text/html" not in content_type:
-            print(
-                f"Ostrzezenie: Strona nie zwraca HTML "
-                f"(content-type: {content_type})"
-            )
+class ArtifactStore:
+    """
+    Magazyn artefaktów adresowanych treścią (surowy HTML, czysty tekst,
+    połączony prompt, broszura).
 
-        return response.text
+    Obiekty są zapisywane w objects/<2 znaki>/<sha256>[.zst|.gz], gdzie skrót
+    liczony jest z nieskompresowanej treści. Dla każdego URL plik manifestu
+    zapamiętuje, jaki skrót wejścia dał jaki wynik na każdym etapie - jeśli
+    wejście się nie zmieniło, etap można pominąć.
+    """
+
+    SUFFIXES = {"zstd": ".zst", "gzip": ".gz", "none": ""}
+
+    def __init__(self, root: str, compression: str = "auto"):
+        self.root = Path(root)
+        if compression == "auto":
+            compression = "zstd" if _zstd_module() else "gzip"
+        if compression not in self.SUFFIXES:
+            raise ValueError(f"Nieznana kompresja artefaktow: {compression}")
+        if compression == "zstd" and not _zstd_module():
+            raise ValueError("Kompresja zstd wymaga pakietu zstandard")
+        self.compression = compression
+        self._lock = threading.Lock()
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        (self.root / "manifests").mkdir(parents=True, exist_ok=True)
+
+    def _object_path(self, digest: str, compression: str) -> Path:
+        return (
+            self.root / "objects" / digest[:2] / (digest + self.SUFFIXES[compression])
+        )
+
+    def _manifest_path(self, url: str) -> Path:
+        # Warianty tego samego adresu (np. https://A.pl/) mają wspólny manifest
+        return self.root / "manifests" / f"{content_hash(normalize_url(url))[:32]}.json"
+
+    def put(self, data: Any) -> str:
+        """
+        Zapisuje treść (jeśli jeszcze jej nie ma) i zwraca jej skrót.
+
+        Args:
+            data: Treść (str lub bytes)
+
+        Returns:
+            str: Skrót SHA-256 treści
+        """
+        raw = data.encode("utf-8") if isinstance(data, str) else data
+        digest = content_hash(raw)
+        if self._find_object(digest):
+            return digest
+
+        path = self._object_path(digest, self.compression)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self.compression == "zstd":
+            payload = _zstd_module().ZstdCompressor(level=3).compress(raw)
+        elif self.compression == "gzip":
+            payload = gzip.compress(raw, compresslevel=5)
+        else:
+            payload = raw
+        _atomic_write(path, payload)
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        """
+        Odczytuje treść obiektu.
+
+        Args:
+            digest: Skrót SHA-256 treści
+
+        Returns:
+            bytes: Treść lub None, jeśli obiektu nie ma
+        """
+        found = self._find_object(digest)
+        if not found:
+            return None
+        path, compression = found
+        try:
+            payload = path.read_bytes()
+            if compression == "zstd":
+                return _zstd_module().ZstdDecompressor().decompress(payload)
+            if compression == "gzip":
+                return gzip.decompress(payload)
+            return payload
+        except Exception as e:
+            print(f"Blad podczas odczytu artefaktu {digest}: {e}")
+            return None
+
+    def get_text(self, digest: str) -> Optional[str]:
+        """Odczytuje obiekt jako tekst UTF-8 (None, jeśli go nie ma)."""
+        data = self.get(digest)
+        return data.decode("utf-8") if data is not None else None
+
+    def _find_object(self, digest: str) -> Optional[tuple]:
+        for compression in self.SUFFIXES:
+            path = self._object_path(digest, compression)
+            if path.exists():
+                return path, compression
+        return None
+
+    def _read_manifest(self, url: str) -> dict:
+        try:
+            with open(self._manifest_path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {"url": url, "stages": {}}
+
+    def record(self, url: str, stage: str, input_hash: str, output_hash: str) -> None:
+        """
+        Zapamiętuje wynik etapu dla URL.
+
+        Args:
+            url: URL strony
+            stage: Nazwa etapu (np. "html", "text", "prompt", "brochure")
+            input_hash: Skrót danych wejściowych etapu
+            output_hash: Skrót wyniku etapu
+        """
+        with self._lock:
+            manifest = self._read_manifest(url)
+            manifest["stages"][stage] = {
+                "input": input_hash,
+                "output": output_hash,
+                "time": time.time(),
+            }
+            _atomic_write(
+                self._manifest_path(url),
+                json.dumps(manifest, ensure_ascii=False).encode("utf-8"),
+            )
+
+    def lookup(
+        self,
+        url: str,
+        stage: str,
+        input_hash: str,
+        max_age: Optional[float] = None,
+    ) -> Optional[str]:
+        """
+        Zwraca skrót wyniku etapu, jeśli wejście się nie zmieniło.
+
+        Args:
+            url: URL strony
+            stage: Nazwa etapu
+            input_hash: Skrót bieżących danych wejściowych etapu
+            max_age: Maksymalny wiek wyniku w sekundach (None - bez limitu)
+
+        Returns:
+            str: Skrót zapisanego wyniku lub None
+        """
+        entry = self._read_manifest(url)["stages"].get(stage)
+        if not entry or entry.get("input") != input_hash:
+            return None
+        if max_age is not None and time.time() - entry.get("time", 0) > max_age:
+            return None
+        if not self._find_object(entry["output"]):
+            return None
+        return entry["output"]
+
+    def gc(
+        self,
+        max_bytes: Optional[int] = None,
+        max_age_days: Optional[float] = None,
+    ) -> dict:
+        """
+        Usuwa stare obiekty i ogranicza rozmiar magazynu.
+
+        Najpierw usuwane są obiekty starsze niż max_age_days, potem -
+        od najstarszych - obiekty ponad limit max_bytes. Wpisy manifestów
+        wskazujące na usunięte obiekty są usuwane.
+
+        Args:
+            max_bytes: Maksymalny łączny rozmiar obiektów
+            max_age_days: Maksymalny wiek obiektu w dniach
+
+        Returns:
+            dict: Statystyki: liczba i rozmiar usuniętych i pozostałych obiektów
+        """
+        objects = []
+        for path in (self.root / "objects").glob("*/*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            objects.append((stat.st_mtime, stat.st_size, path))
+        objects.sort(key=lambda item: item[0])
+
+        now = time.time()
+        total = sum(size for _, size, _ in objects)
+        removed = removed_bytes = 0
+        kept = []
+        for mtime, size, path in objects:
+            too_old = max_age_days is not None and now - mtime > max_age_days * 86400
+            too_big = max_bytes is not None and total > max_bytes
+            if too_old or too_big:
+                try:
+                    path.unlink()
+                except OSError:
+                    kept.append(size)
+                    continue
+                total -= size
+                removed += 1
+                removed_bytes += size
+            else:
+                kept.append(size)
+
+        # Usuń wpisy manifestów wskazujące na nieistniejące obiekty
+        with self._lock:
+            for manifest_path in (self.root / "manifests").glob("*.json"):
+                try:
+                    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+                except (OSError, json.JSONDecodeError):
+                    manifest_path.unlink(missing_ok=True)
+                    continue
+                stages = {
+                    stage: entry
+                    for stage, entry in manifest.get("stages", {}).items()
+                    if self._find_object(entry.get("output", ""))
+                }
+                if not stages:
+                    manifest_path.unlink(missing_ok=True)
+                elif stages != manifest.get("stages"):
+                    manifest["stages"] = stages
+                    _atomic_write(
+                        manifest_path,
+                        json.dumps(manifest, ensure_ascii=False).encode("utf-8"),
+                    )
+
+        return {
+            "removed": removed,
+            "removed_bytes": removed_bytes,
+            "kept": len(kept),
+            "kept_bytes": sum(kept),
+        }
+
+
+class CorpusWriter:
+    """
+    Zapis korpusu oczyszczonych tekstów stron (tylko dopisywanie).
+
+    Korpus to dwa pliki w katalogu: corpus.dat z tekstami w UTF-8 zapisanymi
+    jeden za drugim oraz corpus.idx - indeks JSON Lines z adresem strony,
+    przesunięciem i długością tekstu w corpus.dat. Tekst jest dopisywany
+    przed wpisem indeksu, więc przerwany zapis nie psuje korpusu. Teksty
+    o tym samym skrócie są zapisywane raz - kolejne wpisy wskazują na ten
+    sam fragment pliku danych.
+    """
+
+    DATA_FILE = "corpus.dat"
+    INDEX_FILE = "corpus.idx"
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.root / self.DATA_FILE
+        self.index_path = self.root / self.INDEX_FILE
+        self._lock = threading.Lock()
+        self._offsets = {
+            entry["hash"]: (entry["offset"], entry["length"])
+            for entry in read_corpus_index(self.root)
+        }
+        self._end_partial_line()
+
+    def _end_partial_line(self) -> None:
+        """Kończy linię indeksu uciętą przy awarii, by nie skleić jej z nową."""
+        if not self.index_path.exists() or not self.index_path.stat().st_size:
+            return
+        with open(self.index_path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def append(self, url: str, text: str, site: str = "") -> Optional[dict]:
+        """
+        Dopisuje tekst strony do korpusu.
+
+        Args:
+            url: Adres strony
+            text: Oczyszczony tekst strony
+            site: Adres strony głównej, z której pochodzi podstrona
+
+        Returns:
+            dict: Wpis indeksu lub None, gdy tekst jest pusty
+        """
+        if not text:
+            return None
+        raw = text.encode("utf-8")
+        digest = content_hash(raw)
+        with self._lock:
+            if digest not in self._offsets:
+                with open(self.data_path, "ab") as f:
+                    offset = f.seek(0, os.SEEK_END)
+                    f.write(raw)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._offsets[digest] = (offset, len(raw))
+            offset, length = self._offsets[digest]
+            entry = {
+                "url": url,
+                "site": site or url,
+                "offset": offset,
+                "length": length,
+                "hash": digest,
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+            }
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+
+def read_corpus_index(root: Union[str, Path]) -> list:
+    """
+    Wczytuje indeks korpusu, pomijając wpisy ucięte lub bez danych.
+
+    Args:
+        root: Katalog korpusu
+
+    Returns:
+        list: Wpisy indeksu w kolejności dopisywania
+    """
+    root = Path(root)
+    index_path = root / CorpusWriter.INDEX_FILE
+    data_path = root / CorpusWriter.DATA_FILE
+    if not index_path.exists():
+        return []
+    data_size = data_path.stat().st_size if data_path.exists() else 0
+    entries = []
+    with open(index_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Ostatnia linia mogła zostać ucięta przy awarii
+                continue
+            if entry.get("offset", 0) + entry.get("length", 0) <= data_size:
+                entries.append(entry)
+    return entries
+
+
+class CorpusReader:
+    """
+    Odczyt korpusu przez mmap - strony są udostępniane jako memoryview
+    na zmapowanym pliku, bez kopiowania i bez wczytywania całości do pamięci.
+
+    Przykład:
+        with CorpusReader("korpus") as corpus:
+            for entry, text in corpus.iter_texts():
+                print(entry["url"], extract_key_phrases(text))
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.entries = read_corpus_index(self.root)
+        self._file = None
+        self._map: Any = b""
+        data_path = self.root / CorpusWriter.DATA_FILE
+        if data_path.exists() and data_path.stat().st_size:
+            self._file = open(data_path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self) -> "CorpusReader":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def close(self) -> None:
+        """
+        Zamyka mapowanie i plik danych.
+
+        Jeśli wywołujący nadal trzyma widoki z view() / iter_pages() (np. po
+        break w pętli wewnątrz with), mapowanie jest zwalniane dopiero razem
+        z ostatnim widokiem, zamiast zgłaszać BufferError.
+        """
+        if self._file is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Istnieją widoki na mapowanie - zwolni je ostatni z nich
+                pass
+            self._file.close()
+            self._file = None
+            self._map = b""
+
+    def view(self, entry: dict) -> memoryview:
+        """
+        Zwraca bajty tekstu strony jako memoryview (bez kopii).
+
+        Widok wolno używać tylko do zamknięcia czytnika; dane potrzebne
+        później należy skopiować (bytes(widok) lub text()).
+        """
+        start = entry["offset"]
+        return memoryview(self._map)[start : start + entry["length"]]
+
+    def text(self, entry: dict) -> str:
+        """Zwraca tekst strony zdekodowany z UTF-8."""
+        return str(self.view(entry), "utf-8")
+
+    def iter_pages(self, unique: bool = False) -> Iterator[tuple]:
+        """
+        Iteruje po stronach korpusu.
+
+        Args:
+            unique: Pomiń strony o treści identycznej z wcześniejszą
+
+        Yields:
+            tuple: (wpis indeksu, memoryview z tekstem UTF-8)
+        """
+        seen = set()
+        for entry in self.entries:
+            if unique:
+                if entry["hash"] in seen:
+                    continue
+                seen.add(entry["hash"])
+            yield entry, self.view(entry)
+
+    def iter_texts(self, unique: bool = False) -> Iterator[tuple]:
+        """Jak iter_pages, ale zwraca (wpis indeksu, tekst)."""
+        for entry, view in self.iter_pages(unique):
+            yield entry, str(view, "utf-8")
+
+    def latest(self) -> dict:
+        """Zwraca najnowszy wpis dla każdego URL ({url: wpis})."""
+        return {entry["url"]: entry for entry in self.entries}
+
+
+def analyze_corpus(
+    reader: CorpusReader,
+    analysis: Callable[[str], list] = extract_key_phrases,
+    top: int = 20,
+) -> dict:
+    """
+    Uruchamia analizę typu extract_key_phrases na wszystkich stronach
+    korpusu (bez duplikatów treści) i zlicza wyniki.
+
+    Args:
+        reader: Otwarty czytnik korpusu
+        analysis: Funkcja zwracająca listę fraz dla tekstu strony
+        top: Liczba najczęstszych fraz w wyniku
+
+    Returns:
+        dict: Liczba stron, stron unikalnych, bajtów i najczęstsze frazy
+    """
+    counts: dict[str, int] = {}
+    unique = 0
+    data_bytes = 0
+    for entry, text in reader.iter_texts(unique=True):
+        unique += 1
+        data_bytes += entry["length"]
+        for phrase in analysis(text):
+            counts[phrase] = counts.get(phrase, 0) + 1
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return {
+        "pages": len(reader),
+        "unique_pages": unique,
+        "sites": len({entry["site"] for entry in reader.entries}),
+        "bytes": data_bytes,
+        "top_phrases": ranked[:top],
+    }
+
+
+def _numpy_module() -> Any:
+    """Zwraca moduł numpy lub None, jeśli pakiet nie jest zainstalowany."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _zstd_module() -> Any:
+    """Zwraca moduł zstandard lub None, jeśli pakiet nie jest zainstalowany."""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    """Zapisuje plik atomowo (plik tymczasowy + os.replace)."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class SingleFlight:
+    """
+    Łączy równoczesne wywołania tej samej operacji (single-flight).
+
+    Pierwsze wywołanie z danym kluczem wykonuje operację, a wywołania z tym
+    samym kluczem rozpoczęte przed jej zakończeniem czekają i dostają ten
+    sam wynik (lub ten sam wyjątek). Po zakończeniu klucz jest zwalniany -
+    wyniki nie są przechowywane (od tego jest magazyn artefaktów).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+
+    def do(self, key: Any, fn: Callable[[], Any]) -> tuple:
+        """
+        Wykonuje fn() lub dołącza do trwającego wywołania z tym samym kluczem.
+
+        Args:
+            key: Klucz operacji (np. etap i skrót danych wejściowych)
+            fn: Funkcja bez argumentów wykonująca operację
+
+        Returns:
+            tuple: (wynik, czy_wynik_współdzielony)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "value": None, "error": None}
+                self._calls[key] = call
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["value"], True
+
+        try:
+            call["value"] = fn()
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+        return call["value"], False
+
+
+def cached_stage(
+    options: "RunOptions",
+    url: str,
+    stage: str,
+    input_hash: str,
+    compute: Callable[[], Optional[str]],
+    max_age: Optional[float] = None,
+) -> Optional[str]:
+    """
+    Zwraca wynik etapu z magazynu artefaktów lub oblicza i zapisuje go.
+
+    Bez magazynu (options.artifacts is None) po prostu wywołuje compute().
+    Z options.single_flight równoczesne wywołania tego samego etapu z tym
+    samym skrótem wejścia (np. ten sam URL w dwóch zadaniach) są łączone
+    w jedno.
+
+    Args:
+        options: Wspólne ustawienia przetwarzania
+        url: URL strony
+        stage: Nazwa etapu
+        input_hash: Skrót danych wejściowych etapu
+        compute: Funkcja obliczająca wynik etapu
+        max_age: Maksymalny wiek zapisanego wyniku w sekundach
+
+    Returns:
+        str: Wynik etapu lub None w przypadku błędu
+    """
+    flights = options.single_flight
+    if flights is None:
+        return _cached_compute(options, url, stage, input_hash, compute, max_age)
+
+    value, shared = flights.do(
+        (stage, input_hash),
+        lambda: _cached_compute(options, url, stage, input_hash, compute, max_age),
+    )
+    if shared:
+        METRICS.inc("inwestor_coalesced_total", stage=stage)
+        if options.verbose:
+            print(f"  [SHARED] {stage}: {url}")
+    return value
+
+
+def _cached_compute(
+    options: "RunOptions",
+    url: str,
+    stage: str,
+    input_hash: str,
+    compute: Callable[[], Optional[str]],
+    max_age: Optional[float],
+) -> Optional[str]:
+    """Odczytuje wynik etapu z magazynu artefaktów lub go oblicza i zapisuje."""
+    store = options.artifacts
+    if store is None:
+        return compute()
+
+    digest = store.lookup(url, stage, input_hash, max_age)
+    if digest:
+        cached = store.get_text(digest)
+        if cached is not None:
+            if options.verbose:
+                print(f"  [CACHE] {stage}: {url}")
+            return cached
+
+    value = compute()
+    if value:
+        try:
+            store.record(url, stage, input_hash, store.put(value))
+        except OSError as e:
+            print(f"Ostrzezenie: nie udalo sie zapisac artefaktu {stage}: {e}")
+    return value
+
+
+class StageRecord:
+    """Pomiar jednego wywołania etapu (czas, CPU, rozmiary danych)."""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.start_ns = 0
+        self.attributes: dict = {}
+        self.error: Optional[str] = None
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.chars_in = 0
+        self.chars_out = 0
+        self.mem_peak: Optional[int] = None
+        self.mem_retained: Optional[int] = None
+        self._pending: Optional[tuple] = None
+
+    def io(self, data_in: Any = None, data_out: Any = None) -> None:
+        """
+        Zapisuje dane wejściowe i wyjściowe etapu do zmierzenia.
+
+        Rozmiary są liczone dopiero po zakończeniu etapu (po pomiarze
+        pamięci), aby kodowanie napisów nie zawyżało szczytu pamięci.
+
+        Args:
+            data_in: Dane wejściowe (str, bytes lub lista napisów)
+            data_out: Dane wyjściowe (str, bytes lub lista napisów)
+        """
+        self._pending = (data_in, data_out)
+
+    def set(self, key: str, value: Any) -> None:
+        """Dodaje atrybut pomiaru (np. liczbę tokenów) eksportowany w spanie."""
+        self.attributes[key] = value
+
+    def fail(self, message: str) -> None:
+        """Oznacza etap jako zakończony błędem (status spanu ERROR)."""
+        self.error = message
+
+    def finalize(self) -> None:
+        """Liczy rozmiary danych zapisanych przez io() i zwalnia referencje."""
+        if self._pending is None:
+            return
+        data_in, data_out = self._pending
+        self._pending = None
+        self.chars_in, self.bytes_in = _measure(data_in)
+        self.chars_out, self.bytes_out = _measure(data_out)
+
+    def as_dict(self) -> dict:
+        """Zwraca pomiar jako słownik gotowy do zapisu w JSON."""
+        data = {
+            "stage": self.name,
+            "url": self.url,
+            "wall_s": round(self.wall, 6),
+            "cpu_s": round(self.cpu, 6),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "chars_in": self.chars_in,
+            "chars_out": self.chars_out,
+        }
+        if self.mem_peak is not None:
+            data["mem_peak_bytes"] = self.mem_peak
+            data["mem_retained_bytes"] = self.mem_retained
+        return data
+
+
+class _NullRecord:
+    """Pomiar-atrapa używany, gdy profilowanie jest wyłączone."""
+
+    def io(self, data_in: Any = None, data_out: Any = None) -> None:
+        pass
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def fail(self, message: str) -> None:
+        pass
+
+
+_NULL_RECORD = _NullRecord()
+
+# Klucze pomiaru, które nie są sumowane w report() (liczone osobno)
+_NON_SUMMED_KEYS = ("count", "mem_peak_bytes", "mem_retained_bytes")
+
+
+def _tracemalloc_start() -> bool:
+    """
+    Włącza tracemalloc (--memprofile), jeśli jeszcze nie działa.
+
+    Returns:
+        bool: True jeśli śledzenie pamięci jest aktywne
+    """
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return hasattr(tracemalloc, "reset_peak")
+
+
+def _measure(data: Any) -> tuple:
+    """Zwraca (liczba znaków, liczba bajtów UTF-8) dla napisu, bajtów lub listy."""
+    if data is None:
+        return 0, 0
+    if isinstance(data, bytes):
+        return len(data), len(data)
+    if isinstance(data, str):
+        return len(data), len(data.encode("utf-8", errors="replace"))
+    chars = total = 0
+    for item in data:
+        item_chars, item_bytes = _measure(item)
+        chars += item_chars
+        total += item_bytes
+    return chars, total
+
+
+class StageProfiler:
+    """
+    Zbiera pomiary etapów przetwarzania jednej strony (--profile).
+
+    Czas CPU jest mierzony zegarem wątku (time.thread_time), więc pomiary
+    pozostają poprawne także w trybie wsadowym i potokowym.
+
+    Z memory=True (--memprofile) dla każdego etapu zapisywany jest szczyt
+    pamięci oraz pamięć pozostała po etapie (tracemalloc). tracemalloc
+    śledzi cały proces, więc przy równoległym przetwarzaniu stron pomiary
+    obejmują także inne wątki - dokładne wartości daje --concurrency 1.
+
+    Z trace=True (--trace) pomiary są zbierane także bez raportu --profile,
+    aby można je było wyeksportować jako spany (spans()).
+    """
+
+    def __init__(
+        self,
+        url: str = "",
+        enabled: bool = True,
+        memory: bool = False,
+        trace: bool = False,
+    ):
+        self.url = url
+        self.enabled = enabled or memory
+        self.memory = memory
+        self.recording = self.enabled or trace
+        self.records: list = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, url: Optional[str] = None) -> Iterator[Any]:
+        """
+        Mierzy czas wykonania bloku kodu jako etap o podanej nazwie.
+
+        Args:
+            name: Nazwa etapu (np. "fetch_html")
+            url: URL, którego dotyczy etap (domyślnie URL strony)
+
+        Yields:
+            StageRecord: Pomiar, w którym można zapisać rozmiary danych (io)
+        """
+        if not self.recording:
+            yield _NULL_RECORD
+            return
+
+        record = StageRecord(name, url or self.url)
+        tracing = self.memory and _tracemalloc_start()
+        if tracing:
+            import tracemalloc
+
+            mem_started = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        record.start_ns = time.time_ns()
+        wall_started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            yield record
+        finally:
+            record.wall = time.perf_counter() - wall_started
+            record.cpu = time.thread_time() - cpu_started
+            if tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                record.mem_peak = max(0, peak - mem_started)
+                record.mem_retained = current - mem_started
+            record.finalize()
+            with self._lock:
+                self.records.append(record)
+
+    def report(self) -> dict:
+        """
+        Zwraca raport z pomiarami i sumami dla każdego etapu.
+
+        Returns:
+            dict: {"url", "stages": [...], "totals": {etap: {...}}}
+        """
+        totals: dict[str, dict] = {}
+        for record in self.records:
+            total = totals.setdefault(
+                record.name,
+                {
+                    "count": 0,
+                    "wall_s": 0.0,
+                    "cpu_s": 0.0,
+                    "bytes_in": 0,
+                    "bytes_out": 0,
+                    "chars_in": 0,
+                    "chars_out": 0,
+                },
+            )
+            total["count"] += 1
+            for key, value in record.as_dict().items():
+                if key in total and key not in _NON_SUMMED_KEYS:
+                    total[key] += value
+            if record.mem_peak is not None:
+                total["mem_peak_bytes"] = max(
+                    total.get("mem_peak_bytes", 0), record.mem_peak
+                )
+                total["mem_retained_bytes"] = (
+                    total.get("mem_retained_bytes", 0) + record.mem_retained
+                )
+        for total in totals.values():
+            total["wall_s"] = round(total["wall_s"], 6)
+            total["cpu_s"] = round(total["cpu_s"], 6)
+        return {
+            "url": self.url,
+            "stages": [record.as_dict() for record in self.records],
+            "totals": totals,
+        }
+
+    def spans(
+        self,
+        started_ns: int,
+        ended_ns: int,
+        attributes: Optional[dict] = None,
+        error: Optional[str] = None,
+    ) -> list:
+        """
+        Zamienia pomiary na spany w formacie OTLP/JSON.
+
+        Hierarchia: span "site" dla strony, pod nim span "subpage" dla każdej
+        podstrony (obejmujący jej pobieranie i czyszczenie) oraz spany etapów.
+
+        Args:
+            started_ns: Początek przetwarzania strony (ns od epoki)
+            ended_ns: Koniec przetwarzania strony (ns od epoki)
+            attributes: Atrybuty spanu strony
+            error: Komunikat błędu strony (status ERROR)
+
+        Returns:
+            list: Lista spanów OTLP jednego śladu (traceId)
+        """
+        trace_id = os.urandom(16).hex()
+        site = _otlp_span(
+            trace_id,
+            None,
+            "site",
+            started_ns,
+            ended_ns,
+            {"url": self.url, **(attributes or {})},
+            error,
+        )
+        spans = [site]
+        subpages: dict[str, dict] = {}
+        for record in self.records:
+            parent = site
+            if record.url != self.url:
+                parent = subpages.get(record.url)
+                if parent is None:
+                    parent = subpages[record.url] = _otlp_span(
+                        trace_id,
+                        site["spanId"],
+                        "subpage",
+                        record.start_ns,
+                        record.start_ns,
+                        {"url": record.url},
+                    )
+                    spans.append(parent)
+            end_ns = record.start_ns + int(record.wall * 1e9)
+            # Span podstrony obejmuje wszystkie jej etapy
+            if parent is not site:
+                parent["endTimeUnixNano"] = str(
+                    max(int(parent["endTimeUnixNano"]), end_ns)
+                )
+                if record.error:
+                    parent["status"] = {"code": 2, "message": record.error}
+            attrs = {
+                "url": record.url,
+                "bytes_in": record.bytes_in,
+                "bytes_out": record.bytes_out,
+                "cpu_s": record.cpu,
+                **record.attributes,
+            }
+            spans.append(
+                _otlp_span(
+                    trace_id,
+                    parent["spanId"],
+                    record.name,
+                    record.start_ns,
+                    end_ns,
+                    attrs,
+                    record.error,
+                )
+            )
+        return spans
+
+
+def _otlp_value(value: Any) -> dict:
+    """Koduje wartość atrybutu jako AnyValue OTLP/JSON."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(
+    trace_id: str,
+    parent_id: Optional[str],
+    name: str,
+    start_ns: int,
+    end_ns: int,
+    attributes: dict,
+    error: Optional[str] = None,
+) -> dict:
+    """Tworzy span w kształcie OTLP/JSON (SPAN_KIND_INTERNAL)."""
+    span = {
+        "traceId": trace_id,
+        "spanId": os.urandom(8).hex(),
+        "name": name,
+        "kind": 1,
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": [
+            {"key": key, "value": _otlp_value(value)}
+            for key, value in attributes.items()
+            if value is not None
+        ],
+        "status": {"code": 2, "message": error} if error else {"code": 1},
+    }
+    if parent_id:
+        span["parentSpanId"] = parent_id
+    return span
+
+
+class TraceExporter:
+    """
+    Zapisuje ślady do pliku JSON Lines zgodnego z eksporterem plikowym OTLP.
+
+    Każda linia to jeden ExportTraceServiceRequest ze wszystkimi spanami
+    jednej strony, więc plik można wczytać do standardowych przeglądarek
+    śladów (np. przez kolektor OpenTelemetry z odbiornikiem otlpjsonfile).
+    """
+
+    def __init__(self, path: str, service_name: str = "inwestor-pro"):
+        self.path = Path(path)
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, spans: list) -> None:
+        """
+        Dopisuje spany jednego śladu jako linię JSON.
+
+        Args:
+            spans: Lista spanów OTLP (StageProfiler.spans)
+        """
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": _otlp_value(self.service_name),
+                            }
+                        ]
+                    },
+                    "scopeSpans": [{"scope": {"name": "inwestor_pro"}, "spans": spans}],
+                }
+            ]
+        }
+        line = json.dumps(request, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class MetricsRegistry:
+    """
+    Liczniki, wskaźniki i histogramy procesu w formacie Prometheus/OpenMetrics.
+
+    Rejestr jest bezpieczny wątkowo; metryki deklaruje się raz (counter,
+    gauge, histogram), a następnie aktualizuje z etykietami (inc, set,
+    observe).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: dict[str, str] = {}
+        self._buckets: dict[str, tuple] = {}
+        self._counters: dict[str, dict] = {}
+        self._gauges: dict[str, dict] = {}
+        self._histograms: dict[str, dict] = {}
+
+    def counter(self, name: str, help_text: str) -> None:
+        """Deklaruje licznik (nazwa z sufiksem _total)."""
+        self._help[name] = help_text
+        self._counters[name] = {}
+
+    def gauge(self, name: str, help_text: str) -> None:
+        """Deklaruje wskaźnik (wartość bieżąca, może maleć)."""
+        self._help[name] = help_text
+        self._gauges[name] = {}
+
+    def histogram(self, name: str, help_text: str, buckets: tuple) -> None:
+        """Deklaruje histogram z podanymi górnymi granicami kubełków."""
+        self._help[name] = help_text
+        self._buckets[name] = tuple(sorted(buckets))
+        self._histograms[name] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        """Zwiększa licznik o value."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """Ustawia wartość wskaźnika."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._gauges[name][key] = value
+
+    def remove(self, name: str, **labels: str) -> None:
+        """Usuwa serię wskaźnika (np. hosta, który nie jest już śledzony)."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._gauges[name].pop(key, None)
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Dodaje obserwację do histogramu."""
+        key = tuple(sorted(labels.items()))
+        buckets = self._buckets[name]
+        with self._lock:
+            series = self._histograms[name].setdefault(
+                key, {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+            )
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def value(self, name: str, **labels: str) -> float:
+        """Zwraca bieżącą wartość licznika (lub liczbę obserwacji histogramu)."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            if name in self._histograms:
+                return self._histograms[name].get(key, {}).get("count", 0)
+            if name in self._gauges:
+                return self._gauges[name].get(key, 0.0)
+            return self._counters[name].get(key, 0.0)
+
+    def render(self, openmetrics: bool = False) -> str:
+        """
+        Zwraca wszystkie metryki w formacie tekstowym.
+
+        Domyślnie jest to format tekstowy Prometheus 0.0.4 (kolektor textfile
+        node-exportera). W formacie OpenMetrics 1.0 rodzina licznika w HELP
+        i TYPE nie ma sufiksu _total (ma go tylko próbka), a treść kończy
+        się znacznikiem # EOF.
+
+        Args:
+            openmetrics: Zwróć format OpenMetrics zamiast Prometheus 0.0.4
+
+        Returns:
+            str: Treść pliku metryk
+        """
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                family = name
+                if openmetrics and name.endswith("_total"):
+                    family = name[: -len("_total")]
+                lines.append(f"# HELP {family} {self._help[name]}")
+                lines.append(f"# TYPE {family} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {_format_number(value)}")
+            for name, series in self._gauges.items():
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} gauge")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {_format_number(value)}")
+            for name, series in self._histograms.items():
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, data in sorted(series.items()):
+                    for bound, count in zip(self._buckets[name], data["buckets"]):
+                        labels = _format_labels(key + (("le", _format_number(bound)),))
+                        lines.append(f"{name}_bucket{labels} {count}")
+                    labels = _format_labels(key + (("le", "+Inf"),))
+                    lines.append(f"{name}_bucket{labels} {data['count']}")
+                    lines.append(
+                        f"{name}_sum{_format_labels(key)} {_format_number(data['sum'])}"
+                    )
+                    lines.append(f"{name}_count{_format_labels(key)} {data['count']}")
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(key: tuple) -> str:
+    """Formatuje etykiety metryki: {a="1",b="2"}."""
+    if not key:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in key
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_number(value: float) -> str:
+    """Formatuje liczbę bez zbędnej części dziesiętnej."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+METRICS = MetricsRegistry()
+METRICS.counter("inwestor_pages_fetched_total", "Pobrane strony (kind: main, subpage)")
+METRICS.counter("inwestor_fetch_bytes_total", "Bajty pobrane przez HTTP")
+METRICS.counter(
+    "inwestor_pages_skipped_total",
+    "Podstrony pominiete bez pobierania (reason: budget, deadline)",
+)
+METRICS.counter(
+    "inwestor_fetch_errors_total",
+    "Bledy pobierania (type: timeout, connection, http_4xx, http_5xx, other)",
+)
+METRICS.counter(
+    "inwestor_fetch_backoffs_total",
+    "Zmniejszenia limitu polaczen do hosta (reason: timeout, connection, "
+    "throttled, slow)",
+)
+METRICS.counter(
+    "inwestor_watch_visits_total",
+    "Wizyty trybu --watch (outcome: new, changed, unchanged, not_modified, error)",
+)
+METRICS.counter(
+    "inwestor_coalesced_total",
+    "Wywolania etapow polaczone z trwajacym identycznym wywolaniem (stage)",
+)
+METRICS.counter(
+    "inwestor_cassette_misses_total",
+    "Zadania bez nagrania w kasecie --replay (kind: http, llm)",
+)
+METRICS.gauge(
+    "inwestor_fetch_concurrency_limit",
+    "Biezacy adaptacyjny limit rownoczesnych zadan HTTP do hosta (host)",
+)
+METRICS.counter("inwestor_llm_tokens_total", "Tokeny modelu (type: prompt, ...)")
+METRICS.counter("inwestor_llm_cost_usd_total", "Szacowany koszt wywolan modelu w USD")
+METRICS.counter("inwestor_brochures_written_total", "Zapisane broszury")
+METRICS.counter("inwestor_sites_total", "Przetworzone strony (status: ok, error)")
+METRICS.histogram(
+    "inwestor_parse_seconds",
+    "Czas czyszczenia HTML (clean_and_extract_text)",
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+METRICS.histogram(
+    "inwestor_llm_latency_seconds",
+    "Czas odpowiedzi modelu",
+    (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+
+
+class MetricsTextfileWriter:
+    """
+    Wątek okresowo zapisujący metryki do pliku (kolektor textfile
+    node-exportera). Zapis jest atomowy, więc kolektor nigdy nie widzi
+    niepełnego pliku; ostatni zapis następuje przy zakończeniu.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        interval: float = 15.0,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        self.path = Path(path)
+        self.interval = interval
+        self.registry = registry or METRICS
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "MetricsTextfileWriter":
+        self.write()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+    def write(self) -> bool:
+        """
+        Zapisuje bieżący stan metryk.
+
+        Returns:
+            bool: True jeśli zapisano pomyślnie
+        """
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            _atomic_write(self.path, self.registry.render().encode("utf-8"))
+            return True
+        except OSError as e:
+            print(f"Blad podczas zapisywania metryk {self.path}: {e}")
+            return False
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write()
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    """Zwraca percentyl q (0-100) metodą najbliższej rangi."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def aggregate_profiles(profiles: list) -> dict:
+    """
+    Agreguje raporty --profile wielu stron do percentyli p50/p95/p99.
+
+    Args:
+        profiles: Lista raportów StageProfiler.report()
+
+    Returns:
+        dict: {etap: {"count", "wall_s": {p50, p95, p99, max}, "cpu_s": {...},
+            "mem_peak_bytes": {...} (tylko z --memprofile), "bytes_in",
+            "bytes_out"}}
+    """
+    samples: dict[str, dict] = {}
+    for profile in profiles:
+        for record in profile.get("stages", []):
+            stage = samples.setdefault(
+                record["stage"],
+                {
+                    "wall_s": [],
+                    "cpu_s": [],
+                    "mem_peak_bytes": [],
+                    "bytes_in": 0,
+                    "bytes_out": 0,
+                },
+            )
+            stage["wall_s"].append(record["wall_s"])
+            stage["cpu_s"].append(record["cpu_s"])
+            if "mem_peak_bytes" in record:
+                stage["mem_peak_bytes"].append(record["mem_peak_bytes"])
+            stage["bytes_in"] += record["bytes_in"]
+            stage["bytes_out"] += record["bytes_out"]
+
+    aggregated = {}
+    for name, stage in samples.items():
+        aggregated[name] = {"count": len(stage["wall_s"])}
+        for key in ("wall_s", "cpu_s", "mem_peak_bytes"):
+            values = sorted(stage[key])
+            if not values:
+                continue
+            aggregated[name][key] = {
+                "p50": _percentile(values, 50),
+                "p95": _percentile(values, 95),
+                "p99": _percentile(values, 99),
+                "max": values[-1],
+            }
+        aggregated[name]["bytes_in"] = stage["bytes_in"]
+        aggregated[name]["bytes_out"] = stage["bytes_out"]
+    return aggregated
+
+
+def write_json_report(path: Path, report: dict) -> bool:
+    """
+    Zapisuje raport JSON (np. profil) obok broszury.
+
+    Args:
+        path: Ścieżka pliku
+        report: Dane raportu
+
+    Returns:
+        bool: True jeśli zapisano pomyślnie
+    """
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return True
+    except Exception as e:
+        print(f"Blad podczas zapisywania raportu {path}: {e}")
+        return False
+
+
+@dataclass
+class RunOptions:
+    """Ustawienia przetwarzania współdzielone przez wszystkie strony."""
+
+    api_key: str
+    max_subpages: int = 5
+    verbose: bool = False
+    quiet: bool = False
+    session: Any = None
+    client: Any = None
+    artifacts: Optional[ArtifactStore] = None
+    artifact_ttl: float = 3600.0
+    profile: bool = False
+    memprofile: bool = False
+    tracer: Optional[TraceExporter] = None
+    max_html_bytes: Optional[int] = None
+    max_text_chars: Optional[int] = None
+    max_combined_chars: Optional[int] = None
+    corpus: Optional[CorpusWriter] = None
+    fact_excerpt_chars: Optional[int] = None
+    passages_top_k: Optional[int] = None
+    content_budget: Optional[int] = None
+    site_deadline: Optional[float] = None
+    fetch_limiter: Any = None
+    single_flight: Optional[SingleFlight] = None
+    incremental: bool = False
+
+
+@dataclass
+class SiteResult:
+    """Wynik przetwarzania jednej strony (tryb pojedynczy i wsadowy)."""
+
+    url: str
+    ok: bool
+    output_path: Optional[str] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    skipped: bool = False
+    profile: Optional[dict] = None
+    usage: Optional[dict] = None
+    degraded: list = field(default_factory=list)
+
+
+def _log(options: RunOptions, message: str) -> None:
+    """Wypisuje komunikat postępu, chyba że tryb cichy jest włączony."""
+    if not options.quiet:
+        print(message)
+
+
+def _utf8_len(text: str) -> int:
+    """Zwraca długość napisu w bajtach UTF-8 (bez kopii dla tekstu ASCII)."""
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+class PageRecord:
+    """
+    Strona przetwarzana w potoku (strona główna lub podstrona).
+
+    Rozmiar, liczba znaków i słów oraz skrót treści są liczone raz, przy
+    ustawieniu tekstu. Tekst może być trzymany w pamięci albo zwolniony
+    (offload) i wczytywany leniwie z dysku. Rekord jest prawdziwy, gdy ma
+    niepusty tekst, a len() zwraca liczbę znaków - analizy mogą więc
+    przyjmować zamiennie napisy i rekordy.
+    """
+
+    __slots__ = (
+        "url",
+        "status",
+        "html",
+        "byte_size",
+        "char_count",
+        "word_count",
+        "content_hash",
+        "_text",
+        "_loader",
+    )
+
+    def __init__(self, url: str, html: Optional[str] = None):
+        self.url = url
+        self.status = "fetched" if html else "fetch_error"
+        self.html = html
+        self.byte_size = _utf8_len(html) if html else 0
+        self.char_count = 0
+        self.word_count = 0
+        self.content_hash: Optional[str] = None
+        self._text = ""
+        self._loader: Optional[Callable[[], Optional[str]]] = None
+
+    @property
+    def text(self) -> str:
+        """Oczyszczony tekst strony (z pamięci lub wczytany z dysku)."""
+        if self._loader is not None:
+            return self._loader() or ""
+        return self._text
+
+    def set_text(self, text: Optional[str]) -> None:
+        """
+        Ustawia oczyszczony tekst i liczy jego statystyki.
+
+        Args:
+            text: Oczyszczony tekst (None lub pusty oznacza brak treści)
+        """
+        self._text = text or ""
+        self._loader = None
+        self.char_count = len(self._text)
+        self.word_count = len(self._text.split())
+        self.content_hash = content_hash(self._text) if self._text else None
+        self.status = "ok" if self._text else "empty"
+
+    def offload(self, loader: Callable[[], Optional[str]]) -> None:
+        """
+        Zwalnia tekst z pamięci; kolejne odczyty użyją loader().
+
+        Args:
+            loader: Funkcja wczytująca tekst (np. z magazynu artefaktów)
+        """
+        if self._text:
+            self._loader = loader
+            self._text = ""
+
+    def __bool__(self) -> bool:
+        return self.char_count > 0
+
+    def __len__(self) -> int:
+        return self.char_count
+
+    def __repr__(self) -> str:
+        return (
+            f"PageRecord(url={self.url!r}, status={self.status!r}, "
+            f"chars={self.char_count})"
+        )
+
+    def as_dict(self) -> dict:
+        """Zwraca metadane strony (bez tekstu) jako słownik."""
+        return {
+            "url": self.url,
+            "status": self.status,
+            "byte_size": self.byte_size,
+            "char_count": self.char_count,
+            "word_count": self.word_count,
+            "content_hash": self.content_hash,
+        }
+
+
+@dataclass
+class SiteJob:
+    """Stan przetwarzania jednej strony przekazywany między etapami."""
+
+    url: str
+    output: Optional[str] = None
+    include_path: bool = False
+    main_page: Optional[PageRecord] = None
+    subpages: list = field(default_factory=list)
+    combined_text: str = ""
+    output_path: Optional[str] = None
+    error: Optional[str] = None
+    started: float = field(default_factory=time.perf_counter)
+    profiler: StageProfiler = field(
+        default_factory=lambda: StageProfiler(enabled=False)
+    )
+    llm_usage: Optional[dict] = None
+    degraded: list = field(default_factory=list)
+    skipped_subpages: list = field(default_factory=list)
+    started_ns: int = field(default_factory=time.time_ns)
+    tracer: Optional[TraceExporter] = None
+    deadline: Optional[float] = None
+    fetch_deadline: Optional[float] = None
+    validators: Optional[dict] = None
+    subpage_validators: Optional[dict] = None
+    not_modified: bool = False
+
+    def pages(self) -> list:
+        """Zwraca rekordy strony głównej i podstron (w tej kolejności)."""
+        return ([self.main_page] if self.main_page else []) + self.subpages
+
+    def start_deadline(self, seconds: Optional[float]) -> None:
+        """
+        Ustawia limit czasu całej strony (--site-deadline) liczony od teraz.
+
+        Pobieranie może zużyć najwyżej SITE_DEADLINE_FETCH_SHARE limitu,
+        reszta jest zostawiana na czyszczenie i generowanie broszury.
+
+        Args:
+            seconds: Limit czasu w sekundach (None = bez limitu)
+        """
+        if not seconds:
+            return
+        now = time.perf_counter()
+        self.deadline = now + seconds
+        self.fetch_deadline = now + seconds * SITE_DEADLINE_FETCH_SHARE
+
+    def time_left(self, fetch: bool = False) -> Optional[float]:
+        """
+        Zwraca liczbę sekund pozostałych do limitu czasu strony.
+
+        Args:
+            fetch: Czy liczyć do końca czasu przeznaczonego na pobieranie
+
+        Returns:
+            float: Pozostały czas (może być ujemny) lub None bez limitu
+        """
+        deadline = self.fetch_deadline if fetch else self.deadline
+        if deadline is None:
+            return None
+        return deadline - time.perf_counter()
+
+    def fail(self, message: str) -> bool:
+        """Oznacza zadanie jako nieudane i zwraca False."""
+        print(f"Blad: {message}")
+        self.error = message
+        return False
+
+    def output_filename(self) -> str:
+        """Zwraca nazwę pliku broszury (bez katalogu)."""
+        return self.output or default_output_filename(self.url, self.include_path)
+
+    def to_result(self) -> SiteResult:
+        """Tworzy SiteResult na podstawie stanu zadania."""
+        elapsed = time.perf_counter() - self.started
+        profile = None
+        if self.profiler.enabled:
+            profile = self.profiler.report()
+            profile["total_wall_s"] = round(elapsed, 6)
+            profile["ok"] = self.error is None
+            profile["degraded"] = self.degraded
+            profile["skipped_subpages"] = self.skipped_subpages
+        return SiteResult(
+            url=self.url,
+            ok=self.error is None and self.output_path is not None,
+            output_path=self.output_path,
+            error=self.error,
+            elapsed=elapsed,
+            profile=profile,
+            usage=self.llm_usage,
+            degraded=list(self.degraded),
+        )
+
+
+def new_site_job(
+    url: str,
+    options: "RunOptions",
+    output: Optional[str] = None,
+    include_path: bool = False,
+) -> SiteJob:
+    """
+    Tworzy zadanie przetwarzania strony z profilerem zgodnym z ustawieniami.
+
+    Args:
+        url: URL strony
+        options: Wspólne ustawienia przetwarzania
+        output: Nazwa pliku wyjściowego
+        include_path: Czy dołączyć ścieżkę URL do domyślnej nazwy pliku
+
+    Returns:
+        SiteJob: Nowe zadanie
+    """
+    return SiteJob(
+        url=url,
+        output=output,
+        include_path=include_path,
+        profiler=StageProfiler(
+            url,
+            enabled=options.profile,
+            memory=options.memprofile,
+            trace=options.tracer is not None,
+        ),
+        tracer=options.tracer,
+    )
+
+
+def record_site_metrics(result: SiteResult) -> None:
+    """
+    Aktualizuje metryki procesu (METRICS) wynikiem przetwarzania strony.
+
+    Args:
+        result: Wynik przetwarzania strony
+    """
+    METRICS.inc("inwestor_sites_total", status="ok" if result.ok else "error")
+    if result.ok:
+        METRICS.inc("inwestor_brochures_written_total")
+    usage = result.usage
+    if not usage or usage.get("cached_result"):
+        return
+    METRICS.observe("inwestor_llm_latency_seconds", usage["latency_s"])
+    for kind in ("prompt", "completion", "cached"):
+        METRICS.inc("inwestor_llm_tokens_total", usage[f"{kind}_tokens"], type=kind)
+    if usage.get("cost_usd"):
+        METRICS.inc("inwestor_llm_cost_usd_total", usage["cost_usd"])
+
+
+def finish_site_job(job: SiteJob) -> SiteResult:
+    """
+    Kończy zadanie: zapisuje metadane (zużycie tokenów i koszt), raport
+    --profile obok broszury oraz ślad --trace i zwraca wynik.
+
+    Args:
+        job: Zakończone zadanie
+
+    Returns:
+        SiteResult: Wynik przetwarzania strony
+    """
+    result = job.to_result()
+    record_site_metrics(result)
+    if result.ok and result.usage is not None:
+        meta_path = get_output_path(job.output_filename()).with_suffix(".meta.json")
+        write_json_report(
+            meta_path,
+            {
+                "url": result.url,
+                "generated_at": datetime.now().isoformat(timespec="seconds"),
+                "combined_chars": len(job.combined_text),
+                "elapsed_s": round(result.elapsed, 6),
+                "llm": result.usage,
+                "degraded": result.degraded,
+                "skipped_subpages": job.skipped_subpages,
+            },
+        )
+    if result.profile is not None:
+        profile_path = get_output_path(job.output_filename()).with_suffix(
+            ".profile.json"
+        )
+        if write_json_report(profile_path, result.profile):
+            print(f"Profil zapisany do pliku: {profile_path}")
+    if job.tracer is not None:
+        usage = result.usage or {}
+        attributes = {
+            "ok": result.ok,
+            "output_path": result.output_path,
+            "combined_chars": len(job.combined_text),
+            "subpages": len(job.subpages),
+            "llm.prompt_tokens": usage.get("prompt_tokens"),
+            "llm.completion_tokens": usage.get("completion_tokens"),
+            "llm.cost_usd": usage.get("cost_usd"),
+            "degraded": len(result.degraded),
+            "skipped_subpages": len(job.skipped_subpages),
+        }
+        try:
+            job.tracer.export(
+                job.profiler.spans(
+                    job.started_ns, time.time_ns(), attributes, result.error
+                )
+            )
+        except OSError as e:
+            print(f"Blad podczas zapisywania sladu {job.tracer.path}: {e}")
+    return result
+
+
+def truncate_utf8(text: str, max_bytes: int) -> str:
+    """
+    Skraca napis tak, aby po zakodowaniu w UTF-8 miał najwyżej max_bytes.
+
+    Args:
+        text: Napis do skrócenia
+        max_bytes: Limit bajtów
+
+    Returns:
+        str: Napis w limicie (ucięty znak wielobajtowy jest pomijany)
+    """
+    # Znak UTF-8 ma najwyżej 4 bajty - krótkich napisów nie trzeba kodować
+    if len(text) * 4 <= max_bytes:
+        return text
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[:max_bytes].decode("utf-8", errors="ignore")
+
+
+def truncate_text(text: str, max_chars: int) -> str:
+    """
+    Skraca tekst do max_chars znaków, preferując granicę słowa.
+
+    Args:
+        text: Tekst do skrócenia
+        max_chars: Limit znaków
+
+    Returns:
+        str: Tekst w limicie
+    """
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars + 1)
+    if cut < max_chars // 2:
+        cut = max_chars
+    return text[:cut].rstrip()
+
+
+# Część limitu --site-deadline dostępna dla pobierania stron; reszta jest
+# zostawiana na czyszczenie i wywołanie modelu
+SITE_DEADLINE_FETCH_SHARE = 0.5
+
+# Najkrótszy sensowny timeout żądania - krótszych żądań nie rozpoczynamy
+MIN_REQUEST_TIMEOUT = 1.0
+
+
+def _deadline_timeout(left: Optional[float], default: float = 30.0) -> dict:
+    """
+    Zwraca argument timeout żądania ograniczony pozostałym czasem strony.
+
+    Args:
+        left: Pozostały czas w sekundach (None = bez limitu --site-deadline)
+        default: Domyślny timeout żądania w sekundach
+
+    Returns:
+        dict: {"timeout": sekundy} lub pusty słownik bez limitu
+    """
+    if left is None:
+        return {}
+    return {"timeout": max(min(default, left), MIN_REQUEST_TIMEOUT)}
+
+
+def _fetch_kwargs(options: RunOptions, left: Optional[float]) -> dict:
+    """
+    Zwraca argumenty fetch_html / fetch_subpage_content dla etapu pobierania.
+
+    Args:
+        options: Wspólne ustawienia przetwarzania (sesja, limiter hostów)
+        left: Pozostały czas pobierania (None = bez limitu --site-deadline)
+
+    Returns:
+        dict: Argumenty nazwane pobierania
+    """
+    kwargs = {"session": options.session, **_deadline_timeout(left)}
+    if left is not None:
+        # timeout requests dotyczy pojedynczego odczytu z gniazda - łączny
+        # czas pobierania ogranicza termin sprawdzany przez _read_limited
+        kwargs["deadline"] = time.perf_counter() + left
+    if options.fetch_limiter is not None:
+        kwargs["limiter"] = options.fetch_limiter
+    if options.max_html_bytes:
+        kwargs["max_bytes"] = options.max_html_bytes
+    return kwargs
+
+
+class ContentBudget:
+    """
+    Licznik unikalnej treści zebranej dla strony (--content-budget).
+
+    Treść jest liczona po zdaniach - zdania powtarzające się na kolejnych
+    podstronach (menu, stopka, banery) są liczone tylko raz.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._seen: set = set()
+
+    def add(self, text: str) -> int:
+        """
+        Dolicza tekst strony i zwraca liczbę nowych (unikalnych) znaków.
+
+        Args:
+            text: Oczyszczony tekst strony
+
+        Returns:
+            int: Liczba znaków zdań niewidzianych wcześniej
+        """
+        added = 0
+        for sentence in _SENTENCE_END_RE.split(text or ""):
+            key = sentence.strip().lower()
+            if key and key not in self._seen:
+                self._seen.add(key)
+                added += len(key)
+        self.used += added
+        return added
+
+    @property
+    def exhausted(self) -> bool:
+        """Czy zebrano już co najmniej limit znaków unikalnej treści."""
+        return self.used >= self.limit
+
+
+# Limity RunOptions i funkcje, które skracają dane po ich przekroczeniu
+CAPS = {
+    "max_html_bytes": truncate_utf8,
+    "max_text_chars": truncate_text,
+    "max_combined_chars": truncate_text,
+}
+
+
+def apply_cap(
+    job: SiteJob,
+    options: RunOptions,
+    cap: str,
+    data: Optional[str],
+    url: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Egzekwuje twardy limit rozmiaru (HTML, oczyszczony tekst, combined_text).
+
+    Zamiast przerywać przetwarzanie, dane są skracane, a fakt degradacji
+    jest zapisywany w zadaniu (trafia do metadanych i dziennika).
+
+    Args:
+        job: Zadanie przetwarzania strony
+        options: Wspólne ustawienia przetwarzania
+        cap: Nazwa limitu z CAPS (pole RunOptions)
+        data: Dane do sprawdzenia
+        url: URL, którego dotyczą dane (domyślnie URL zadania)
+
+    Returns:
+        str: Dane w limicie (lub niezmienione, gdy limit jest wyłączony)
+    """
+    limit = getattr(options, cap)
+    if not limit or not data:
+        return data
+
+    capped = CAPS[cap](data, limit)
+    if len(capped) < len(data):
+        url = url or job.url
+        job.degraded.append(
+            {"cap": cap, "url": url, "limit": limit, "original_chars": len(data)}
+        )
+        _log(
+            options,
+            f"  [LIMIT] {url}: przekroczono {cap}={limit} "
+            f"({len(data)} znakow), dane skrocone",
+        )
+    return capped
+
+
+def stage_fetch(job: SiteJob, options: RunOptions) -> bool:
+    """
+    Etap sieciowy: pobiera główną stronę, wyszukuje i pobiera podstrony.
+
+    Args:
+        job: Zadanie przetwarzania strony
+        options: Wspólne ustawienia przetwarzania
+
+    Returns:
+        bool: True jeśli można przejść do kolejnego etapu
+    """
+    if not is_valid_url(job.url):
+        return job.fail("Podany URL nie jest prawidlowy.")
+
+    # Limit czasu strony obejmuje pobieranie, czyszczenie i generowanie
+    job.start_deadline(options.site_deadline)
+
+    # Pobierz zawartość strony
+    _log(options, "Pobieranie zawartosci strony...")
+    with job.profiler.stage("fetch_html") as record:
+        if job.validators is not None:
+            # Tryb --watch: żądanie warunkowe z walidatorami z poprzedniej
+            # wizyty, z pominięciem magazynu artefaktów
+            html, job.not_modified = fetch_html_conditional(
+                job.url,
+                job.validators,
+                **_fetch_kwargs(options, job.time_left(fetch=True)),
+            )
+        else:
+            html = cached_stage(
+                options,
+                job.url,
+                "html",
+                content_hash(normalize_url(job.url)),
+                lambda: fetch_html(
+                    job.url, **_fetch_kwargs(options, job.time_left(fetch=True))
+                ),
+                max_age=options.artifact_ttl,
+            )
+        html = apply_cap(job, options, "max_html_bytes", html)
+        job.main_page = PageRecord(job.url, html)
+        record.io(data_out=html)
+        if job.not_modified:
+            record.set("http.not_modified", True)
+        elif not html:
+            record.fail("Nie udalo sie pobrac zawartosci strony")
+        else:
+            METRICS.inc("inwestor_pages_fetched_total", kind="main")
+
+    if job.not_modified:
+        _log(options, "Strona nie zmienila sie od ostatniej wizyty (HTTP 304).")
+        return False
+
+    if not html:
+        return job.fail("Nie udalo sie pobrac zawartosci strony.")
+
+    # Z budżetem treści strony są czyszczone od razu po pobraniu, by wiedzieć,
+    # ile unikalnej treści już zebrano (etap czyszczenia je pominie)
+    budget = None
+    if options.content_budget:
+        budget = ContentBudget(options.content_budget)
+        _clean_page(job, options, job.main_page)
+        budget.add(job.main_page.text)
+
+    # Znajdź linki do podstron
+    _log(options, "Wyszukiwanie linkow do podstron...")
+    with job.profiler.stage("find_subpage_links") as record:
+        subpage_links = find_subpage_links(html, job.url, options.max_subpages)
+        record.io(html, subpage_links)
+    if subpage_links:
+        _log(options, f"Znaleziono {len(subpage_links)} podstron do analizy:")
+        for i, link in enumerate(subpage_links, 1):
+            _log(options, f"  {i}. {link}")
+    else:
+        _log(options, "Nie znaleziono podstron do analizy.")
+
+    # Pobierz zawartość z podstron
+    if subpage_links:
+        _log(options, "Pobieranie zawartosci z podstron...")
+        _fetch_subpages(job, options, subpage_links, budget)
+
+    return True
+
+
+# Znacznik podstrony pominiętej przez brak czasu (--site-deadline)
+_DEADLINE_SKIPPED = object()
+
+
+def _fetch_subpage(
+    job: SiteJob, options: RunOptions, subpage_url: str, i: int, total: int
+) -> Any:
+    """
+    Pobiera jedną podstronę (w wątku puli _fetch_subpages).
+
+    Returns:
+        str: HTML podstrony, None po błędzie lub _DEADLINE_SKIPPED, gdy
+            nie starczyło czasu na żądanie
+    """
+    left = job.time_left(fetch=True)
+    if left is not None and left < MIN_REQUEST_TIMEOUT:
+        return _DEADLINE_SKIPPED
+    _log(options, f"Pobieranie podstrony {i}/{total}: {subpage_url}")
+    with job.profiler.stage("fetch_subpage_content", subpage_url) as record:
+        if job.subpage_validators is not None:
+            # Tryb --watch: walidatory podstrony są zapamiętywane do kolejnej
+            # wizyty, z pominięciem magazynu artefaktów
+            validators: dict = {}
+            subpage_html, _ = fetch_html_conditional(
+                subpage_url, validators, **_fetch_kwargs(options, left)
+            )
+            job.subpage_validators[subpage_url] = validators
+        else:
+            subpage_html = cached_stage(
+                options,
+                subpage_url,
+                "html",
+                content_hash(normalize_url(subpage_url)),
+                lambda: fetch_subpage_content(
+                    subpage_url, **_fetch_kwargs(options, left)
+                ),
+                max_age=options.artifact_ttl,
+            )
+        subpage_html = apply_cap(
+            job, options, "max_html_bytes", subpage_html, subpage_url
+        )
+        record.io(data_out=subpage_html)
+        if not subpage_html:
+            record.fail("Nie udalo sie pobrac zawartosci podstrony")
+        else:
+            METRICS.inc("inwestor_pages_fetched_total", kind="subpage")
+    return subpage_html
+
+
+def _fetch_subpages(
+    job: SiteJob, options: RunOptions, subpage_links: list, budget: Any
+) -> None:
+    """
+    Pobiera podstrony równolegle, zachowując kolejność trafności.
+
+    Z limiterem hostów (options.fetch_limiter) w toku jest najwyżej
+    limiter.maximum pobrań, a faktyczną liczbę równoczesnych żądań do hosta
+    wyznacza jego adaptacyjny limit (acquire/release w _http_get). Bez
+    limitera podstrony są pobierane po kolei. Wyniki są przetwarzane
+    w kolejności linków, więc budżet treści i limit czasu pomijają zawsze
+    najniżej ocenione podstrony; pobrania jeszcze nierozpoczęte są wtedy
+    anulowane.
+
+    Args:
+        job: Zadanie przetwarzania strony
+        options: Wspólne ustawienia przetwarzania
+        subpage_links: Linki do podstron (od najtrafniejszego)
+        budget: Opcjonalny ContentBudget
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    limiter = options.fetch_limiter
+    workers = limiter.maximum if limiter is not None else 1
+    total = len(subpage_links)
+    futures: list = []
+
+    def skip_rest(i: int, reason: str, message: str) -> None:
+        for future in futures[i:]:
+            future.cancel()
+        _skip_subpages(job, options, subpage_links[i:], reason, message)
+
+    with ThreadPoolExecutor(max_workers=min(workers, total)) as executor:
+        for i, subpage_url in enumerate(subpage_links):
+            if budget is not None and budget.exhausted:
+                skip_rest(
+                    i,
+                    "budget",
+                    f"[BUDGET] Zebrano {budget.used} znakow unikalnej tresci "
+                    f"(limit {budget.limit})",
+                )
+                break
+            # Okno pobrań: bieżąca podstrona i najwyżej workers - 1 kolejnych
+            while len(futures) < min(i + workers, total):
+                n = len(futures)
+                futures.append(
+                    executor.submit(
+                        _fetch_subpage, job, options, subpage_links[n], n + 1, total
+                    )
+                )
+            subpage_html = futures[i].result()
+            if subpage_html is _DEADLINE_SKIPPED:
+                skip_rest(
+                    i,
+                    "deadline",
+                    f"[DEADLINE] Wyczerpano czas na pobieranie "
+                    f"(limit strony {options.site_deadline:g}s)",
+                )
+                break
+            if not subpage_html:
+                _log(options, f"  [ERROR] Nie udalo sie pobrac {subpage_url}")
+            page = PageRecord(subpage_url, subpage_html)
+            job.subpages.append(page)
+            if budget is not None and subpage_html:
+                _clean_page(job, options, page)
+                budget.add(page.text)
+
+
+def _skip_subpages(
+    job: SiteJob, options: RunOptions, links: list, reason: str, message: str
+) -> None:
+    """
+    Pomija pozostałe (niżej ocenione) podstrony bez ich pobierania.
+
+    Args:
+        job: Zadanie przetwarzania strony
+        options: Wspólne ustawienia przetwarzania
+        links: Pominięte adresy podstron
+        reason: Powód dla metryki (budget, deadline)
+        message: Komunikat dziennika poprzedzający listę adresów
+    """
+    job.skipped_subpages.extend(links)
+    METRICS.inc("inwestor_pages_skipped_total", len(links), reason=reason)
+    _log(options, f"{message} - pomijam {len(links)} podstron:")
+    for link in links:
+        _log(options, f"  - {link}")
+
+
+def stage_clean(job: SiteJob, options: RunOptions) -> bool:
+    """
+    Etap CPU: czyści HTML wszystkich stron i łączy treść w jeden tekst.
+
+    Args:
+        job: Zadanie przetwarzania strony
+        options: Wspólne ustawienia przetwarzania
+
+    Returns:
+        bool: True jeśli można przejść do kolejnego etapu
+    """
+    # Wyczyść i ekstraktuj tekst z głównej strony
+    _log(options, "Czyszczenie i ekstraktowanie tekstu z glownej strony...")
+    if job.main_page.html:
+        _clean_page(job, options, job.main_page)
+
+    if not job.main_page:
+        return job.fail("Nie udalo sie wyodrebnic tekstu ze strony.")
+
+    for page in job.subpages:
+        if page.html:
+            _clean_page(job, options, page)
+            if page:
+                _log(options, f"  [OK] {page.url}: {page.char_count} znakow")
+            else:
+                _log(options, f"  [ERROR] {page.url}: brak tekstu")
+
+    # Połącz treść z głównej strony i podstron; klucz magazynu artefaktów
+    # powstaje ze skrótów tekstów stron, bez sklejania pełnych tekstów, i ze
+    # znormalizowanych adresów (warianty URL dają ten sam prompt)
+    _log(options, "Laczenie tresci z wszystkich stron...")
+    prompt_inputs = "\0".join(
+        [normalize_url(job.url)]
+        + [
+            f"{normalize_url(page.url)}\0{page.content_hash or ''}"
+            for page in job.pages()
+        ]
+    )
+    if options.fact_excerpt_chars is not None:
+        prompt_inputs += f"\0facts:{options.fact_excerpt_chars}"
+    if options.passages_top_k is not None:
+        prompt_inputs += f"\0passages:{options.passages_top_k}"
+    job.combined_text = cached_stage(
+        options,
+        job.url,
+        "prompt",
+        content_hash(prompt_inputs),
+        lambda: _combine_job_content(job, options),
+    )
+    job.combined_text = apply_cap(job, options, "max_combined_chars", job.combined_text)
+
+    if options.corpus is not None:
+        _append_to_corpus(job, options.corpus)
+
+    # Teksty stron trafiły do combined_text - zwolnij je z pamięci przed
+    # kolejką LLM (pozostają dostępne w magazynie artefaktów)
+    if options.artifacts is not None:
+        for page in job.pages():
+            if page:
+                digest = options.artifacts.put(page.text)
+                page.offload(lambda digest=digest: options.artifacts.get_text(digest))
+
+    _log(
+        options,
+        f"Pobrano i wyczyszczono {len(job.combined_text)} znakow tekstu "
+        f"(glowna strona + {len(job.subpages)} podstron).",
+    )
+
+    if options.verbose:
+        try:
+            print(f"Przykladowy tekst: {job.combined_text[:200]}...")
+        except UnicodeEncodeError:
+            print("Przykladowy tekst: [tekst zawiera znaki specjalne]")
+
+    return True
+
+
+def _append_to_corpus(job: SiteJob, corpus: CorpusWriter) -> None:
+    """Dopisuje oczyszczone teksty stron do korpusu (błąd nie przerywa pracy)."""
+    try:
+        for page in job.pages():
+            if page:
+                corpus.append(page.url, page.text, site=job.url)
+    except OSError as e:
+        print(f"Blad podczas zapisu korpusu dla {job.url}: {e}")
+
+
+def _clean_page(job: SiteJob, options: RunOptions, page: PageRecord) -> None:
+    """
+    Czyści HTML strony (z magazynu artefaktów, jeśli jest) i ustawia tekst
+    rekordu. Surowy HTML jest zwalniany po oczyszczeniu.
+    """
+    html_content = page.html or ""
+    with job.profiler.stage("clean_and_extract_text", page.url) as record:
+        text = cached_stage(
+            options,
+            page.url,
+            "text",
+            content_hash(html_content),
+            lambda: _timed_clean(html_content, page.url),
+        )
+        text = apply_cap(job, options, "max_text_chars", text, page.url)
+        record.io(html_content, text)
+    page.set_text(text)
+    # Surowy HTML nie jest już potrzebny - zwolnij pamięć przed kolejką LLM
+    page.html = None
+
+
+def _timed_clean(html_content: str, url: str) -> str:
+    """Wywołuje clean_and_extract_text i zapisuje czas w histogramie metryk."""
+    started = time.perf_counter()
+    text = clean_and_extract_text(html_content, url)
+    METRICS.observe("inwestor_parse_seconds", time.perf_counter() - started)
+    return text
+
+
+def _combine_job_content(job: SiteJob, options: RunOptions) -> str:
+    """
+    Łączy treść wszystkich stron zadania i dodaje analizę podstron.
+
+    Adresy w prompcie są znormalizowane, aby warianty tego samego URL
+    dawały identyczny prompt (i jedno wywołanie modelu).
+    """
+    base_url = normalize_url(job.url)
+    if options.passages_top_k is not None:
+        # Tylko najtrafniejsze fragmenty dla każdej sekcji broszury
+        with job.profiler.stage("rank_passages") as record:
+            combined_text = build_ranked_prompt(
+                [(normalize_url(page.url), page.text) for page in job.pages() if page],
+                base_url,
+                options.passages_top_k,
+            )
+            record.io(data_out=combined_text)
+    else:
+        with job.profiler.stage("combine_content_from_pages") as record:
+            combined_text = combine_content_from_pages(
+                job.main_page, job.subpages, base_url
+            )
+            record.io(data_out=combined_text)
+
+    # Dodaj analizę podstron
+    if job.subpages:
+        _log(options, "Analizowanie tresci z podstron...")
+        with job.profiler.stage("analyze_subpages_content") as record:
+            subpages_analysis = analyze_subpages_content(job.subpages)
+            record.io(data_out=subpages_analysis)
+        combined_text += f"\n\n{subpages_analysis}"
+
+    # Tabela faktów i skrócony fragment tekstu zamiast pełnej treści
+    if options.fact_excerpt_chars is not None:
+        with job.profiler.stage("extract_facts") as record:
+            facts = extract_facts([page.text for page in job.pages() if page])
+            combined_text = build_fact_prompt(
+                facts, combined_text, options.fact_excerpt_chars
+            )
+            fact_count = sum(len(values) for values in facts.values())
+            record.set("facts.count", fact_count)
+            record.io(data_out=combined_text)
+        _log(
+            options,
+            f"Wyodrebniono {fact_count} faktow, "
+            f"tresc dla modelu: {len(combined_text)} znakow.",
+        )
+    return combined_text
+
+
+def stage_generate(job: SiteJob, options: RunOptions) -> bool:
+    """
+    Etap LLM: generuje broszurę i zapisuje ją do pliku.
+
+    Args:
+        job: Zadanie przetwarzania strony
+        options: Wspólne ustawienia przetwarzania
+
+    Returns:
+        bool: True jeśli broszura została zapisana
+    """
+    _log(options, "Generowanie broszury inwestycyjnej...")
+    left = job.time_left()
+    if left is not None and left < MIN_REQUEST_TIMEOUT:
+        return job.fail(
+            f"Przekroczono limit czasu strony ({options.site_deadline:g}s) "
+            "przed generowaniem broszury."
+        )
+    # Znacznik czasu (DATA ANALIZY) nie wchodzi do klucza - inaczej zadania
+    # przetwarzane w różnych sekundach nie łączyłyby wywołań modelu
+    brochure_inputs = "\0".join(
+        [
+            OPENAI_MODEL,
+            get_system_prompt(),
+            _VOLATILE_PROMPT_RE.sub("", job.combined_text),
+        ]
+    )
+    usage: dict = {}
+    llm_kwargs = {
+        "client": options.client,
+        "usage": usage,
+        **_deadline_timeout(left, default=LLM_TIMEOUT),
+    }
+    if left is not None:
+        # Klient OpenAI domyślnie ponawia żądanie po timeout, co mnożyłoby
+        # czas oczekiwania ponad pozostały limit strony
+        llm_kwargs["max_retries"] = 0
+    with job.profiler.stage("generate_brochure") as record:
+        if options.incremental:
+            brochure = _generate_incremental(job, options, llm_kwargs, record)
+        else:
+            brochure = cached_stage(
+                options,
+                job.url,
+                "brochure",
+                content_hash(brochure_inputs),
+                lambda: generate_brochure(
+                    job.combined_text, options.api_key, **llm_kwargs
+                ),
+            )
+        record.io(job.combined_text, brochure)
+        if not brochure:
+            record.fail("Nie udalo sie wygenerowac broszury")
+        for key in ("model", "prompt_tokens", "completion_tokens", "cached_tokens"):
+            if key in usage:
+                record.set(f"llm.{key}", usage[key])
+
+    if not brochure:
+        return job.fail("Nie udalo sie wygenerowac broszury.")
+
+    # Broszura z magazynu artefaktów nie kosztuje nic
+    job.llm_usage = usage or {
+        **llm_usage_record(None, OPENAI_MODEL, 0.0, len(job.combined_text)),
+        "cost_usd": 0.0,
+        "cached_result": True,
+    }
+
+    # Zapisz broszurę do pliku
+    output_filename = job.output_filename()
+
+    with job.profiler.stage("save_markdown_file") as record:
+        saved = save_markdown_file(output_filename, brochure)
+        record.io(brochure)
+    if not saved:
+        return job.fail("Nie udalo sie zapisac broszury.")
+
+    job.output_path = str(get_output_path(output_filename))
+    return True
+
+
+def _generate_incremental(
+    job: SiteJob, options: RunOptions, llm_kwargs: dict, record: Any
+) -> Optional[str]:
+    """
+    Generuje broszurę przyrostowo (--incremental): regeneruje tylko sekcje
+    dotknięte zmianami stron od poprzedniego uruchomienia i wstawia je
+    w miejsce poprzednich wersji.
+
+    Args:
+        job: Zadanie przetwarzania strony
+        options: Wspólne ustawienia przetwarzania
+        llm_kwargs: Argumenty generate_brochure (klient, usage, timeout,
+            max_retries)
+        record: Rekord etapu profilera
+
+    Returns:
+        str: Broszura lub None w przypadku błędu
+    """
+    pages = [(page.url, page.text) for page in job.pages() if page]
+    attribution = attribute_sections(pages)
+    current = {
+        url: {"fingerprint": content_fingerprint([text]), "sections": attribution[url]}
+        for url, text in pages
+    }
+    path = section_state_path(job.url)
+    state = load_section_state(path)
+    sections = dict(state["sections"]) if state else {}
+
+    affected = list(BROCHURE_SECTIONS)
+    if state is not None:
+        changed = set(affected_sections(state["pages"], current))
+        affected = [
+            name
+            for name in BROCHURE_SECTIONS
+            if name in changed or name not in sections
+        ]
+        if len(affected) > INCREMENTAL_MAX_SHARE * len(BROCHURE_SECTIONS):
+            affected = list(BROCHURE_SECTIONS)
+    record.set("llm.sections", len(affected))
+
+    if not affected:
+        _log(options, "[INCREMENTAL] Tresc bez zmian - broszura z poprzednich sekcji.")
+        return join_brochure_sections(sections)
+
+    if len(affected) == len(BROCHURE_SECTIONS):
+        brochure = generate_brochure(job.combined_text, options.api_key, **llm_kwargs)
+        if not brochure:
+            return None
+        sections = split_brochure_sections(brochure)
+    else:
+        _log(
+            options,
+            f"[INCREMENTAL] Regeneruje {len(affected)} z {len(BROCHURE_SECTIONS)} "
+            f"sekcji: {', '.join(affected)}",
+        )
+        partial = generate_brochure(
+            job.combined_text, options.api_key, sections=affected, **llm_kwargs
+        )
+        if not partial:
+            return None
+        # Tylko zamówione sekcje - wstęp odpowiedzi nie nadpisuje tytułu
+        regenerated = split_brochure_sections(partial)
+        sections.update(
+            {name: regenerated[name] for name in affected if name in regenerated}
+        )
+        brochure = join_brochure_sections(sections)
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"url": job.url, "pages": current, "sections": sections}
+        _atomic_write(path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+    except OSError as e:
+        print(f"Ostrzezenie: nie udalo sie zapisac stanu sekcji {path}: {e}")
+    return brochure
+
+
+PIPELINE_STAGES = (
+    ("fetch", stage_fetch),
+    ("clean", stage_clean),
+    ("llm", stage_generate),
+)
+
+
+def _run_stage(stage, job: SiteJob, options: RunOptions) -> bool:
+    """Uruchamia etap, zamieniając nieoczekiwane wyjątki na błąd zadania."""
+    try:
+        return stage(job, options)
+    except Exception as e:
+        return job.fail(f"Nieoczekiwany blad podczas przetwarzania strony: {e}")
+
+
+def process_site(
+    url: str,
+    options: RunOptions,
+    output: Optional[str] = None,
+    include_path: bool = False,
+) -> SiteResult:
+    """
+    Przetwarza jedną stronę: pobieranie, czyszczenie, generowanie i zapis.
+
+    Args:
+        url: URL strony do analizy
+        options: Wspólne ustawienia przetwarzania
+        output: Nazwa pliku wyjściowego (domyślnie: broszura_[domena])
+        include_path: Czy dołączyć ścieżkę URL do domyślnej nazwy pliku
+
+    Returns:
+        SiteResult: Wynik przetwarzania strony
+    """
+    job = new_site_job(url, options, output, include_path)
+    for _, stage in PIPELINE_STAGES:
+        if not _run_stage(stage, job, options):
+            break
+    return finish_site_job(job)
+
+
+def run_pipeline(
+    urls: list,
+    options: RunOptions,
+    stage_workers: Optional[dict] = None,
+    queue_size: int = 4,
+    on_result: Optional[Callable[[SiteResult], None]] = None,
+) -> list:
+    """
+    Przetwarza listę URL potokowo: etapy fetch, clean i llm działają
+    jednocześnie na różnych stronach i są połączone ograniczonymi kolejkami.
+
+    Gdy kolejka do kolejnego etapu jest pełna, etap poprzedni czeka
+    (backpressure), więc w pamięci jest najwyżej kilka stron naraz.
+
+    Args:
+        urls: Lista URL do przetworzenia
+        options: Wspólne ustawienia przetwarzania
+        stage_workers: Liczba wątków na etap, np. {"fetch": 4, "llm": 2}
+            (domyślnie 1 dla każdego etapu)
+        queue_size: Maksymalna liczba zadań oczekujących przed etapem
+        on_result: Funkcja wywoływana po zakończeniu każdej strony
+
+    Returns:
+        list: Lista SiteResult w kolejności zakończenia
+    """
+    stage_workers = stage_workers or {}
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in PIPELINE_STAGES]
+    results = []
+    results_lock = threading.Lock()
+    sentinel = None
+
+    def finish(job: SiteJob) -> None:
+        result = finish_site_job(job)
+        with results_lock:
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+    def worker(index: int) -> None:
+        _, stage = PIPELINE_STAGES[index]
+        while True:
+            job = queues[index].get()
+            if job is sentinel:
+                return
+            if not _run_stage(stage, job, options):
+                finish(job)
+            elif index + 1 < len(PIPELINE_STAGES):
+                queues[index + 1].put(job)
+            else:
+                finish(job)
+
+    threads = []
+    for index, (name, _) in enumerate(PIPELINE_STAGES):
+        count = max(1, stage_workers.get(name, 1))
+        stage_threads = [
+            threading.Thread(
+                target=worker, args=(index,), name=f"{name}-{n}", daemon=True
+            )
+            for n in range(count)
+        ]
+        for thread in stage_threads:
+            thread.start()
+        threads.append(stage_threads)
+
+    # Zasilaj pierwszy etap - put() blokuje, gdy kolejka jest pełna
+    for url in urls:
+        queues[0].put(new_site_job(url, options, include_path=True))
+
+    # Zamykaj etapy po kolei, gdy poprzedni etap opróżnił swoją kolejkę
+    for index, stage_threads in enumerate(threads):
+        for _ in stage_threads:
+            queues[index].put(sentinel)
+        for thread in stage_threads:
+            thread.join()
+
+    return results
+
+
+def read_urls_file(path: str) -> list:
+    """
+    Wczytuje listę URL z pliku tekstowego, CSV lub JSONL.
+
+    Plik tekstowy zawiera jeden URL na linię (linie puste i zaczynające się
+    od # są pomijane). W pliku CSV używana jest kolumna "url" lub pierwsza
+    kolumna. W pliku JSONL każda linia to obiekt z kluczem "url" lub napis.
+
+    Args:
+        path: Ścieżka do pliku z listą URL
+
+    Returns:
+        list: Lista unikalnych URL w kolejności wystąpienia
+    """
+    suffix = Path(path).suffix.lower()
+    urls = []
+
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if suffix == ".csv":
+            rows = list(csv.reader(f))
+            column = 0
+            if rows and "url" in [c.strip().lower() for c in rows[0]]:
+                column = [c.strip().lower() for c in rows[0]].index("url")
+                rows = rows[1:]
+            urls = [row[column] for row in rows if len(row) > column]
+        elif suffix in (".jsonl", ".ndjson"):
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                urls.append(entry.get("url", "") if isinstance(entry, dict) else entry)
+        else:
+            urls = [line for line in f if not line.strip().startswith("#")]
+
+    # Usuń duplikaty i puste wpisy zachowując kolejność
+    unique_urls = []
+    seen = set()
+    for url in urls:
+        url = str(url).strip()
+        if url and url not in seen:
+            seen.add(url)
+            unique_urls.append(url)
+    return unique_urls
+
+
+class CheckpointJournal:
+    """
+    Dziennik postępu trybu wsadowego w formacie JSON Lines.
+
+    Każdy przetworzony URL jest dopisywany jako osobna linia, więc przerwany
+    proces można wznowić - URL zakończone sukcesem są pomijane.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def completed_urls(self) -> set:
+        """
+        Zwraca URL, których ostatni wpis w dzienniku oznacza sukces.
+
+        Returns:
+            set: Zbiór zakończonych URL
+        """
+        if not self.path.exists():
+            return set()
+
+        status: dict[str, bool] = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Ostatnia linia mogła zostać ucięta przy awarii
+                    continue
+                status[entry.get("url", "")] = entry.get("status") == "ok"
+        return {url for url, ok in status.items() if ok}
+
+    def record(self, result: SiteResult) -> None:
+        """
+        Dopisuje wynik przetwarzania strony do dziennika.
+
+        Args:
+            result: Wynik przetwarzania strony
+        """
+        entry = {
+            "url": result.url,
+            "status": "ok" if result.ok else "error",
+            "output": result.output_path,
+            "error": result.error,
+            "elapsed": round(result.elapsed, 3),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+        }
+        if result.usage is not None:
+            entry["usage"] = result.usage
+        if result.degraded:
+            entry["degraded"] = result.degraded
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def run_batch(
+    urls: list,
+    options: RunOptions,
+    concurrency: int = 4,
+    checkpoint_path: Optional[str] = None,
+    stage_workers: Optional[dict] = None,
+    queue_size: int = 4,
+) -> list:
+    """
+    Przetwarza listę URL w jednym procesie z ograniczoną równoległością.
+
+    Args:
+        urls: Lista URL do przetworzenia
+        options: Wspólne ustawienia przetwarzania
+        concurrency: Maksymalna liczba stron przetwarzanych jednocześnie
+        checkpoint_path: Ścieżka dziennika postępu (None - bez dziennika)
+        stage_workers: Liczba wątków na etap - włącza tryb potokowy
+            (run_pipeline) zamiast przetwarzania całych stron
+        queue_size: Rozmiar kolejek między etapami w trybie potokowym
+
+    Returns:
+        list: Lista SiteResult w kolejności wejściowej listy URL
+    """
+    journal = CheckpointJournal(checkpoint_path) if checkpoint_path else None
+    completed = journal.completed_urls() if journal else set()
+
+    results: dict[str, SiteResult] = {
+        url: SiteResult(url=url, ok=True, skipped=True)
+        for url in urls
+        if url in completed
+    }
+    pending = [url for url in urls if url not in completed]
+    if completed:
+        print(f"Wznawianie: pominieto {len(results)} ukonczonych URL")
+
+    done = 0
+
+    def record(result: SiteResult) -> None:
+        nonlocal done
+        done += 1
+        results[result.url] = result
+        if journal:
+            journal.record(result)
+        status = "[OK]" if result.ok else "[ERROR]"
+        print(f"{status} ({done}/{len(pending)}) {result.url}")
+
+    if stage_workers is not None:
+        run_pipeline(pending, options, stage_workers, queue_size, on_result=record)
+    else:
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = [
+                executor.submit(process_site, url, options, None, True)
+                for url in pending
+            ]
+            for future in as_completed(futures):
+                record(future.result())
+
+    return [results[url] for url in urls]
+
+
+def print_batch_summary(results: list) -> None:
+    """
+    Wypisuje podsumowanie trybu wsadowego dla każdego URL.
+
+    Args:
+        results: Lista SiteResult
+    """
+    print("\n=== PODSUMOWANIE ===")
+    for result in results:
+        if result.skipped:
+            print(f"[SKIP]  {result.url} (ukonczony wczesniej)")
+        elif result.ok:
+            print(
+                f"[OK]    {result.url} -> {result.output_path} "
+                f"({result.elapsed:.1f}s)"
+            )
+        else:
+            print(f"[ERROR] {result.url}: {result.error}")
+
+    ok_count = sum(1 for r in results if r.ok and not r.skipped)
+    skipped_count = sum(1 for r in results if r.skipped)
+    failed_count = sum(1 for r in results if not r.ok)
+    print(
+        f"Sukces: {ok_count}, pominiete: {skipped_count}, bledy: {failed_count} "
+        f"(razem: {len(results)})"
+    )
+
+
+def write_batch_profile(results: list) -> Optional[dict]:
+    """
+    Agreguje profile stron z przebiegu wsadowego, wypisuje percentyle
+    i zapisuje raport do wyniki/YYYY-MM-DD/batch_profile.json.
+
+    Args:
+        results: Lista SiteResult z wypełnionym polem profile
+
+    Returns:
+        dict: Zagregowany raport lub None, jeśli brak profili
+    """
+    profiles = [result.profile for result in results if result.profile]
+    if not profiles:
+        return None
+
+    totals = sorted(profile.get("total_wall_s", 0.0) for profile in profiles)
+    report = {
+        "sites": len(profiles),
+        "total_wall_s": {
+            "p50": _percentile(totals, 50),
+            "p95": _percentile(totals, 95),
+            "p99": _percentile(totals, 99),
+            "max": totals[-1],
+        },
+        "stages": aggregate_profiles(profiles),
+    }
+
+    print("\n=== PROFIL ETAPOW (czas sciany, s) ===")
+    print(f"{'etap':<28}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, stage in report["stages"].items():
+        wall = stage["wall_s"]
+        line = (
+            f"{name:<28}{stage['count']:>6}"
+            f"{wall['p50']:>10.3f}{wall['p95']:>10.3f}{wall['p99']:>10.3f}"
+        )
+        if "mem_peak_bytes" in stage:
+            peak_mb = stage["mem_peak_bytes"]["p95"] / 1e6
+            line += f"  szczyt pamieci p95: {peak_mb:.1f} MB"
+        print(line)
+
+    degraded = sum(len(result.degraded) for result in results)
+    if degraded:
+        report["degraded"] = [entry for r in results for entry in r.degraded]
+        print(f"Przekroczone limity rozmiaru (dane skrocone): {degraded}")
+
+    path = get_output_path("batch_profile").with_suffix(".json")
+    if write_json_report(path, report):
+        print(f"Profil przebiegu zapisany do pliku: {path}")
+    return report
+
+
+def _linear_fit(xs: list, ys: list) -> Optional[dict]:
+    """
+    Dopasowuje prostą y = slope * x + intercept metodą najmniejszych kwadratów.
+
+    Returns:
+        dict: {"slope", "intercept", "r"} lub None, gdy brak zmienności x
+    """
+    n = len(xs)
+    if n < 2:
+        return None
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    var_y = sum((y - mean_y) ** 2 for y in ys)
+    if var_x == 0:
+        return None
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    slope = cov / var_x
+    return {
+        "slope": slope,
+        "intercept": mean_y - slope * mean_x,
+        "r": cov / math.sqrt(var_x * var_y) if var_y else 0.0,
+    }
+
+
+def aggregate_llm_usage(usages: list) -> dict:
+    """
+    Agreguje rekordy zużycia tokenów z wielu stron.
+
+    Oprócz sum i percentyli opóźnienia wylicza zależność czasu i kosztu od
+    długości combined_text (na 1000 znaków), co pozwala dobrać limity
+    podstron i upakowanie treści.
+
+    Args:
+        usages: Lista rekordów llm_usage_record
+
+    Returns:
+        dict: Sumy tokenów i kosztu, percentyle opóźnienia oraz dopasowania
+            liniowe latency_s i cost_usd względem prompt_chars
+    """
+    calls = [u for u in usages if not u.get("cached_result")]
+    latencies = sorted(u["latency_s"] for u in calls)
+    total_chars = sum(u["prompt_chars"] for u in calls)
+    total_prompt = sum(u["prompt_tokens"] for u in calls)
+    total_cost = sum(u["cost_usd"] or 0.0 for u in calls)
+    kilo_chars = [u["prompt_chars"] / 1000 for u in calls]
+
+    report = {
+        "calls": len(calls),
+        "cached_results": len(usages) - len(calls),
+        "models": sorted({u["model"] for u in calls}),
+        "prompt_tokens": total_prompt,
+        "completion_tokens": sum(u["completion_tokens"] for u in calls),
+        "cached_tokens": sum(u["cached_tokens"] for u in calls),
+        "cost_usd": round(total_cost, 6),
+        "prompt_chars": total_chars,
+        "chars_per_prompt_token": (
+            round(total_chars / total_prompt, 3) if total_prompt else None
+        ),
+        "cost_usd_per_1k_chars": (
+            round(total_cost / total_chars * 1000, 8) if total_chars else None
+        ),
+        "latency_s": {
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+        },
+        "latency_vs_1k_chars": _linear_fit(kilo_chars, [u["latency_s"] for u in calls]),
+        "cost_vs_1k_chars": _linear_fit(
+            kilo_chars, [u["cost_usd"] or 0.0 for u in calls]
+        ),
+    }
+    return report
+
+
+def write_batch_usage(results: list) -> Optional[dict]:
+    """
+    Podsumowuje zużycie tokenów i koszt przebiegu wsadowego oraz zapisuje
+    raport do wyniki/YYYY-MM-DD/batch_usage.json.
+
+    Args:
+        results: Lista SiteResult
+
+    Returns:
+        dict: Zagregowany raport lub None, jeśli nie było wywołań modelu
+    """
+    usages = [result.usage for result in results if result.usage]
+    if not usages:
+        return None
+
+    report = aggregate_llm_usage(usages)
+    print("\n=== ZUZYCIE TOKENOW ===")
+    print(
+        f"Wywolania: {report['calls']} (z magazynu: {report['cached_results']}), "
+        f"tokeny: {report['prompt_tokens']} wej. / "
+        f"{report['completion_tokens']} wyj. / {report['cached_tokens']} cache"
+    )
+    print(
+        f"Szacowany koszt: ${report['cost_usd']:.4f}, "
+        f"opoznienie p50/p95: {report['latency_s']['p50']:.2f}s / "
+        f"{report['latency_s']['p95']:.2f}s"
+    )
+    latency_fit = report["latency_vs_1k_chars"]
+    if latency_fit:
+        print(
+            f"Opoznienie ~ {latency_fit['intercept']:.2f}s + "
+            f"{latency_fit['slope']:.3f}s na 1000 znakow (r={latency_fit['r']:.2f})"
+        )
+
+    path = get_output_path("batch_usage").with_suffix(".json")
+    if write_json_report(path, report):
+        print(f"Raport zuzycia zapisany do pliku: {path}")
+    return report
+
+
+def main():
+    """
+    Główna funkcja aplikacji - punkt wejścia dla CLI.
+    """
+    parser = argparse.ArgumentParser(
+        description="Inwestor Pro - Generator perswazyjnych broszur",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Przyklady uzycia:
+  python inwestor_pro.py --url https://example.com
+  python inwestor_pro.py --url https://startup.pl --output broszura.md
+  python inwestor_pro.py --urls-file firmy.txt --concurrency 8
+  python inwestor_pro.py --urls-file firmy.txt --queue-db /mnt/wspolny/kolejka.db
+  python inwestor_pro.py --queue-worker /mnt/wspolny/kolejka.db --concurrency 4
+  python inwestor_pro.py --serve --port 8080 --workers 4
+  python inwestor_pro.py --urls-file firmy.txt --watch --watch-once
+  python inwestor_pro.py --url https://startup.pl --replay kaseta --replay-latency 0
+        """,
+    )
+
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--url", help="URL strony internetowej do analizy")
+    source.add_argument(
+        "--urls-file",
+        help="Plik z lista URL (txt, csv lub jsonl) do przetworzenia wsadowo",
+    )
+    source.add_argument(
+        "--queue-worker",
+        metavar="QUEUE_DB",
+        help="Uruchom wezel przetwarzajacy rozproszona kolejke SQLite",
+    )
+    source.add_argument(
+        "--artifact-gc",
+        action="store_true",
+        help="Usun stare artefakty z --artifact-dir (limity --gc-max-*)",
+    )
+    source.add_argument(
+        "--serve",
+        action="store_true",
+        help="Uruchom serwer HTTP z kolejka zadan (POST /jobs)",
+    )
+    source.add_argument(
+        "--corpus-report",
+        metavar="KATALOG",
+        help="Przeanalizuj zapisany korpus (--corpus-dir) bez pobierania stron",
+    )
+
+    parser.add_argument(
+        "--output",
+        help="Nazwa pliku wyjsciowego (domyslnie: broszura_[domena].md)",
+    )
+
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Wyswietl szczegolowe informacje o procesie",
+    )
+
+    parser.add_argument(
+        "--max-subpages",
+        type=int,
+        default=5,
+        help="Maksymalna liczba podstron do analizy (domyslnie: 5)",
+    )
+
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Liczba stron przetwarzanych rownolegle w trybie wsadowym "
+        "(domyslnie: 4)",
+    )
+
+    parser.add_argument(
+        "--checkpoint",
+        help="Plik dziennika postepu trybu wsadowego "
+        "(domyslnie: [urls-file].checkpoint.jsonl)",
+    )
+
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Z --urls-file: obserwuj strony wedlug harmonogramu i generuj "
+        "broszury tylko po zmianie tresci",
+    )
+
+    parser.add_argument(
+        "--watch-state",
+        help="Plik harmonogramu trybu --watch (domyslnie: [urls-file].watch.json)",
+    )
+
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=WATCH_INTERVAL,
+        help="Poczatkowy odstep miedzy wizytami w sekundach, dostosowywany "
+        "do czestotliwosci zmian strony (domyslnie: 86400)",
+    )
+
+    parser.add_argument(
+        "--watch-threshold",
+        type=float,
+        default=WATCH_THRESHOLD,
+        help="Minimalny odsetek zmienionych zdan wymagajacy nowej broszury "
+        "(domyslnie: 0.1)",
+    )
+
+    parser.add_argument(
+        "--watch-once",
+        action="store_true",
+        help="Z --watch: odwiedz tylko zalegle strony i zakoncz (np. z crona)",
+    )
+
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Tryb wsadowy potokowy: etapy fetch, clean i llm dzialaja "
+        "rownolegle na roznych stronach",
+    )
+
+    parser.add_argument(
+        "--fetch-workers",
+        type=int,
+        help="Liczba watkow etapu pobierania (domyslnie: --concurrency)",
+    )
+
+    parser.add_argument(
+        "--clean-workers",
+        type=int,
+        default=1,
+        help="Liczba watkow etapu czyszczenia HTML (domyslnie: 1)",
+    )
+
+    parser.add_argument(
+        "--llm-workers",
+        type=int,
+        help="Liczba watkow etapu generowania broszur (domyslnie: --concurrency)",
+    )
+
+    parser.add_argument(
+        "--max-host-concurrency",
+        type=int,
+        default=8,
+        help="Maksymalna liczba rownoczesnych zadan HTTP do jednego hosta; "
+        "limit jest dobierany adaptacyjnie (AIMD) i wyznacza rownolegle "
+        "pobieranie podstron (domyslnie: 8)",
+    )
+
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=4,
+        help="Maksymalna liczba stron oczekujacych przed kazdym etapem "
+        "(domyslnie: 4)",
+    )
+
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Adres nasluchu serwera w trybie --serve (domyslnie: 127.0.0.1)",
+    )
+
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8080,
+        help="Port serwera w trybie --serve (domyslnie: 8080)",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=2,
+        help="Liczba watkow przetwarzajacych zadania w trybie --serve "
+        "(domyslnie: 2)",
+    )
+
+    parser.add_argument(
+        "--queue-db",
+        help="Z --urls-file: dodaj URL do rozproszonej kolejki SQLite "
+        "zamiast przetwarzac je lokalnie",
+    )
+
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=300.0,
+        help="Czas dzierzawy zadania z kolejki w sekundach (domyslnie: 300)",
+    )
+
+    parser.add_argument(
+        "--artifact-dir",
+        help="Katalog magazynu artefaktow (HTML, tekst, prompt, broszura) - "
+        "ponowne uruchomienie pomija etapy o niezmienionych danych",
+    )
+
+    parser.add_argument(
+        "--corpus-dir",
+        metavar="KATALOG",
+        help="Dopisuj oczyszczone teksty stron do korpusu do ponownej analizy",
+    )
+
+    parser.add_argument(
+        "--artifact-ttl",
+        type=float,
+        default=3600.0,
+        help="Po ilu sekundach pobrany HTML jest pobierany ponownie "
+        "(domyslnie: 3600)",
+    )
+
+    parser.add_argument(
+        "--artifact-compression",
+        choices=["auto", "zstd", "gzip", "none"],
+        default="auto",
+        help="Kompresja artefaktow (auto: zstd jesli dostepny, inaczej gzip)",
+    )
+
+    parser.add_argument(
+        "--gc-max-size-mb",
+        type=float,
+        help="Limit rozmiaru magazynu artefaktow dla --artifact-gc (MB)",
+    )
+
+    parser.add_argument(
+        "--gc-max-age-days",
+        type=float,
+        help="Maksymalny wiek artefaktow dla --artifact-gc (dni)",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Zapisz pomiary czasu etapow do pliku JSON obok broszury "
+        "(w trybie wsadowym takze percentyle p50/p95/p99)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PLIK",
+        help="Dopisuj slady (spany etapow) do pliku JSONL w formacie OTLP/JSON",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar="PLIK",
+        help="Zapisuj metryki (format tekstowy Prometheus 0.0.4) do pliku "
+        "dla kolektora textfile node-exportera (tryby wsadowe i serwis)",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=15.0,
+        help="Odstep zapisu pliku metryk w sekundach (domyslnie: 15)",
+    )
+    parser.add_argument(
+        "--memprofile",
+        action="store_true",
+        help="Jak --profile, dodatkowo szczyt i przyrost pamieci etapow "
+        "(tracemalloc; dokladne wartosci przy --concurrency 1)",
+    )
+    parser.add_argument(
+        "--max-html-bytes",
+        type=int,
+        default=10_000_000,
+        help="Limit rozmiaru HTML strony w bajtach, powyzej HTML jest "
+        "skracany (domyslnie: 10000000, 0 = bez limitu)",
+    )
+    parser.add_argument(
+        "--max-text-chars",
+        type=int,
+        default=300_000,
+        help="Limit oczyszczonego tekstu strony w znakach "
+        "(domyslnie: 300000, 0 = bez limitu)",
+    )
+    parser.add_argument(
+        "--max-combined-chars",
+        type=int,
+        default=400_000,
+        help="Limit polaczonej tresci przekazywanej do modelu w znakach "
+        "(domyslnie: 400000, 0 = bez limitu)",
+    )
+
+    parser.add_argument(
+        "--facts",
+        action="store_true",
+        help="Wyslij do modelu tabele faktow (kwoty, procenty, NIP, KRS...) "
+        "i skrocony fragment tekstu zamiast pelnej tresci",
+    )
+
+    parser.add_argument(
+        "--fact-excerpt-chars",
+        type=int,
+        default=12_000,
+        help="Dlugosc fragmentu tekstu wysylanego z --facts (domyslnie: 12000)",
+    )
+
+    parser.add_argument(
+        "--top-passages",
+        type=int,
+        metavar="K",
+        help="Wyslij do modelu tylko K najtrafniejszych fragmentow tekstu "
+        "dla kazdej sekcji broszury (ranking TF-IDF, szybszy z numpy)",
+    )
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Regeneruj tylko sekcje broszury dotkniete zmianami tresci od "
+        "poprzedniego uruchomienia (stan w wyniki/.sekcje/)",
+    )
+
+    parser.add_argument(
+        "--site-deadline",
+        type=float,
+        default=0,
+        metavar="SEKUNDY",
+        help="Limit czasu calej strony (pobieranie, czyszczenie, generowanie); "
+        "podstrony nie pobrane w czasie sa pomijane (domyslnie: 0 = bez limitu)",
+    )
+
+    parser.add_argument(
+        "--content-budget",
+        type=int,
+        default=0,
+        metavar="ZNAKI",
+        help="Przestan pobierac kolejne podstrony po zebraniu tylu znakow "
+        "unikalnej tresci (domyslnie: 0 = pobieraj wszystkie)",
+    )
+
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument(
+        "--record",
+        metavar="KATALOG",
+        help="Nagraj wszystkie odpowiedzi HTTP i LLM do kasety w katalogu",
+    )
+    cassette.add_argument(
+        "--replay",
+        metavar="KATALOG",
+        help="Odtworz odpowiedzi HTTP i LLM z kasety, bez sieci i klucza API",
+    )
+    parser.add_argument(
+        "--replay-latency",
+        default="recorded",
+        metavar="SEKUNDY",
+        help="Opoznienie odtwarzanych odpowiedzi: 'recorded' (nagrane) lub "
+        "stala liczba sekund, 0 = bez opoznienia (domyslnie: recorded)",
+    )
+
+    args = parser.parse_args()
+
+    if args.artifact_gc:
+        return run_artifact_gc_cli(args)
+
+    if args.corpus_report:
+        return run_corpus_report_cli(args)
+
+    if args.queue_worker:
+        return run_queue_worker_cli(args)
+
+    if args.serve:
+        return run_service_cli(args)
+
+    if args.watch:
+        return run_watch_cli(args)
+
+    if args.urls_file:
+        return run_batch_cli(args)
+
+    # Walidacja URL
+    if not is_valid_url(args.url):
+        print("Blad: Podany URL nie jest prawidlowy.", file=sys.stderr)
+        sys.exit(1)
+
+    print("Inwestor Pro v1.0.0")
+    print(f"Analizuje strone: {args.url}")
+
+    # Załaduj klucz API
+    print("Ladowanie klucza API...")
+    api_key = load_cli_api_key(args)
+    if not api_key:
+        return 1
+
+    try:
+        artifacts = open_artifact_store(args)
+        corpus = CorpusWriter(args.corpus_dir) if args.corpus_dir else None
+        cassette = open_cassette(args)
+    except (OSError, ValueError) as e:
+        print(f"Blad: Nie udalo sie otworzyc magazynu artefaktow lub kasety: {e}")
+        return 1
+
+    options = RunOptions(
+        api_key=api_key,
+        max_subpages=args.max_subpages,
+        verbose=args.verbose,
+        artifacts=artifacts,
+        artifact_ttl=args.artifact_ttl,
+        profile=args.profile,
+        memprofile=args.memprofile,
+        tracer=TraceExporter(args.trace) if args.trace else None,
+        max_html_bytes=args.max_html_bytes or None,
+        max_text_chars=args.max_text_chars or None,
+        max_combined_chars=args.max_combined_chars or None,
+        fact_excerpt_chars=args.fact_excerpt_chars if args.facts else None,
+        passages_top_k=args.top_passages,
+        content_budget=args.content_budget or None,
+        site_deadline=args.site_deadline or None,
+        incremental=args.incremental,
+        fetch_limiter=HostConcurrencyLimiter(maximum=args.max_host_concurrency),
+        corpus=corpus,
+    )
+    if cassette is not None:
+        options.session = cassette.session()
+        options.client = cassette.client(lambda: create_openai_client(api_key))
+    result = process_site(args.url, options, args.output)
+    if not result.ok:
+        return 1
+
+    if args.verbose and result.usage and not result.usage["cached_result"]:
+        usage = result.usage
+        cost = usage["cost_usd"]
+        print(
+            f"Tokeny: {usage['prompt_tokens']} wej. "
+            f"({usage['cached_tokens']} z cache), {usage['completion_tokens']} wyj., "
+            f"czas odpowiedzi: {usage['latency_s']:.1f}s"
+            + (f", koszt: ${cost:.4f}" if cost is not None else "")
+        )
+    print("Broszura inwestycyjna zostala wygenerowana pomyslnie!")
+    return 0
+
+
+def open_artifact_store(args: argparse.Namespace) -> Optional[ArtifactStore]:
+    """
+    Otwiera magazyn artefaktów wskazany przez --artifact-dir.
+
+    Args:
+        args: Sparsowane argumenty linii komend
+
+    Returns:
+        ArtifactStore: Magazyn lub None, jeśli nie podano --artifact-dir
+    """
+    if not getattr(args, "artifact_dir", None):
+        return None
+    return ArtifactStore(args.artifact_dir, args.artifact_compression)
+
+
+def run_artifact_gc_cli(args: argparse.Namespace) -> int:
+    """
+    Obsługuje czyszczenie magazynu artefaktów CLI (--artifact-gc).
+
+    Args:
+        args: Sparsowane argumenty linii komend
+
+    Returns:
+        int: Kod wyjścia
+    """
+    if not args.artifact_dir:
+        print("Blad: --artifact-gc wymaga --artifact-dir.", file=sys.stderr)
+        return 1
+    if args.gc_max_size_mb is None and args.gc_max_age_days is None:
+        print("Blad: podaj --gc-max-size-mb lub --gc-max-age-days.", file=sys.stderr)
+        return 1
+
+    try:
+        store = open_artifact_store(args)
+        stats = store.gc(
+            max_bytes=(
+                int(args.gc_max_size_mb * 1024 * 1024)
+                if args.gc_max_size_mb is not None
+                else None
+            ),
+            max_age_days=args.gc_max_age_days,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Blad podczas czyszczenia artefaktow: {e}")
+        return 1
+
+    print(
+        f"Usunieto {stats['removed']} artefaktow "
+        f"({stats['removed_bytes'] / 1024 / 1024:.1f} MB), pozostalo "
+        f"{stats['kept']} ({stats['kept_bytes'] / 1024 / 1024:.1f} MB)."
+    )
+    return 0
+
+
+def run_corpus_report_cli(args: argparse.Namespace) -> int:
+    """
+    Obsługuje analizę zapisanego korpusu CLI (--corpus-report).
+
+    Args:
+        args: Sparsowane argumenty linii komend
+
+    Returns:
+        int: Kod wyjścia
+    """
+    try:
+        with CorpusReader(args.corpus_report) as reader:
+            if not len(reader):
+                print(f"Blad: Korpus {args.corpus_report} jest pusty.")
+                return 1
+            report = analyze_corpus(reader)
+    except (OSError, ValueError) as e:
+        print(f"Blad podczas odczytu korpusu: {e}")
+        return 1
+
+    print(
+        f"Korpus: {report['pages']} stron ({report['unique_pages']} unikalnych) "
+        f"z {report['sites']} witryn, {report['bytes'] / 1024 / 1024:.1f} MB tekstu"
+    )
+    print("Najczestsze kluczowe frazy:")
+    for phrase, count in report["top_phrases"]:
+        print(f"  {phrase:<30}{count:>8}")
+    return 0
+
+
+def open_cassette(args: argparse.Namespace) -> Optional["Cassette"]:
+    """
+    Otwiera kasetę nagrań wskazaną przez --record lub --replay.
+
+    Args:
+        args: Sparsowane argumenty linii komend
+
+    Returns:
+        Cassette: Kaseta lub None, jeśli nie podano --record ani --replay
+
+    Raises:
+        ValueError: Nieprawidłowe --replay-latency lub brak katalogu kasety
+    """
+    if getattr(args, "record", None):
+        return Cassette(args.record, "record")
+    if not getattr(args, "replay", None):
+        return None
+    latency = args.replay_latency
+    if latency != "recorded":
+        latency = float(latency)
+    return Cassette(args.replay, "replay", latency)
+
+
+def load_cli_api_key(args: argparse.Namespace) -> Optional[str]:
+    """
+    Ładuje klucz API dla trybów CLI.
+
+    Przy --replay odpowiedzi LLM pochodzą z kasety, więc klucz nie jest
+    wymagany - brakujący zastępuje REPLAY_API_KEY.
+
+    Args:
+        args: Sparsowane argumenty linii komend
+
+    Returns:
+        str: Klucz API lub None jeśli nie znaleziono
+    """
+    if getattr(args, "replay", None):
+        load_dotenv()
+        return os.getenv("OPENAI_API_KEY") or REPLAY_API_KEY
+    return load_api_key()
+
+
+def open_metrics_writer(args: argparse.Namespace) -> Any:
+    """
+    Zwraca zapis metryk do pliku (--metrics-file) jako menedżer kontekstu.
+
+    Args:
+        args: Sparsowane argumenty linii komend
+
+    Returns:
+        MetricsTextfileWriter lub pusty kontekst, gdy plik nie został podany
+    """
+    if not args.metrics_file:
+        return nullcontext()
+    return MetricsTextfileWriter(args.metrics_file, max(0.1, args.metrics_interval))
+
+
+def build_shared_options(
+    args: argparse.Namespace, api_key: str, workers: int
+) -> RunOptions:
+    """
+    Tworzy RunOptions dla trybów wielostronicowych (wsadowy, serwis, kolejka).
+
+    Jedna sesja HTTP i jeden klient OpenAI są współdzielone przez cały
+    przebieg (owinięte kasetą przy --record / --replay), a komunikaty
+    postępu poszczególnych stron są wyciszone, chyba że podano --verbose.
+
+    Args:
+        args: Sparsowane argumenty linii komend
+        api_key: Klucz API OpenAI
+        workers: Liczba równoległych wątków (rozmiar puli połączeń)
+
+    Returns:
+        RunOptions: Ustawienia przetwarzania
+    """
+    session = create_http_session(pool_size=workers * 2)
+    cassette = open_cassette(args)
+    if cassette is not None:
+        session = cassette.session(session)
+        client = cassette.client(lambda: create_openai_client(api_key))
+    else:
+        client = create_openai_client(api_key)
+    return RunOptions(
+        api_key=api_key,
+        max_subpages=args.max_subpages,
+        verbose=args.verbose,
+        quiet=not args.verbose,
+        session=session,
+        client=client,
+        artifacts=open_artifact_store(args),
+        artifact_ttl=args.artifact_ttl,
+        profile=args.profile,
+        memprofile=args.memprofile,
+        tracer=TraceExporter(args.trace) if args.trace else None,
+        max_html_bytes=args.max_html_bytes or None,
+        max_text_chars=args.max_text_chars or None,
+        max_combined_chars=args.max_combined_chars or None,
+        fact_excerpt_chars=args.fact_excerpt_chars if args.facts else None,
+        passages_top_k=args.top_passages,
+        content_budget=args.content_budget or None,
+        site_deadline=args.site_deadline or None,
+        incremental=args.incremental,
+        fetch_limiter=HostConcurrencyLimiter(maximum=args.max_host_concurrency),
+        single_flight=SingleFlight(),
+        corpus=CorpusWriter(args.corpus_dir) if args.corpus_dir else None,
+    )
+
+
+def run_batch_cli(args: argparse.Namespace) -> int:
+    """
+    Obsługuje tryb wsadowy CLI (--urls-file).
+
+    Args:
+        args: Sparsowane argumenty linii komend
+
+    Returns:
+        int: Kod wyjścia (0 - wszystkie strony przetworzone pomyślnie)
+    """
+    print("Inwestor Pro v1.0.0")
+    try:
+        urls = read_urls_file(args.urls_file)
+    except (OSError, ValueError) as e:
+        print(f"Blad: Nie udalo sie wczytac listy URL: {e}", file=sys.stderr)
+        return 1
+
+    if not urls:
+        print("Blad: Lista URL jest pusta.", file=sys.stderr)
+        return 1
+
+    if args.queue_db:
+        added = WorkQueue(args.queue_db).enqueue(urls)
+        print(f"Dodano {added} nowych URL do kolejki {args.queue_db}")
+        return 0
+
+    print(f"Tryb wsadowy: {len(urls)} URL, rownoleglosc: {args.concurrency}")
+
+    print("Ladowanie klucza API...")
+    api_key = load_cli_api_key(args)
+    if not api_key:
+        return 1
+
+    concurrency = max(1, args.concurrency)
+    try:
+        options = build_shared_options(args, api_key, concurrency)
+    except (OSError, ValueError) as e:
+        print(f"Blad: Nie udalo sie otworzyc magazynu artefaktow lub kasety: {e}")
+        return 1
+    checkpoint_path = args.checkpoint or f"{args.urls_file}.checkpoint.jsonl"
+
+    stage_workers = None
+    if args.pipeline:
+        stage_workers = {
+            "fetch": args.fetch_workers or concurrency,
+            "clean": args.clean_workers,
+            "llm": args.llm_workers or concurrency,
+        }
+        print(
+            "Tryb potokowy: "
+            + ", ".join(f"{name}={count}" for name, count in stage_workers.items())
+            + f", kolejka={args.queue_size}"
+        )
+
+    with open_metrics_writer(args):
+        results = run_batch(
+            urls, options, concurrency, checkpoint_path, stage_workers, args.queue_size
+        )
+    print_batch_summary(results)
+    write_batch_usage(results)
+    if options.profile or options.memprofile:
+        write_batch_profile(results)
+    return 0 if all(result.ok for result in results) else 1
+
+
+# Granice i domyślne wartości trybu --watch (sekundy, odsetek zmienionych zdań)
+WATCH_MIN_INTERVAL = 3600.0
+WATCH_MAX_INTERVAL = 30 * 86400.0
+WATCH_INTERVAL = 86400.0
+WATCH_THRESHOLD = 0.1
+
+# Mnożniki interwału odwiedzin po wykrytej zmianie i po wizycie bez zmian
+WATCH_SPEEDUP = 0.5
+WATCH_SLOWDOWN = 1.5
+
+
+def content_fingerprint(texts: list) -> list:
+    """
+    Zwraca odcisk treści: posortowane skróty unikalnych zdań tekstów.
+
+    Args:
+        texts: Oczyszczone teksty stron
+
+    Returns:
+        list: Skróty zdań (8 znaków szesnastkowych)
+    """
+    hashes = set()
+    for text in texts:
+        for sentence in _SENTENCE_END_RE.split(text or ""):
+            key = sentence.strip().lower()
+            if key:
+                hashes.add(
+                    hashlib.blake2b(key.encode("utf-8"), digest_size=4).hexdigest()
+                )
+    return sorted(hashes)
+
+
+def content_change(old: Optional[list], new: list) -> float:
+    """
+    Zwraca odsetek zdań dodanych lub usuniętych (1 - podobieństwo Jaccarda).
+
+    Args:
+        old: Poprzedni odcisk treści (None - brak poprzedniej wizyty)
+        new: Bieżący odcisk treści
+
+    Returns:
+        float: Zmiana od 0.0 (bez zmian) do 1.0 (całkiem nowa treść)
+    """
+    if old is None:
+        return 1.0
+    old_set, new_set = set(old), set(new)
+    union = old_set | new_set
+    if not union:
+        return 0.0
+    return 1 - len(old_set & new_set) / len(union)
+
+
+class WatchSchedule:
+    """
+    Trwały harmonogram trybu --watch (plik JSON zapisywany atomowo).
+
+    Dla każdej strony przechowuje walidatory HTTP (ETag, Last-Modified),
+    odcisk treści, z której powstała ostatnia broszura, oraz interwał
+    odwiedzin. Interwał maleje po wykrytej zmianie (WATCH_SPEEDUP) i rośnie
+    po wizycie bez zmian (WATCH_SLOWDOWN), więc często zmieniane strony są
+    odwiedzane częściej. Terminy odwiedzin trzyma kopiec (heapq).
+    """
+
+    def __init__(self, path: str, interval: float = WATCH_INTERVAL):
+        self.path = Path(path)
+        self.interval = min(max(interval, WATCH_MIN_INTERVAL), WATCH_MAX_INTERVAL)
+        self.sites: dict[str, dict] = {}
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.sites = data.get("sites", {})
+        self._heap = [(entry["next_due"], url) for url, entry in self.sites.items()]
+        heapq.heapify(self._heap)
+
+    def sync(self, urls: list, now: float) -> None:
+        """
+        Dodaje nowe URL (do odwiedzenia od razu) i usuwa URL spoza listy.
+
+        Args:
+            urls: Bieżąca lista obserwowanych URL
+            now: Bieżący czas (time.time)
+        """
+        for url in urls:
+            if url not in self.sites:
+                self.sites[url] = {
+                    "interval": self.interval,
+                    "next_due": now,
+                    "visits": 0,
+                    "changes": 0,
+                }
+                heapq.heappush(self._heap, (now, url))
+        for url in set(self.sites) - set(urls):
+            del self.sites[url]
+        self.save()
+
+    def _drop_stale(self) -> None:
+        """Usuwa ze szczytu kopca terminy nieaktualne (zmienione lub usunięte)."""
+        while self._heap:
+            next_due, url = self._heap[0]
+            entry = self.sites.get(url)
+            if entry is not None and entry["next_due"] == next_due:
+                return
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now: float) -> list:
+        """
+        Zdejmuje z kopca strony, których termin odwiedzin już minął.
+
+        Args:
+            now: Bieżący czas (time.time)
+
+        Returns:
+            list: URL do odwiedzenia (najdawniej zaległe najpierw)
+        """
+        due = []
+        self._drop_stale()
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[1])
+            self._drop_stale()
+        return due
+
+    def next_due(self) -> Optional[float]:
+        """Zwraca najbliższy termin odwiedzin (None - pusty harmonogram)."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def record(self, url: str, outcome: str, updates: dict, now: float) -> None:
+        """
+        Zapisuje wynik wizyty i planuje kolejną.
+
+        Args:
+            url: URL strony
+            outcome: Wynik: new, changed, unchanged, not_modified lub error
+            updates: Nowe walidatory, odcisk treści i zmiana treści
+            now: Bieżący czas (time.time)
+        """
+        entry = self.sites.get(url)
+        if entry is None:
+            return
+        entry.update(updates)
+        entry["visits"] += 1
+        entry["last_visit"] = now
+        entry["last_outcome"] = outcome
+        if outcome == "changed":
+            entry["changes"] += 1
+            entry["interval"] = max(
+                WATCH_MIN_INTERVAL, entry["interval"] * WATCH_SPEEDUP
+            )
+        elif outcome in ("unchanged", "not_modified"):
+            entry["interval"] = min(
+                WATCH_MAX_INTERVAL, entry["interval"] * WATCH_SLOWDOWN
+            )
+        # Po błędzie spróbuj ponownie po najkrótszym interwale
+        delay = WATCH_MIN_INTERVAL if outcome == "error" else entry["interval"]
+        entry["next_due"] = now + delay
+        heapq.heappush(self._heap, (entry["next_due"], url))
+        self.save()
+
+    def save(self) -> None:
+        """Zapisuje harmonogram atomowo."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"sites": self.sites}, ensure_ascii=False, indent=2)
+        _atomic_write(self.path, data.encode("utf-8"))
+
+
+def watch_site(
+    url: str, entry: dict, options: RunOptions, threshold: float = WATCH_THRESHOLD
+) -> tuple:
+    """
+    Odwiedza obserwowaną stronę i generuje broszurę tylko po zmianie treści.
+
+    Strona główna jest pobierana żądaniem warunkowym. Po odpowiedzi 304
+    żądania warunkowe dostają także podstrony z poprzedniej wizyty (z ich
+    własnymi walidatorami); wizyta kończy się bez zmian tylko wtedy, gdy
+    wszystkie strony odpowiedzą 304. W pozostałych przypadkach strona jest
+    pobierana w całości, a odcisk oczyszczonej treści jest porównywany
+    z odciskiem z ostatniej broszury.
+
+    Nowe walidatory są zapisywane tylko razem z porównanym odciskiem (new,
+    changed, unchanged); po błędzie są czyszczone, aby kolejna wizyta nie
+    zakończyła się odpowiedzią 304 dla treści, z której nie powstała broszura.
+
+    Args:
+        url: URL strony
+        entry: Wpis harmonogramu (walidatory strony głównej i podstron
+            "subpages", odcisk treści)
+        options: Wspólne ustawienia przetwarzania
+        threshold: Minimalna zmiana treści (content_change) wymagająca
+            nowej broszury
+
+    Returns:
+        tuple: (wynik, aktualizacje_wpisu, SiteResult lub None)
+    """
+    job = new_site_job(url, options, include_path=True)
+    job.validators = {
+        key: entry[key] for key, _ in _VALIDATOR_HEADERS.values() if entry.get(key)
+    }
+    job.subpage_validators = {}
+    cleared = {key: None for key, _ in _VALIDATOR_HEADERS.values()}
+    cleared["subpages"] = None
+    if not _run_stage(stage_fetch, job, options) and job.not_modified:
+        if not _subpages_changed(job, entry.get("subpages"), options):
+            return "not_modified", {}, None
+        # Zmieniła się podstrona - strona główna jest pobierana ponownie
+        # bez walidatorów, bo odpowiedź 304 nie zawiera jej treści
+        _log(options, "Zmienila sie podstrona - pobieram strone ponownie.")
+        job = new_site_job(url, options, include_path=True)
+        job.validators = {}
+        job.subpage_validators = {}
+        _run_stage(stage_fetch, job, options)
+    if job.error or job.not_modified:
+        return "error", cleared, finish_site_job(job)
+
+    if not _run_stage(stage_clean, job, options):
+        return "error", cleared, finish_site_job(job)
+
+    updates = {key: job.validators.get(key) for key, _ in _VALIDATOR_HEADERS.values()}
+    updates["subpages"] = job.subpage_validators
+
+    fingerprint = content_fingerprint([page.text for page in job.pages() if page])
+    previous = entry.get("fingerprint")
+    updates["change"] = round(content_change(previous, fingerprint), 4)
+    if previous is not None and updates["change"] < threshold:
+        return "unchanged", updates, None
+
+    if not _run_stage(stage_generate, job, options):
+        return "error", cleared, finish_site_job(job)
+    updates["fingerprint"] = fingerprint
+    return ("new" if previous is None else "changed"), updates, finish_site_job(job)
+
+
+def _subpages_changed(
+    job: SiteJob, subpages: Optional[dict], options: RunOptions
+) -> bool:
+    """
+    Sprawdza żądaniami warunkowymi, czy zmieniła się któraś podstrona.
+
+    Args:
+        job: Zadanie wizyty (limit czasu, sesja)
+        subpages: Walidatory podstron z poprzedniej wizyty {url: walidatory}
+            lub None, gdy wpis ich nie ma (np. stan sprzed ich zapisywania)
+        options: Wspólne ustawienia przetwarzania
+
+    Returns:
+        bool: True jeśli którakolwiek podstrona nie odpowiedziała 304
+    """
+    if subpages is None:
+        return True
+    for subpage_url, validators in subpages.items():
+        _, not_modified = fetch_html_conditional(
+            subpage_url,
+            dict(validators),
+            **_fetch_kwargs(options, job.time_left(fetch=True)),
+        )
+        if not not_modified:
+            return True
+    return False
+
+
+def run_watch(
+    urls: list,
+    options: RunOptions,
+    schedule: WatchSchedule,
+    threshold: float = WATCH_THRESHOLD,
+    concurrency: int = 4,
+    once: bool = False,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.time,
+) -> list:
+    """
+    Obserwuje strony: odwiedza je zgodnie z harmonogramem i generuje
+    broszury tylko dla stron, których treść się zmieniła.
+
+    Args:
+        urls: Lista obserwowanych URL
+        options: Wspólne ustawienia przetwarzania
+        schedule: Trwały harmonogram odwiedzin
+        threshold: Minimalna zmiana treści wymagająca nowej broszury
+        concurrency: Maksymalna liczba stron odwiedzanych jednocześnie
+        once: Odwiedź tylko zaległe strony i zakończ (np. z crona)
+        sleep: Funkcja usypiająca (podmieniana w testach)
+        clock: Źródło bieżącego czasu (podmieniane w testach)
+
+    Returns:
+        list: Lista krotek (URL, wynik) wszystkich wizyt
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    schedule.sync(urls, clock())
+    visits = []
+    while True:
+        due = schedule.pop_due(clock())
+        if due:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+                futures = {
+                    executor.submit(
+                        watch_site, url, dict(schedule.sites[url]), options, threshold
+                    ): url
+                    for url in due
+                }
+                for future in as_completed(futures):
+                    url = futures[future]
+                    outcome, updates, result = future.result()
+                    schedule.record(url, outcome, updates, clock())
+                    METRICS.inc("inwestor_watch_visits_total", outcome=outcome)
+                    visits.append((url, outcome))
+                    detail = f" ({result.error})" if result and result.error else ""
+                    print(f"[{outcome.upper()}] {url}{detail}")
+
+        if once:
+            return visits
+        next_due = schedule.next_due()
+        if next_due is None:
+            return visits
+        sleep(max(next_due - clock(), 1.0))
+
+
+def run_watch_cli(args: argparse.Namespace) -> int:
+    """
+    Obsługuje tryb obserwacji CLI (--urls-file z --watch).
+
+    Args:
+        args: Sparsowane argumenty linii komend
+
+    Returns:
+        int: Kod wyjścia (0 - brak błędów w ostatnich wizytach)
+    """
+    print("Inwestor Pro v1.0.0")
+    if not args.urls_file:
+        print("Blad: --watch wymaga --urls-file.", file=sys.stderr)
+        return 1
+    try:
+        urls = read_urls_file(args.urls_file)
+    except (OSError, ValueError) as e:
+        print(f"Blad: Nie udalo sie wczytac listy URL: {e}", file=sys.stderr)
+        return 1
+    if not urls:
+        print("Blad: Lista URL jest pusta.", file=sys.stderr)
+        return 1
+
+    state_path = args.watch_state or f"{args.urls_file}.watch.json"
+    print(f"Tryb obserwacji: {len(urls)} URL, harmonogram: {state_path}")
+
+    print("Ladowanie klucza API...")
+    api_key = load_cli_api_key(args)
+    if not api_key:
+        return 1
+
+    concurrency = max(1, args.concurrency)
+    try:
+        schedule = WatchSchedule(state_path, args.watch_interval)
+        options = build_shared_options(args, api_key, concurrency)
+    except (OSError, ValueError) as e:
+        print(f"Blad: Nie udalo sie otworzyc harmonogramu lub magazynu: {e}")
+        return 1
+
+    try:
+        with open_metrics_writer(args):
+            visits = run_watch(
+                urls,
+                options,
+                schedule,
+                args.watch_threshold,
+                concurrency,
+                once=args.watch_once,
+            )
+    except KeyboardInterrupt:
+        print("\nPrzerwano tryb obserwacji (harmonogram zapisany).")
+        return 0
+
+    counts: dict[str, int] = {}
+    for _, outcome in visits:
+        counts[outcome] = counts.get(outcome, 0) + 1
+    print("Wizyty: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    return 0 if "error" not in counts else 1
+
+
+class WorkQueue:
+    """
+    Rozproszona kolejka URL w pliku SQLite, bez osobnego brokera.
+
+    Wiele węzłów współdzielących plik (np. przez sieciowy system plików)
+    pobiera zadania przez atomowe przejęcie w transakcji BEGIN IMMEDIATE.
+    Przejęte zadanie ma dzierżawę (lease) przedłużaną przez heartbeat;
+    dzierżawy, które wygasły (np. węzeł przestał działać), wracają do
+    kolejki. Znaczniki czasu pochodzą z zegarów węzłów, które powinny być
+    zsynchronizowane (NTP).
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 300.0, max_attempts: int = 3):
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        conn = self._connect()
+        try:
+            conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                    url TEXT PRIMARY KEY,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    output_path TEXT,
+                    updated REAL
+                )""")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self) -> "sqlite3.Connection":
+        import sqlite3
+
+        # isolation_level=None - transakcje sterowane jawnie przez BEGIN
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    def enqueue(self, urls: list) -> int:
+        """
+        Dodaje URL do kolejki (URL już obecne są pomijane).
+
+        Args:
+            urls: Lista URL
+
+        Returns:
+            int: Liczba nowo dodanych URL
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (url, updated) VALUES (?, ?)",
+                [(url, time.time()) for url in urls],
+            )
+            conn.execute("COMMIT")
+            return conn.total_changes - before
+        finally:
+            conn.close()
+
+    def claim(self, owner: str) -> Optional[str]:
+        """
+        Atomowo przejmuje jedno oczekujące zadanie.
+
+        Przed wyborem zadania dzierżawy, które wygasły, są zwracane do
+        kolejki (lub oznaczane jako failed po max_attempts próbach).
+
+        Args:
+            owner: Identyfikator węzła/wątku przejmującego zadanie
+
+        Returns:
+            str: URL przejętego zadania lub None, gdy brak zadań
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._requeue_expired(conn, now)
+            row = conn.execute(
+                "SELECT url FROM jobs WHERE status = 'pending' "
+                "ORDER BY attempts, rowid LIMIT 1"
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'leased', owner = ?, "
+                    "lease_expires = ?, attempts = attempts + 1, updated = ? "
+                    "WHERE url = ?",
+                    (owner, now + self.lease_seconds, now, row[0]),
+                )
+            conn.execute("COMMIT")
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def heartbeat(self, url: str, owner: str) -> bool:
+        """
+        Przedłuża dzierżawę zadania.
+
+        Args:
+            url: URL zadania
+            owner: Właściciel dzierżawy
+
+        Returns:
+            bool: False, jeśli dzierżawa została już utracona
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? "
+                "WHERE url = ? AND owner = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, url, owner),
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, url: str, owner: str, result: SiteResult) -> bool:
+        """
+        Zapisuje wynik zadania. Nieudane zadanie wraca do kolejki, dopóki
+        nie wyczerpie limitu prób.
+
+        Args:
+            url: URL zadania
+            owner: Właściciel dzierżawy
+            result: Wynik przetwarzania strony
+
+        Returns:
+            bool: False, jeśli dzierżawa została w międzyczasie utracona
+        """
+        if result.ok:
+            status_sql = "'done'"
+            params: tuple = ()
+        else:
+            status_sql = "CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END"
+            params = (self.max_attempts,)
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f"UPDATE jobs SET status = {status_sql}, owner = NULL, "
+                "lease_expires = NULL, error = ?, output_path = ?, updated = ? "
+                "WHERE url = ? AND owner = ? AND status = 'leased'",
+                params + (result.error, result.output_path, time.time(), url, owner),
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def requeue_expired(self) -> int:
+        """
+        Zwraca do kolejki zadania z wygasłą dzierżawą.
+
+        Returns:
+            int: Liczba zadań, których dzierżawa wygasła
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            changed = self._requeue_expired(conn, time.time())
+            conn.execute("COMMIT")
+            return changed
+        finally:
+            conn.close()
+
+    def _requeue_expired(self, conn: "sqlite3.Connection", now: float) -> int:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' "
+            "ELSE 'pending' END, owner = NULL, lease_expires = NULL, "
+            "error = 'Dzierzawa wygasla', updated = ? "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (self.max_attempts, now, now),
+        )
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        """
+        Zwraca liczbę zadań w poszczególnych stanach.
+
+        Returns:
+            dict: Np. {"pending": 10, "leased": 2, "done": 5, "failed": 1}
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        finally:
+            conn.close()
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+
+class LeaseHeartbeat:
+    """Wątek przedłużający dzierżawę zadania w trakcie przetwarzania."""
+
+    def __init__(self, work_queue: WorkQueue, url: str, owner: str):
+        self.work_queue = work_queue
+        self.url = url
+        self.owner = owner
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        import sqlite3
+
+        interval = max(0.01, self.work_queue.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            try:
+                if not self.work_queue.heartbeat(self.url, self.owner):
+                    self.lost = True
+                    return
+            except sqlite3.Error as e:
+                print(f"Blad podczas przedluzania dzierzawy {self.url}: {e}")
+
+
+def run_queue_worker(
+    work_queue: WorkQueue,
+    options: RunOptions,
+    concurrency: int = 1,
+    poll_interval: float = 5.0,
+) -> list:
+    """
+    Przetwarza zadania z rozproszonej kolejki, dopóki nie zostaną wyczerpane.
+
+    Węzeł kończy pracę, gdy w kolejce nie ma zadań oczekujących ani
+    dzierżawionych przez inne węzły. Dopóki inne węzły mają dzierżawy,
+    węzeł czeka - jeśli któryś z nich przestanie działać, jego zadania
+    zostaną przejęte po wygaśnięciu dzierżawy.
+
+    Args:
+        work_queue: Kolejka zadań
+        options: Wspólne ustawienia przetwarzania
+        concurrency: Liczba wątków przetwarzających na tym węźle
+        poll_interval: Odstęp między próbami, gdy brak wolnych zadań
+
+    Returns:
+        list: Lista SiteResult przetworzonych przez ten węzeł
+    """
+    import socket
+
+    node = f"{socket.gethostname()}:{os.getpid()}"
+    results = []
+    results_lock = threading.Lock()
+
+    def worker(n: int) -> None:
+        owner = f"{node}:{n}"
+        while True:
+            url = work_queue.claim(owner)
+            if url is None:
+                if work_queue.stats()["leased"] == 0:
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            with LeaseHeartbeat(work_queue, url, owner) as heartbeat:
+                result = process_site(url, options, None, True)
+            if heartbeat.lost or not work_queue.complete(url, owner, result):
+                print(f"Ostrzezenie: utracono dzierzawe zadania {url}")
+            status = "[OK]" if result.ok else "[ERROR]"
+            print(f"{status} [{owner}] {url}")
+            with results_lock:
+                results.append(result)
+
+    threads = [
+        threading.Thread(target=worker, args=(n,), daemon=True)
+        for n in range(max(1, concurrency))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run_queue_worker_cli(args: argparse.Namespace) -> int:
+    """
+    Obsługuje tryb węzła rozproszonej kolejki CLI (--queue-worker).
+
+    Args:
+        args: Sparsowane argumenty linii komend
+
+    Returns:
+        int: Kod wyjścia
+    """
+    import sqlite3
+
+    print("Inwestor Pro v1.0.0")
+    try:
+        work_queue = WorkQueue(args.queue_worker, lease_seconds=args.lease_seconds)
+    except sqlite3.Error as e:
+        print(f"Blad: Nie udalo sie otworzyc kolejki: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Wezel kolejki {args.queue_worker}: {work_queue.stats()}")
+
+    print("Ladowanie klucza API...")
+    api_key = load_cli_api_key(args)
+    if not api_key:
+        return 1
+
+    concurrency = max(1, args.concurrency)
+    try:
+        options = build_shared_options(args, api_key, concurrency)
+    except (OSError, ValueError) as e:
+        print(f"Blad: Nie udalo sie otworzyc magazynu artefaktow lub kasety: {e}")
+        return 1
+    with open_metrics_writer(args):
+        results = run_queue_worker(work_queue, options, concurrency)
+    print_batch_summary(results)
+    write_batch_usage(results)
+    if options.profile or options.memprofile:
+        write_batch_profile(results)
+    print(f"Stan kolejki: {work_queue.stats()}")
+    return 0 if all(result.ok for result in results) else 1
+
+
+# Maksymalna liczba zadań pamiętanych przez serwis; najstarsze zakończone
+# zadania są usuwane po przekroczeniu limitu
+SERVICE_MAX_JOBS = 10000
+
+
+def is_safe_output_name(name: Any) -> bool:
+    """
+    Sprawdza, czy nazwa pliku wyjściowego z żądania jest samą nazwą pliku.
+
+    Odrzuca ścieżki bezwzględne, separatory katalogów i "..", aby klient
+    serwisu nie mógł zapisać (i odczytać) pliku poza katalogiem wyniki/.
+
+    Args:
+        name: Nazwa pliku przekazana w żądaniu
+
+    Returns:
+        bool: True, jeśli nazwa jest bezpieczna
+    """
+    if not isinstance(name, str) or not name.strip() or "\0" in name:
+        return False
+    if "/" in name or "\\" in name or ".." in name or name == ".":
+        return False
+    return not Path(name).is_absolute()
+
+
+class BrochureService:
+    """
+    Długo działający serwis generowania broszur z kolejką zadań w procesie.
+
+    Sesja HTTP i klient OpenAI z RunOptions są współdzielone przez wszystkie
+    zadania, więc kolejne żądania nie płacą za import modułów ani zimne
+    połączenia. Serwis pamięta najwyżej max_jobs zadań - po przekroczeniu
+    limitu zapominane są najstarsze zakończone zadania.
+    """
+
+    def __init__(
+        self, options: RunOptions, workers: int = 2, max_jobs: int = SERVICE_MAX_JOBS
+    ):
+        self.options = options
+        self.workers = max(1, workers)
+        self.max_jobs = max(1, max_jobs)
+        self._queue: queue.Queue = queue.Queue()
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._threads: list = []
+
+    def start(self) -> None:
+        """Uruchamia wątki przetwarzające zadania."""
+        for n in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker, name=f"service-{n}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Zatrzymuje wątki po dokończeniu zadań z kolejki."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(
+        self,
+        url: str,
+        output: Optional[str] = None,
+        max_subpages: Optional[int] = None,
+    ) -> dict:
+        """
+        Dodaje zadanie wygenerowania broszury do kolejki.
+
+        Args:
+            url: URL strony do analizy
+            output: Opcjonalna nazwa pliku wyjściowego (bez katalogów,
+                zapisywana w wyniki/YYYY-MM-DD/)
+            max_subpages: Opcjonalny limit podstron dla tego zadania
+
+        Returns:
+            dict: Status nowego zadania
+
+        Raises:
+            ValueError: Gdy URL lub parametry są nieprawidłowe
+        """
+        if not is_valid_url(url):
+            raise ValueError("Podany URL nie jest prawidlowy.")
+        if max_subpages is not None and (
+            not isinstance(max_subpages, int) or max_subpages < 0
+        ):
+            raise ValueError("max_subpages musi byc nieujemna liczba calkowita.")
+        if output is not None and not is_safe_output_name(output):
+            raise ValueError("output musi byc nazwa pliku bez katalogow.")
+
+        job = {
+            "id": os.urandom(16).hex(),
+            "url": url,
+            "output": output,
+            "max_subpages": max_subpages,
+            "status": "queued",
+            "output_path": None,
+            "error": None,
+            "submitted": datetime.now().isoformat(timespec="seconds"),
+            "finished": None,
+            "elapsed": None,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._evict_finished()
+        self._queue.put(job["id"])
+        return self.get_status(job["id"])
+
+    def _evict_finished(self) -> None:
+        """Usuwa najstarsze zakończone zadania ponad limit max_jobs."""
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job["status"] in ("done", "error")
+        ]
+        for job_id in finished[:excess]:
+            del self._jobs[job_id]
+
+    def get_status(self, job_id: str) -> Optional[dict]:
+        """
+        Zwraca status zadania.
+
+        Args:
+            job_id: Identyfikator zadania
+
+        Returns:
+            dict: Kopia danych zadania lub None dla nieznanego identyfikatora
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def get_result(self, job_id: str) -> Optional[str]:
+        """
+        Zwraca treść wygenerowanej broszury.
+
+        Args:
+            job_id: Identyfikator zadania
+
+        Returns:
+            str: Broszura w formacie Markdown lub None, jeśli niegotowa
+        """
+        job = self.get_status(job_id)
+        if not job or job["status"] != "done" or not job["output_path"]:
+            return None
+        try:
+            return Path(job["output_path"]).read_text(encoding="utf-8")
+        except OSError as e:
+            print(f"Blad podczas odczytu broszury {job['output_path']}: {e}")
+            return None
+
+    def queue_size(self) -> int:
+        """Zwraca liczbę zadań oczekujących w kolejce."""
+        return self._queue.qsize()
+
+    def _worker(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self._lock:
+                job = self._jobs[job_id]
+                job["status"] = "running"
+                url, output = job["url"], job["output"]
+                max_subpages = job["max_subpages"]
+
+            options = self.options
+            if max_subpages is not None:
+                options = replace(options, max_subpages=max_subpages)
+            result = process_site(url, options, output, include_path=True)
+
+            with self._lock:
+                job["status"] = "done" if result.ok else "error"
+                job["output_path"] = result.output_path
+                job["error"] = result.error
+                job["elapsed"] = round(result.elapsed, 3)
+                job["finished"] = datetime.now().isoformat(timespec="seconds")
+
+
+def make_service_handler(service: BrochureService) -> type:
+    """
+    Tworzy klasę obsługi żądań HTTP dla serwisu broszur.
+
+    Endpointy:
+        POST /jobs               - {"url": ..., "output": ..., "max_subpages": ...}
+        GET  /jobs/<id>          - status zadania
+        GET  /jobs/<id>/result   - broszura w formacie Markdown
+        GET  /health             - stan serwisu
+        GET  /metrics            - metryki procesu (format Prometheus)
+
+    Args:
+        service: Serwis obsługujący zadania
+
+    Returns:
+        type: Podklasa BaseHTTPRequestHandler
+    """
+    from http.server import BaseHTTPRequestHandler
+
+    class ServiceHandler(BaseHTTPRequestHandler):
+        server_version = "InwestorPro/1.0.0"
+
+        def _send(self, status: int, body: str, content_type: str) -> None:
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            self._send(
+                status, json.dumps(payload, ensure_ascii=False), "application/json"
+            )
+
+        def do_POST(self) -> None:  # noqa: N802
+            if self.path.rstrip("/") != "/jobs":
+                self._send_json(404, {"error": "Nie znaleziono"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("Oczekiwano obiektu JSON.")
+                job = service.submit(
+                    payload.get("url", ""),
+                    payload.get("output"),
+                    payload.get("max_subpages"),
+                )
+            except (ValueError, json.JSONDecodeError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            self._send_json(202, job)
+
+        def do_GET(self) -> None:  # noqa: N802
+            parts = [p for p in self.path.split("?")[0].split("/") if p]
+            if parts == ["health"]:
+                self._send_json(
+                    200,
+                    {
+                        "status": "ok",
+                        "workers": service.workers,
+                        "queued": service.queue_size(),
+                    },
+                )
+                return
+            if parts == ["metrics"]:
+                # OpenMetrics tylko dla klientów, które go negocjują
+                accept = self.headers.get("Accept") or ""
+                if "application/openmetrics-text" in accept:
+                    self._send(
+                        200,
+                        METRICS.render(openmetrics=True),
+                        "application/openmetrics-text; version=1.0.0",
+                    )
+                else:
+                    self._send(200, METRICS.render(), "text/plain; version=0.0.4")
+                return
+            if len(parts) not in (2, 3) or parts[0] != "jobs":
+                self._send_json(404, {"error": "Nie znaleziono"})
+                return
+
+            job = service.get_status(parts[1])
+            if job is None:
+                self._send_json(404, {"error": "Nieznane zadanie"})
+            elif len(parts) == 2:
+                self._send_json(200, job)
+            elif parts[2] != "result":
+                self._send_json(404, {"error": "Nie znaleziono"})
+            else:
+                content = service.get_result(parts[1])
+                if content is None:
+                    self._send_json(409, job)
+                else:
+                    self._send(200, content, "text/markdown")
+
+        def log_message(self, format: str, *args: Any) -> None:
+            if service.options.verbose:
+                super().log_message(format, *args)
+
+    return ServiceHandler
+
+
+def create_service_server(
+    service: BrochureService, host: str = "127.0.0.1", port: int = 8080
+) -> Any:
+    """
+    Tworzy wielowątkowy serwer HTTP dla serwisu broszur.
+
+    Args:
+        service: Serwis obsługujący zadania
+        host: Adres nasłuchu
+        port: Port (0 - dowolny wolny port)
+
+    Returns:
+        ThreadingHTTPServer: Serwer gotowy do serve_forever()
+    """
+    from http.server import ThreadingHTTPServer
+
+    return ThreadingHTTPServer((host, port), make_service_handler(service))
+
+
+def run_service_cli(args: argparse.Namespace) -> int:
+    """
+    Obsługuje tryb serwisu HTTP CLI (--serve).
+
+    Args:
+        args: Sparsowane argumenty linii komend
+
+    Returns:
+        int: Kod wyjścia
+    """
+    print("Inwestor Pro v1.0.0")
+    print("Ladowanie klucza API...")
+    api_key = load_cli_api_key(args)
+    if not api_key:
+        return 1
+
+    workers = max(1, args.workers)
+    try:
+        options = build_shared_options(args, api_key, workers)
+    except (OSError, ValueError) as e:
+        print(f"Blad: Nie udalo sie otworzyc magazynu artefaktow lub kasety: {e}")
+        return 1
+    service = BrochureService(options, workers)
+
+    try:
+        server = create_service_server(service, args.host, args.port)
+    except OSError as e:
+        print(f"Blad: Nie udalo sie uruchomic serwera: {e}", file=sys.stderr)
+        return 1
+
+    service.start()
+    host, port = server.server_address[:2]
+    print(f"Serwis nasluchuje na http://{host}:{port} (watki: {workers})")
+    with open_metrics_writer(args):
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("Zatrzymywanie serwisu...")
+        finally:
+            server.server_close()
+            service.stop()
+    return 0
+
+
+def create_http_session(pool_size: int = 10) -> "requests.Session":
+    """
+    Tworzy sesję HTTP z pulą połączeń współdzieloną między pobraniami.
+
+    Args:
+        pool_size: Maksymalna liczba połączeń na host
+
+    Returns:
+        requests.Session: Skonfigurowana sesja
+    """
+    import requests
+
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT})
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class HostConcurrencyLimiter:
+    """
+    Adaptacyjny limit równoczesnych żądań HTTP do jednego hosta (AIMD).
+
+    Szybka, udana odpowiedź zwiększa limit hosta o 1/limit (czyli o około 1
+    na każde "okno" limit żądań). Timeout, błąd połączenia, odpowiedź
+    429/503 lub czas odpowiedzi powyżej latency_target mnożą limit przez
+    backoff. Limit jest zmniejszany najwyżej raz na okno - żądania
+    rozpoczęte przed ostatnim zmniejszeniem nie zmniejszają go ponownie.
+
+    Limiter jest bezpieczny wątkowo i współdzielony przez wszystkie wątki
+    pobierania; bieżące limity są publikowane w metryce
+    inwestor_fetch_concurrency_limit{host}.
+    """
+
+    # Wyniki żądań, które zmniejszają limit hosta
+    BACKOFF_OUTCOMES = ("timeout", "connection", "throttled", "slow")
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 8,
+        latency_target: float = 5.0,
+        backoff: float = 0.5,
+        max_hosts: int = 1024,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.initial = min(max(initial, self.minimum), self.maximum)
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.max_hosts = max_hosts
+        self._cond = threading.Condition()
+        self._hosts: dict[str, dict] = {}
+
+    def _state(self, host: str) -> dict:
+        """Zwraca stan hosta, tworząc go w razie potrzeby (pod blokadą)."""
+        state = self._hosts.get(host)
+        if state is None:
+            if len(self._hosts) >= self.max_hosts:
+                self._evict_idle()
+            state = {
+                "limit": float(self.initial),
+                "in_flight": 0,
+                "last_decrease": float("-inf"),
+                "last_used": time.perf_counter(),
+            }
+            self._hosts[host] = state
+            METRICS.set("inwestor_fetch_concurrency_limit", state["limit"], host=host)
+        return state
+
+    def _evict_idle(self) -> None:
+        """Zapomina najdawniej używane hosty bez żądań w toku (pod blokadą)."""
+        idle = sorted(
+            (state["last_used"], host)
+            for host, state in self._hosts.items()
+            if not state["in_flight"]
+        )
+        for _, host in idle[: len(self._hosts) - self.max_hosts + 1]:
+            del self._hosts[host]
+            METRICS.remove("inwestor_fetch_concurrency_limit", host=host)
+
+    def acquire(self, host: str, timeout: Optional[float] = None) -> bool:
+        """
+        Czeka na wolne miejsce w limicie hosta i je zajmuje.
+
+        Args:
+            host: Host (netloc) żądania
+            timeout: Maksymalny czas oczekiwania w sekundach (None = bez końca)
+
+        Returns:
+            bool: True jeśli zajęto miejsce, False po upływie timeout
+        """
+        with self._cond:
+            state = self._state(host)
+            if not self._cond.wait_for(
+                lambda: state["in_flight"] < int(state["limit"]), timeout
+            ):
+                return False
+            state["in_flight"] += 1
+            return True
+
+    def release(self, host: str, started: float, outcome: str) -> None:
+        """
+        Zwalnia miejsce i koryguje limit hosta na podstawie wyniku żądania.
+
+        Args:
+            host: Host (netloc) żądania
+            started: Chwila rozpoczęcia żądania (time.perf_counter)
+            outcome: Wynik: ok, timeout, connection, throttled lub error
+        """
+        now = time.perf_counter()
+        if outcome == "ok" and now - started > self.latency_target:
+            outcome = "slow"
+        with self._cond:
+            state = self._state(host)
+            state["in_flight"] = max(state["in_flight"] - 1, 0)
+            state["last_used"] = now
+            if outcome == "ok":
+                state["limit"] = min(self.maximum, state["limit"] + 1 / state["limit"])
+            elif outcome in self.BACKOFF_OUTCOMES and started >= state["last_decrease"]:
+                state["limit"] = max(self.minimum, state["limit"] * self.backoff)
+                state["last_decrease"] = now
+                METRICS.inc("inwestor_fetch_backoffs_total", reason=outcome)
+            METRICS.set(
+                "inwestor_fetch_concurrency_limit",
+                round(state["limit"], 3),
+                host=host,
+            )
+            self._cond.notify_all()
+
+    def limit(self, host: str) -> float:
+        """Zwraca bieżący limit hosta (limit początkowy dla nowego hosta)."""
+        with self._cond:
+            state = self._hosts.get(host)
+            return state["limit"] if state else float(self.initial)
+
+
+# Tryby kasety nagrań (--record, --replay)
+CASSETTE_MODES = ("record", "replay")
+
+# Zastępczy klucz API przy --replay (API OpenAI nie jest wtedy wywoływane)
+REPLAY_API_KEY = "replay"
+
+# Znaczniki czasu w prompcie (DATA ANALIZY) pomijane w kluczu nagrania LLM
+# i w kluczu etapu broszury, inaczej każdy przebieg miałby inny klucz
+_VOLATILE_PROMPT_RE = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+
+class Cassette:
+    """
+    Kaseta nagrań HTTP i LLM do deterministycznych przebiegów offline.
+
+    W trybie "record" każda odpowiedź HTTP (fetch_html, fetch_subpage_content,
+    fetch_html_conditional) i każda odpowiedź chat.completions.create jest
+    zapisywana w katalogu kasety. W trybie "replay" odpowiedzi są odtwarzane
+    bez sieci i bez API OpenAI, z opóźnieniem nagranym ("recorded") lub
+    stałym (liczba sekund, 0 = bez opóźnienia). Brak nagrania jest
+    zgłaszany jako błąd połączenia (HTTP) lub błąd generowania (LLM).
+
+    Układ katalogu:
+        http/<klucz>.json - URL, status, nagłówki i czas odpowiedzi
+        http/<klucz>.body - surowa treść odpowiedzi
+        llm/<klucz>.json - treść odpowiedzi, usage i czas odpowiedzi
+    """
+
+    def __init__(
+        self,
+        root: Union[str, Path],
+        mode: str = "replay",
+        latency: Union[str, float] = "recorded",
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Nieznany tryb kasety: {mode}")
+        if latency != "recorded" and not (
+            isinstance(latency, (int, float)) and latency >= 0
+        ):
+            raise ValueError(f"Nieprawidlowe opoznienie odtwarzania: {latency}")
+        self.root = Path(root)
+        self.mode = mode
+        self.latency = latency
+        self._sleep = sleep
+        if mode == "record":
+            (self.root / "http").mkdir(parents=True, exist_ok=True)
+            (self.root / "llm").mkdir(parents=True, exist_ok=True)
+        elif not self.root.is_dir():
+            raise ValueError(f"Katalog kasety nie istnieje: {self.root}")
+
+    @staticmethod
+    def http_key(url: str, headers: Optional[dict] = None) -> str:
+        """
+        Zwraca klucz nagrania HTTP.
+
+        Kluczem jest znormalizowany URL i nagłówki warunkowe (If-None-Match,
+        If-Modified-Since) - ten sam URL z walidatorami i bez nich to dwa
+        różne nagrania (304 i 200).
+        """
+        conditional = sorted(
+            f"{name.lower()}: {value}"
+            for name, value in (headers or {}).items()
+            if name.lower().startswith("if-")
+        )
+        return content_hash("\n".join([normalize_url(url), *conditional]))
+
+    @staticmethod
+    def llm_key(request: dict) -> str:
+        """Zwraca klucz nagrania LLM (model, wiadomości i parametry)."""
+        messages = [
+            {**m, "content": _VOLATILE_PROMPT_RE.sub("<czas>", m.get("content", ""))}
+            for m in request.get("messages", [])
+        ]
+        return content_hash(
+            json.dumps(
+                {
+                    "model": request.get("model"),
+                    "messages": messages,
+                    "max_tokens": request.get("max_tokens"),
+                    "temperature": request.get("temperature"),
+                },
+                ensure_ascii=False,
+                sort_keys=True,
+            )
+        )
+
+    def _delay(self, recorded: float) -> float:
+        """Zwraca opóźnienie odtwarzania w sekundach."""
+        return recorded if self.latency == "recorded" else float(self.latency)
+
+    def session(self, session: Any = None) -> "_CassetteSession":
+        """
+        Owija sesję HTTP (None = requests.get) nagrywaniem lub odtwarzaniem.
+
+        Args:
+            session: Sesja używana do rzeczywistych żądań w trybie "record"
+
+        Returns:
+            _CassetteSession: Obiekt z metodą get(url, headers, timeout)
+        """
+        return _CassetteSession(self, session)
+
+    def client(self, factory: Callable[[], Any]) -> "_CassetteClient":
+        """
+        Owija klienta OpenAI nagrywaniem lub odtwarzaniem.
+
+        Args:
+            factory: Funkcja tworząca rzeczywistego klienta; wywoływana
+                leniwie i tylko w trybie "record"
+
+        Returns:
+            _CassetteClient: Obiekt z metodą chat.completions.create
+        """
+        return _CassetteClient(self, factory)
+
+    def record_http(self, key: str, url: str, response: Any, elapsed: float) -> None:
+        """Zapisuje odpowiedź HTTP w kasecie."""
+        content = getattr(response, "content", None)
+        meta = {
+            "url": url,
+            "status": response.status_code,
+            "reason": getattr(response, "reason", None),
+            "headers": dict(getattr(response, "headers", {}) or {}),
+            "elapsed_s": round(elapsed, 6),
+        }
+        directory = self.root / "http"
+        _atomic_write(
+            directory / f"{key}.body",
+            content if isinstance(content, bytes) else b"",
+        )
+        _atomic_write(
+            directory / f"{key}.json",
+            json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8"),
+        )
+
+    def replay_http(
+        self, key: str, url: str, timeout: Optional[float] = None
+    ) -> "requests.Response":
+        """
+        Odtwarza odpowiedź HTTP z kasety.
+
+        Nagrane opóźnienie dłuższe niż timeout kończy się (po odczekaniu
+        timeout) wyjątkiem Timeout, jak przy rzeczywistym żądaniu.
+
+        Raises:
+            requests.exceptions.ConnectionError: Brak nagrania
+            requests.exceptions.Timeout: Opóźnienie przekracza timeout
+        """
+        import requests
+        from requests.structures import CaseInsensitiveDict
+
+        path = self.root / "http" / f"{key}.json"
+        try:
+            meta = json.loads(path.read_text(encoding="utf-8"))
+            body = path.with_suffix(".body").read_bytes()
+        except (OSError, ValueError):
+            METRICS.inc("inwestor_cassette_misses_total", kind="http")
+            raise requests.exceptions.ConnectionError(
+                f"Brak nagrania w kasecie {self.root} dla {url}"
+            )
+
+        delay = self._delay(meta.get("elapsed_s", 0.0))
+        if timeout is not None and delay > timeout:
+            self._sleep(timeout)
+            raise requests.exceptions.Timeout(f"Odtworzony timeout dla {url}")
+        if delay > 0:
+            self._sleep(delay)
+
+        response = requests.Response()
+        response.status_code = meta["status"]
+        response.reason = meta.get("reason")
+        response.headers = CaseInsensitiveDict(meta.get("headers", {}))
+        response.url = meta.get("url", url)
+        response.raw = io.BytesIO(body)
+        return response
+
+    def record_llm(
+        self, key: str, request: dict, response: Any, elapsed: float
+    ) -> None:
+        """Zapisuje odpowiedź chat.completions.create w kasecie."""
+        usage = getattr(response, "usage", None)
+        entry = {
+            "model": request.get("model"),
+            "content": response.choices[0].message.content,
+            "usage": {
+                "prompt_tokens": _int_attr(usage, "prompt_tokens"),
+                "completion_tokens": _int_attr(usage, "completion_tokens"),
+                "cached_tokens": _int_attr(
+                    getattr(usage, "prompt_tokens_details", None), "cached_tokens"
+                ),
+            },
+            "elapsed_s": round(elapsed, 6),
+        }
+        _atomic_write(
+            self.root / "llm" / f"{key}.json",
+            json.dumps(entry, ensure_ascii=False, indent=2).encode("utf-8"),
+        )
+
+    def replay_llm(self, key: str) -> Any:
+        """
+        Odtwarza odpowiedź chat.completions.create z kasety.
+
+        Raises:
+            RuntimeError: Brak nagrania
+        """
+        path = self.root / "llm" / f"{key}.json"
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            METRICS.inc("inwestor_cassette_misses_total", kind="llm")
+            raise RuntimeError(f"Brak nagrania odpowiedzi LLM w kasecie {self.root}")
+
+        delay = self._delay(entry.get("elapsed_s", 0.0))
+        if delay > 0:
+            self._sleep(delay)
+
+        usage = entry.get("usage", {})
+        return SimpleNamespace(
+            model=entry.get("model"),
+            choices=[
+                SimpleNamespace(message=SimpleNamespace(content=entry["content"]))
+            ],
+            usage=SimpleNamespace(
+                prompt_tokens=usage.get("prompt_tokens", 0),
+                completion_tokens=usage.get("completion_tokens", 0),
+                prompt_tokens_details=SimpleNamespace(
+                    cached_tokens=usage.get("cached_tokens", 0)
+                ),
+            ),
+        )
+
+
+class _CassetteSession:
+    """Sesja HTTP nagrywająca lub odtwarzająca żądania GET (Cassette.session)."""
+
+    def __init__(self, cassette: Cassette, session: Any = None):
+        self.cassette = cassette
+        self._session = session
+
+    def get(
+        self,
+        url: str,
+        headers: Optional[dict] = None,
+        timeout: Any = None,
+        stream: bool = False,
+    ) -> Any:
+        # Nagranie zapisuje całą treść, więc odpowiedź nie jest strumieniowana;
+        # odtworzona odpowiedź jest już wczytana (limit egzekwuje apply_cap)
+        key = Cassette.http_key(url, headers)
+        if self.cassette.mode == "replay":
+            return self.cassette.replay_http(key, url, timeout)
+
+        import requests
+
+        getter = self._session.get if self._session is not None else requests.get
+        started = time.perf_counter()
+        response = getter(url, headers=headers, timeout=timeout)
+        self.cassette.record_http(key, url, response, time.perf_counter() - started)
+        return response
+
+
+class _CassetteClient:
+    """Klient OpenAI nagrywający lub odtwarzający odpowiedzi (Cassette.client)."""
+
+    def __init__(self, cassette: Cassette, factory: Callable[[], Any]):
+        self.cassette = cassette
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _real_client(self) -> Any:
+        with self._lock:
+            if self._client is None:
+                self._client = self._factory()
+            return self._client
+
+    def with_options(self, **options: Any) -> "_CassetteClient":
+        """Zwraca kopię klienta z opcjami (np. max_retries) klienta nagrywanego."""
+        return _CassetteClient(
+            self.cassette, lambda: self._real_client().with_options(**options)
+        )
+
+    def _create(self, **request: Any) -> Any:
+        key = Cassette.llm_key(request)
+        if self.cassette.mode == "replay":
+            return self.cassette.replay_llm(key)
+
+        started = time.perf_counter()
+        response = self._real_client().chat.completions.create(**request)
+        self.cassette.record_llm(key, request, response, time.perf_counter() - started)
+        return response
+
+
+# Rozmiar porcji strumieniowanej treści (bez limitu czasu i z --site-deadline)
+STREAM_CHUNK_BYTES = 65536
+DEADLINE_CHUNK_BYTES = 8192
+
+
+def _http_get(
+    url: str,
+    timeout: int,
+    session: Any = None,
+    limiter: Any = None,
+    extra_headers: Optional[dict] = None,
+    max_bytes: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> Any:
+    """
+    Wykonuje żądanie GET przez sesję (jeśli podano) lub requests.get.
+
+    Args:
+        url: URL do pobrania
+        timeout: Timeout w sekundach
+        session: Opcjonalna współdzielona sesja HTTP
+        limiter: Opcjonalny HostConcurrencyLimiter ograniczający liczbę
+            równoczesnych żądań do hosta
+        extra_headers: Dodatkowe nagłówki żądania (np. If-None-Match)
+        max_bytes: Limit treści (--max-html-bytes); treść jest pobierana
+            strumieniowo i czytana najwyżej do max_bytes + 1 bajtów
+        deadline: Termin (time.perf_counter) końca pobierania (--site-deadline);
+            treść jest pobierana strumieniowo, a po terminie przerywana
+
+    Returns:
+        tuple: (requests.Response, treść w bajtach) - treść jest zwracana
+            osobno, bo przy max_bytes odpowiedź jest czytana tylko częściowo
+    """
+    import requests
+
+    headers = {"User-Agent": USER_AGENT, **(extra_headers or {})}
+    getter = session.get if session is not None else requests.get
+    host = urlparse(url).netloc.lower()
+    if limiter is not None and not limiter.acquire(host, timeout):
+        METRICS.inc("inwestor_fetch_errors_total", type="timeout")
+        raise requests.exceptions.Timeout(
+            f"Brak wolnego miejsca w limicie polaczen do {host}"
+        )
+
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        try:
+            if max_bytes is None and deadline is None:
+                response = getter(url, headers=headers, timeout=timeout)
+                content = getattr(response, "content", None)
+            else:
+                response = getter(url, headers=headers, timeout=timeout, stream=True)
+                content = _read_limited(response, max_bytes, deadline)
+        except requests.exceptions.Timeout:
+            outcome = "timeout"
+            METRICS.inc("inwestor_fetch_errors_total", type="timeout")
+            raise
+        except requests.exceptions.ConnectionError:
+            outcome = "connection"
+            METRICS.inc("inwestor_fetch_errors_total", type="connection")
+            raise
+        except Exception:
+            METRICS.inc("inwestor_fetch_errors_total", type="other")
+            raise
+
+        status = getattr(response, "status_code", None)
+        outcome = "throttled" if status in (429, 503) else "ok"
+        if isinstance(status, int) and status >= 400:
+            METRICS.inc("inwestor_fetch_errors_total", type=f"http_{status // 100}xx")
+        if isinstance(content, bytes):
+            METRICS.inc("inwestor_fetch_bytes_total", len(content))
+        return response, content
+    finally:
+        if limiter is not None:
+            limiter.release(host, started, outcome)
+
+
+def _read_limited(
+    response: Any, max_bytes: Optional[int] = None, deadline: Optional[float] = None
+) -> bytes:
+    """
+    Wczytuje treść strumieniowanej odpowiedzi, najwyżej max_bytes + 1 bajtów.
+
+    Nadmiarowy bajt pozwala apply_cap wykryć przekroczenie limitu i zapisać
+    degradację, a szczyt pamięci pozostaje ograniczony limitem zamiast
+    rozmiarem całej strony. Termin jest sprawdzany między porcjami, więc
+    serwer wysyłający treść po kilka bajtów nie przedłuży pobierania ponad
+    --site-deadline. Połączenie przerwanej odpowiedzi jest zamykane.
+    Odpowiedzi już wczytane (np. nagrywane w kasecie) iter_content zwraca
+    z pamięci.
+
+    Args:
+        response: Odpowiedź pobrana z stream=True
+        max_bytes: Opcjonalny limit treści w bajtach
+        deadline: Opcjonalny termin (time.perf_counter) końca pobierania
+
+    Returns:
+        bytes: Wczytana treść (najwyżej max_bytes + 1 bajtów)
+
+    Raises:
+        requests.exceptions.Timeout: Treść nie została pobrana przed terminem
+    """
+    import requests
+
+    # Z terminem porcje są mniejsze, aby czas był sprawdzany częściej
+    chunk_size = STREAM_CHUNK_BYTES if deadline is None else DEADLINE_CHUNK_BYTES
+    chunks = []
+    size = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if deadline is not None and time.perf_counter() > deadline:
+                raise requests.exceptions.Timeout(
+                    f"Przekroczono limit czasu strony podczas pobierania "
+                    f"{getattr(response, 'url', '')}"
+                )
+            chunks.append(chunk)
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                break
+    finally:
+        response.close()
+    content = b"".join(chunks)
+    return content if max_bytes is None else content[: max_bytes + 1]
+
+
+# Znacznik kolejności bajtów -> kodowanie (dłuższe znaczniki najpierw)
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+_HEADER_CHARSET_RE = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+
+# Liczba bajtów początku dokumentu przeszukiwana w poszukiwaniu <meta charset>
+META_SNIFF_BYTES = 4096
+
+
+def _known_codec(name: str) -> Optional[str]:
+    """Zwraca nazwę kodowania, jeśli Python je zna, w przeciwnym razie None."""
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def sniff_charset(content: bytes, content_type: str = "") -> str:
+    """
+    Szybko ustala kodowanie dokumentu HTML bez analizy całej treści.
+
+    Kolejność: parametr charset nagłówka Content-Type, znacznik BOM,
+    <meta charset> lub <meta http-equiv> w pierwszych META_SNIFF_BYTES
+    bajtach, a w ostateczności UTF-8.
+
+    Args:
+        content: Surowa treść odpowiedzi
+        content_type: Wartość nagłówka Content-Type
+
+    Returns:
+        str: Nazwa kodowania do użycia w bytes.decode
+    """
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            bom_encoding = encoding
+            break
+    else:
+        bom_encoding = None
+
+    match = _HEADER_CHARSET_RE.search(content_type or "")
+    if match:
+        encoding = _known_codec(match.group(1))
+        if encoding:
+            # BOM UTF-8 przy nagłówku utf-8 - pomiń znacznik przy dekodowaniu
+            return "utf-8-sig" if bom_encoding == "utf-8-sig" else encoding
+
+    if bom_encoding:
+        return bom_encoding
+
+    match = _META_CHARSET_RE.search(content[:META_SNIFF_BYTES])
+    if match:
+        encoding = _known_codec(match.group(1).decode("ascii", errors="ignore"))
+        # Deklaracja UTF-16/32 w <meta> jest niemożliwa bez BOM (jak w HTML5)
+        if encoding and not encoding.startswith(("utf-16", "utf-32")):
+            return encoding
+    return "utf-8"
+
+
+def decode_html(content: bytes, content_type: str = "") -> str:
+    """
+    Dekoduje treść HTML kodowaniem ustalonym przez sniff_charset.
+
+    Args:
+        content: Surowa treść odpowiedzi
+        content_type: Wartość nagłówka Content-Type
+
+    Returns:
+        str: Zdekodowany HTML (błędne bajty są zastępowane)
+    """
+    return content.decode(sniff_charset(content, content_type), errors="replace")
+
+
+def _response_html(response: Any, content: Any) -> str:
+    """
+    Zwraca HTML odpowiedzi, dekodując bajty bez response.text.
+
+    response.text przy braku charset w nagłówku uruchamia wykrywanie kodowania
+    na całej treści (lub zakłada ISO-8859-1 dla text/*), dlatego dekodujemy
+    bajty raz, według nagłówka, BOM i <meta charset>.
+
+    Args:
+        response: Odpowiedź serwera (nagłówki)
+        content: Treść zwrócona przez _http_get
+    """
+    if not isinstance(content, bytes):
+        return response.text
+    return decode_html(content, response.headers.get("content-type", ""))
+
+
+def _make_soup(html_content: Any) -> Any:
+    """
+    Tworzy drzewo BeautifulSoup z napisu lub bezpośrednio z bajtów.
+
+    Dla bajtów kodowanie jest ustalane przez sniff_charset, więc
+    BeautifulSoup nie wykonuje własnego wykrywania kodowania.
+    """
+    from bs4 import BeautifulSoup
+
+    if isinstance(html_content, bytes):
+        return BeautifulSoup(
+            html_content, "html.parser", from_encoding=sniff_charset(html_content)
+        )
+    return BeautifulSoup(html_content, "html.parser")
+
+
+def fetch_html(
+    url: str,
+    timeout: int = 30,
+    session: Any = None,
+    limiter: Any = None,
+    max_bytes: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> Optional[str]:
+    """
+    Pobiera zawartość HTML strony internetowej.
+
+    Args:
+        url: URL strony do pobrania
+        timeout: Timeout w sekundach (domyślnie 30)
+        session: Opcjonalna współdzielona sesja HTTP
+        limiter: Opcjonalny adaptacyjny limit połączeń do hosta
+        max_bytes: Opcjonalny limit pobieranej treści w bajtach
+        deadline: Opcjonalny termin (time.perf_counter) końca pobierania
+
+    Returns:
+        str: Zawartość HTML strony lub None w przypadku błędu
+    """
+    import requests
+
+    try:
+        response, content = _http_get(
+            url, timeout, session, limiter, max_bytes=max_bytes, deadline=deadline
+        )
+        response.raise_for_status()
+
+        # Sprawdź czy odpowiedź to HTML
+        content_type = response.headers.get("content-type", "").lower()
+        if "text/html" not in content_type:
+            print(
+                f"Ostrzezenie: Strona nie zwraca HTML "
+                f"(content-type: {content_type})"
+            )
+
+        return _response_html(response, content)
 
     except requests.exceptions.RequestException as e:
         print(f"Blad podczas pobierania strony {url}: {e}")
@@ -522,27 +6512,213 @@ def fetch_html(url: str, timeout: int = 30) -> Optional[str]:
         return None
 
 
-def find_subpage_links(html_content: str, base_url: str, max_links: int = 5) -> list:
+# Walidatory HTTP zapamiętywane między wizytami: nagłówek odpowiedzi ->
+# (klucz walidatora, nagłówek żądania warunkowego)
+_VALIDATOR_HEADERS = {
+    "ETag": ("etag", "If-None-Match"),
+    "Last-Modified": ("last_modified", "If-Modified-Since"),
+}
+
+
+def fetch_html_conditional(
+    url: str,
+    validators: dict,
+    timeout: int = 30,
+    session: Any = None,
+    limiter: Any = None,
+    max_bytes: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> tuple:
+    """
+    Pobiera stronę żądaniem warunkowym (If-None-Match / If-Modified-Since).
+
+    Args:
+        url: URL strony do pobrania
+        validators: Walidatory z poprzedniej wizyty ({"etag", "last_modified"});
+            słownik jest aktualizowany wartościami z odpowiedzi
+        timeout: Timeout w sekundach
+        session: Opcjonalna współdzielona sesja HTTP
+        limiter: Opcjonalny adaptacyjny limit połączeń do hosta
+        max_bytes: Opcjonalny limit pobieranej treści w bajtach
+        deadline: Opcjonalny termin (time.perf_counter) końca pobierania
+
+    Returns:
+        tuple: (html, nie_zmieniona) - (None, True) dla odpowiedzi 304,
+            (None, False) w przypadku błędu
+    """
+    import requests
+
+    headers = {
+        request_header: validators[key]
+        for key, request_header in _VALIDATOR_HEADERS.values()
+        if validators.get(key)
+    }
+    try:
+        response, content = _http_get(
+            url, timeout, session, limiter, headers, max_bytes, deadline
+        )
+        if response.status_code == 304:
+            return None, True
+        response.raise_for_status()
+
+        for response_header, (key, _) in _VALIDATOR_HEADERS.items():
+            value = response.headers.get(response_header)
+            if value:
+                validators[key] = value
+            else:
+                validators.pop(key, None)
+        return _response_html(response, content), False
+
+    except requests.exceptions.RequestException as e:
+        print(f"Blad podczas pobierania strony {url}: {e}")
+        return None, False
+    except Exception as e:
+        print(f"Nieoczekiwany blad podczas pobierania strony: {e}")
+        return None, False
+
+
+# Reguły oceny linków do podstron: (waga, wzorzec). Wzorce są dopasowywane
+# do ścieżki URL i tekstu linku sprowadzonych do postaci "slowo-slowo"
+LINK_RULES = (
+    (
+        6.0,
+        re.compile(
+            r"(?:^|-)(?:inwestor|investor|relacje-inwest|ir(?:-|$)|finansowani"
+            r"|funding)"
+        ),
+    ),
+    (
+        5.0,
+        re.compile(
+            r"(?:^|-)(?:o-nas|o-firmie|o-spolce|kim-jestesmy|about|firma(?:-|$)"
+            r"|company|misja|historia)"
+        ),
+    ),
+    (5.0, re.compile(r"(?:^|-)(?:zespol|team|ludzie|zarzad|management|zalozyc)")),
+    (
+        4.0,
+        re.compile(
+            r"(?:^|-)(?:ofert|produkt|product|uslug|service|rozwiazani|solution"
+            r"|cennik|pricing|platform)"
+        ),
+    ),
+    (
+        3.0,
+        re.compile(r"(?:^|-)(?:klient|customer|case-stud|realizacj|portfolio|partner)"),
+    ),
+    (2.0, re.compile(r"(?:^|-)(?:kariera|career|jobs|praca(?:-|$)|rekrutacj)")),
+    (1.5, re.compile(r"(?:^|-)(?:blog|news|aktualnosc|prasa|press|media)")),
+)
+
+# Strony bez wartości dla inwestora - nie są pobierane. Rdzenie w pierwszej
+# grupie pasują też do dłuższych form słowa (cookies, logowanie, rejestracja).
+LINK_EXCLUDE = re.compile(
+    r"(?:^|-)(?:(?:prywatnosc|cookie|regulamin|logowani|rejestracj|kategori)"
+    r"[a-z0-9]*|polityka|privacy|rodo|gdpr|terms|login|zaloguj|sign-in|signin"
+    r"|register|koszyk|cart|checkout|konto|account|wp-admin|wp-login|feed|rss"
+    r"|tag|category|search|szukaj|author|autor)(?:-|$)"
+)
+
+# Kara za każdy kolejny wybrany link z tej samej sekcji strony
+LINK_SECTION_PENALTY = 2.0
+
+_FILE_EXTENSIONS = (".pdf", ".jpg", ".png", ".gif", ".css", ".js", ".zip", ".doc")
+
+
+def _link_key(text: str) -> str:
+    """Sprowadza ścieżkę lub tekst linku do postaci "slowo-slowo" bez ogonków."""
+    text = unquote(text).lower().replace("ł", "l")
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", text).strip("-")
+
+
+def score_subpage_link(
+    url: str,
+    anchor_text: str = "",
+    position: int = 0,
+    total: int = 1,
+    in_footer: bool = False,
+) -> Optional[float]:
+    """
+    Ocenia przydatność linku do podstrony dla analizy inwestycyjnej.
+
+    Punkty daje najlepiej pasujące słowo kluczowe w ścieżce URL lub tekście
+    linku (LINK_RULES, np. o-nas, zespol, inwestorzy, oferta, kariera,
+    blog). Odejmowane są
+    punkty za głębokość ścieżki, parametry zapytania i położenie w stopce.
+    Wcześniejsze położenie na stronie rozstrzyga remisy.
+
+    Args:
+        url: Bezwzględny URL linku
+        anchor_text: Tekst linku
+        position: Pozycja linku na stronie (od 0)
+        total: Liczba linków kandydujących na stronie
+        in_footer: Czy link znajduje się w stopce strony
+
+    Returns:
+        float: Ocena linku lub None, gdy strona nie ma wartości dla inwestora
+            (polityka prywatności, logowanie, koszyk itp.)
+    """
+    return _score_link(urlparse(url), anchor_text, position, total, in_footer)
+
+
+def _score_link(
+    parsed: Any, anchor_text: str, position: int, total: int, in_footer: bool
+) -> Optional[float]:
+    """score_subpage_link dla już sparsowanego URL (bez ponownego urlparse)."""
+    path_key = _link_key(parsed.path)
+    anchor_key = _link_key(anchor_text)
+    if LINK_EXCLUDE.search(path_key) or LINK_EXCLUDE.search(anchor_key):
+        return None
+
+    # Liczy się najlepiej pasująca reguła (tekst linku waży mniej niż ścieżka)
+    score = 0.0
+    for weight, pattern in LINK_RULES:
+        if pattern.search(path_key):
+            score = max(score, weight)
+        elif anchor_key and pattern.search(anchor_key):
+            score = max(score, weight * 0.8)
+
+    depth = len([segment for segment in parsed.path.split("/") if segment])
+    score -= 0.75 * max(0, depth - 1)
+    if parsed.query:
+        score -= 1.0
+    if in_footer:
+        score -= 1.0
+    return score + 0.5 * (1 - position / max(total, 1))
+
+
+def find_subpage_links(
+    html_content: Union[str, bytes], base_url: str, max_links: int = 5
+) -> list:
     """
-    Znajduje linki do podstron w obrębie tej samej domeny.
+    Znajduje linki do podstron w obrębie tej samej domeny, uporządkowane
+    według przydatności dla inwestora (score_subpage_link).
 
     Args:
-        html_content: Zawartość HTML strony
+        html_content: Zawartość HTML strony (napis lub surowe bajty)
         base_url: Bazowy URL strony
         max_links: Maksymalna liczba linków do pobrania (domyślnie 5)
 
     Returns:
-        list: Lista URL podstron do analizy
+        list: Lista URL podstron do analizy (najlepiej ocenione najpierw)
     """
     if not html_content or not base_url:
         return []
 
     try:
-        soup = BeautifulSoup(html_content, "html.parser")
-        base_domain = urlparse(base_url).netloc
-        subpage_links = []
+        soup = _make_soup(html_content)
+        parsed_base = urlparse(base_url)
+        base_domain = parsed_base.netloc
+        base_path = parsed_base.path
+
+        footer_links = {
+            id(link) for footer in soup.find_all("footer") for link in footer("a")
+        }
 
-        # Znajdź wszystkie linki
+        # Zbierz kandydatów: URL -> (URL sparsowany, tekst linku, pozycja,
+        # czy w stopce)
+        candidates: dict[str, tuple] = {}
         for link in soup.find_all("a", href=True):
             href = link.get("href")
             if not href:
@@ -555,62 +6731,78 @@ def find_subpage_links(html_content: str, base_url: str, max_links: int = 5) ->
             # Sprawdź czy link jest w obrębie tej samej domeny
             if (
                 parsed_url.netloc == base_domain
-                and parsed_url.path != urlparse(base_url).path
+                and parsed_url.path != base_path
                 and not parsed_url.fragment  # Ignoruj linki z # (kotwice)
-                and not any(
-                    ext in parsed_url.path.lower()
-                    for ext in [
-                        ".pdf",
-                        ".jpg",
-                        ".png",
-                        ".gif",
-                        ".css",
-                        ".js",
-                        ".zip",
-                        ".doc",
-                        ".docx",
-                    ]
-                )
+                and not any(ext in parsed_url.path.lower() for ext in _FILE_EXTENSIONS)
+                and absolute_url not in candidates
             ):
+                candidates[absolute_url] = (
+                    parsed_url,
+                    link.get_text(" ", strip=True),
+                    len(candidates),
+                    id(link) in footer_links,
+                )
 
-                subpage_links.append(absolute_url)
-
-                # Ogranicz liczbę linków
-                if len(subpage_links) >= max_links:
-                    break
-
-        # Usuń duplikaty zachowując kolejność
-        seen = set()
-        unique_links = []
-        for link in subpage_links:
-            if link not in seen:
-                seen.add(link)
-                unique_links.append(link)
-
-        return unique_links[:max_links]
+        scored = []
+        for url, (parsed_url, anchor, position, in_footer) in candidates.items():
+            score = _score_link(
+                parsed_url, anchor, position, len(candidates), in_footer
+            )
+            if score is not None:
+                section = parsed_url.path.strip("/").split("/")[0]
+                scored.append((score, position, url, section))
+
+        # Wybieraj zachłannie najlepsze linki; każdy kolejny link z tej samej
+        # sekcji (pierwszy segment ścieżki) traci punkty, by budżet pobrań
+        # objął różne części strony
+        selected: list = []
+        picked_sections: dict[str, int] = {}
+        while scored and len(selected) < max_links:
+            best = max(
+                scored,
+                key=lambda c: (
+                    c[0] - LINK_SECTION_PENALTY * picked_sections.get(c[3], 0),
+                    -c[1],
+                ),
+            )
+            scored.remove(best)
+            selected.append(best[2])
+            picked_sections[best[3]] = picked_sections.get(best[3], 0) + 1
+        return selected
 
     except Exception as e:
         print(f"Blad podczas wyszukiwania linkow do podstron: {e}")
         return []
 
 
-def fetch_subpage_content(url: str, timeout: int = 30) -> Optional[str]:
+def fetch_subpage_content(
+    url: str,
+    timeout: int = 30,
+    session: Any = None,
+    limiter: Any = None,
+    max_bytes: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> Optional[str]:
     """
     Pobiera zawartość z podstrony.
 
     Args:
         url: URL podstrony do pobrania
         timeout: Timeout w sekundach
+        session: Opcjonalna współdzielona sesja HTTP
+        limiter: Opcjonalny adaptacyjny limit połączeń do hosta
+        max_bytes: Opcjonalny limit pobieranej treści w bajtach
+        deadline: Opcjonalny termin (time.perf_counter) końca pobierania
 
     Returns:
         str: Zawartość HTML podstrony lub None w przypadku błędu
     """
-    try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+    import requests
 
-        response = requests.get(url, headers=headers, timeout=timeout)
+    try:
+        response, content = _http_get(
+            url, timeout, session, limiter, max_bytes=max_bytes, deadline=deadline
+        )
         response.raise_for_status()
 
         # Sprawdź czy odpowiedź to HTML
@@ -618,7 +6810,7 @@ def fetch_subpage_content(url: str, timeout: int = 30) -> Optional[str]:
         if "text/html" not in content_type:
             return None
 
-        return response.text
+        return _response_html(response, content)
 
     except requests.exceptions.RequestException as e:
         print(f"Blad podczas pobierania podstrony {url}: {e}")
@@ -635,13 +6827,18 @@ def combine_content_from_pages(
     Łączy treść z głównej strony i podstron w sposób zorganizowany.
 
     Args:
-        main_content: Treść z głównej strony
-        subpages_content: Lista treści z podstron
+        main_content: Treść z głównej strony (napis lub PageRecord)
+        subpages_content: Lista treści z podstron (napisy lub PageRecord)
         base_url: Bazowy URL
 
     Returns:
         str: Połączona treść z wszystkich stron
     """
+    # len() rekordu PageRecord zwraca policzoną wcześniej liczbę znaków
+    main_chars = len(main_content)
+    main_content = _page_text(main_content)
+    subpage_chars = [len(c) for c in subpages_content if c]
+
     combined_content = f"""=== ANALIZA STRONY INTERNETOWEJ ===
 URL GŁÓWNEJ STRONY: {base_url}
 DATA ANALIZY: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
@@ -657,7 +6854,8 @@ DATA ANALIZY: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 
         for i, subpage_content in enumerate(subpages_content, 1):
             if subpage_content:
-                combined_content += f"--- PODSTRONA {i} ---\n{subpage_content}\n\n"
+                subpage_text = _page_text(subpage_content)
+                combined_content += f"--- PODSTRONA {i} ---\n{subpage_text}\n\n"
             else:
                 combined_content += (
                     f"--- PODSTRONA {i} ---\n[Brak dostępnej treści]\n\n"
@@ -665,21 +6863,21 @@ DATA ANALIZY: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 
     # Dodaj podsumowanie struktury
     combined_content += f"""=== PODSUMOWANIE STRUKTURY ===
-- Główna strona: {len(main_content)} znaków
-- Liczba przeanalizowanych podstron: {len([c for c in subpages_content if c])}
-- Łączna długość treści: {len(main_content) + sum(len(c) for c in subpages_content if c)} znaków
+- Główna strona: {main_chars} znaków
+- Liczba przeanalizowanych podstron: {len(subpage_chars)}
+- Łączna długość treści: {main_chars + sum(subpage_chars)} znaków
 
 """
 
     return combined_content
 
 
-def clean_and_extract_text(html_content: str, base_url: str = "") -> str:
+def clean_and_extract_text(html_content: Union[str, bytes], base_url: str = "") -> str:
     """
     Czyści HTML i ekstraktuje czysty tekst.
 
     Args:
-        html_content: Zawartość HTML do oczyszczenia
+        html_content: Zawartość HTML do oczyszczenia (napis lub surowe bajty)
         base_url: Bazowy URL do filtrowania linków zewnętrznych
 
     Returns:
@@ -689,7 +6887,7 @@ def clean_and_extract_text(html_content: str, base_url: str = "") -> str:
         return ""
 
     try:
-        soup = BeautifulSoup(html_content, "html.parser")
+        soup = _make_soup(html_content)
 
         # Usuń niepotrzebne elementy
         for element in soup(
@@ -779,5 +6977,36 @@ def is_valid_url(url: str) -> bool:
     return bool(url_pattern.match(url))
 
 
+# Domyślne porty schematów - pomijane w znormalizowanym URL
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Sprowadza URL do postaci kanonicznej, by warianty tego samego adresu
+    (wielkość liter hosta, domyślny port, kotwica, pusta ścieżka) dawały
+    ten sam klucz.
+
+    Args:
+        url: URL do znormalizowania
+
+    Returns:
+        str: Znormalizowany URL
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    netloc = (parsed.hostname or "").rstrip(".")
+    if ":" in netloc:
+        netloc = f"[{netloc}]"
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    if port and port != _DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    query = f"?{parsed.query}" if parsed.query else ""
+    return f"{scheme}://{netloc}{parsed.path or '/'}{query}"
+
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -35,6 +35,10 @@ setup(
         "python-dotenv>=1.0.0",
         "coverage>=7.0.0",
     ],
+    extras_require={
+        # Zwektoryzowany indeks fragmentów (--top-passages)
+        "fast": ["numpy>=1.22"],
+    },
     entry_points={
         "console_scripts": [
             "inwestor-pro=inwestor_pro:main",
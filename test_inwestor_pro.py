@@ -6,31 +6,207 @@ Autor: Inwestor Pro Team
 Wersja: 1.0.0
 """
 
+import importlib.util
+import json
 import os
+import shutil
+import subprocess
 import sys
+import tempfile
+import threading
+import time
+import tracemalloc
 import unittest
+import urllib.error
+import urllib.request
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from io import StringIO
+from types import SimpleNamespace
 from unittest.mock import patch
+from urllib.parse import urlparse
 
 # Dodaj ścieżkę do modułu głównego
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from inwestor_pro import (  # noqa: E402
+    BROCHURE_SECTIONS,
+    MAIN_PAGE_SECTIONS,
+    METRICS,
+    REPLAY_API_KEY,
+    SECTION_QUERIES,
+    ArtifactStore,
+    BrochureService,
+    Cassette,
+    CheckpointJournal,
+    ContentBudget,
+    CorpusReader,
+    CorpusWriter,
+    HostConcurrencyLimiter,
+    MetricsRegistry,
+    MetricsTextfileWriter,
+    PageRecord,
+    PassageIndex,
+    RunOptions,
+    SingleFlight,
+    SiteJob,
+    SiteResult,
+    StageProfiler,
+    TraceExporter,
+    WatchSchedule,
+    WorkQueue,
+    _deadline_timeout,
+    _numpy_module,
+    affected_sections,
+    aggregate_llm_usage,
+    aggregate_profiles,
+    analyze_corpus,
+    analyze_subpages_content,
+    attribute_sections,
+    chunk_passages,
     clean_and_extract_text,
     combine_content_from_pages,
+    content_change,
+    content_fingerprint,
+    create_http_session,
+    create_service_server,
+    default_output_filename,
+    enhance_brochure_formatting,
+    estimate_llm_cost,
+    extract_facts,
     fetch_html,
+    fetch_html_conditional,
     fetch_subpage_content,
     find_subpage_links,
     generate_brochure,
+    get_output_path,
     get_system_prompt,
     is_valid_url,
+    join_brochure_sections,
     load_api_key,
+    load_cli_api_key,
     main,
+    new_site_job,
+    normalize_url,
+    process_site,
+    read_urls_file,
+    run_batch,
+    run_pipeline,
+    run_queue_worker,
+    run_watch,
     save_markdown_file,
+    score_subpage_link,
+    sniff_charset,
+    split_brochure_sections,
+    stage_clean,
+    stage_fetch,
+    truncate_text,
+    truncate_utf8,
+    write_batch_profile,
 )
 
 
+def start_fake_site(pages, headers=None):
+    """
+    Uruchamia lokalny serwer HTTP udający stronę firmy.
+
+    Args:
+        pages: Słownik ścieżka -> treść HTML
+        headers: Dodatkowe nagłówki odpowiedzi
+
+    Returns:
+        tuple: (serwer, bazowy URL)
+    """
+
+    class FakeSiteHandler(BaseHTTPRequestHandler):
+        def do_GET(self):  # noqa: N802
+            body = pages.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            data = body.encode("utf-8") if isinstance(body, str) else body
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSiteHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def start_capacity_site(capacity, delay=0.02):
+    """
+    Uruchamia lokalny serwer HTTP o ograniczonej przepustowości.
+
+    Serwer obsługuje najwyżej `capacity` równoczesnych żądań; kolejne
+    dostają odpowiedź 503 (jak przeciążony hosting współdzielony).
+
+    Args:
+        capacity: Liczba równocześnie obsługiwanych żądań
+        delay: Czas obsługi jednego żądania w sekundach
+
+    Returns:
+        tuple: (serwer, bazowy URL, statystyki {"ok": n, "rejected": n,
+            "max_in_flight": n})
+    """
+    lock = threading.Lock()
+    stats = {"ok": 0, "rejected": 0, "in_flight": 0, "max_in_flight": 0}
+
+    class CapacityHandler(BaseHTTPRequestHandler):
+        def do_GET(self):  # noqa: N802
+            with lock:
+                accepted = stats["in_flight"] < capacity
+                stats["in_flight" if accepted else "rejected"] += 1
+                stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+            if not accepted:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            time.sleep(delay)
+            with lock:
+                stats["in_flight"] -= 1
+                stats["ok"] += 1
+            data = b"<html><body><p>Tresc podstrony.</p></body></html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CapacityHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", stats
+
+
+class FakeOpenAIClient:
+    """Klient udający openai.OpenAI - zwraca stałą broszurę."""
+
+    def __init__(self, content="## Executive Summary\n\nTest", usage=None):
+        self.calls = []
+        self.content = content
+        self.usage = usage
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls.append(kwargs)
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=message)], usage=self.usage
+        )
+
+
 class TestURLValidation(unittest.TestCase):
     """Testy dla funkcji walidacji URL."""
 
@@ -562,6 +738,2631 @@ class TestSubpageFunctionality(unittest.TestCase):
         self.assertNotIn("=== TREŚĆ PODSTRONY", result)
 
 
+class TestBatchMode(unittest.TestCase):
+    """Testy dla trybu wsadowego (--urls-file)."""
+
+    def setUp(self):
+        """Przygotowanie katalogu tymczasowego."""
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Usunięcie katalogu tymczasowego."""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_read_urls_file_plain_text(self):
+        """Test wczytywania listy URL z pliku tekstowego."""
+        path = self._write(
+            "urls.txt",
+            "# komentarz\nhttps://a.pl\n\nhttps://b.pl\nhttps://a.pl\n",
+        )
+        self.assertEqual(read_urls_file(path), ["https://a.pl", "https://b.pl"])
+
+    def test_read_urls_file_csv_with_header(self):
+        """Test wczytywania kolumny url z pliku CSV."""
+        path = self._write("urls.csv", "nazwa,url\nA,https://a.pl\nB,https://b.pl\n")
+        self.assertEqual(read_urls_file(path), ["https://a.pl", "https://b.pl"])
+
+    def test_read_urls_file_jsonl(self):
+        """Test wczytywania listy URL z pliku JSONL."""
+        path = self._write("urls.jsonl", '{"url": "https://a.pl"}\n\n"https://b.pl"\n')
+        self.assertEqual(read_urls_file(path), ["https://a.pl", "https://b.pl"])
+
+    def test_default_output_filename_with_path(self):
+        """Test nazw plików rozróżniających strony z tej samej domeny."""
+        self.assertEqual(
+            default_output_filename("https://example.com/o-nas"),
+            "broszura_example_com",
+        )
+        self.assertEqual(
+            default_output_filename("https://example.com/o-nas", include_path=True),
+            "broszura_example_com_o_nas",
+        )
+
+    def test_checkpoint_journal_last_entry_wins(self):
+        """Test dziennika - URL z ostatnim wpisem 'ok' jest ukończony."""
+        journal = CheckpointJournal(os.path.join(self.tmp_dir, "cp.jsonl"))
+        journal.record(SiteResult(url="https://a.pl", ok=False, error="x"))
+        journal.record(SiteResult(url="https://b.pl", ok=True))
+        journal.record(SiteResult(url="https://a.pl", ok=True))
+        journal.record(SiteResult(url="https://b.pl", ok=False, error="x"))
+        with open(journal.path, "a", encoding="utf-8") as f:
+            f.write('{"url": "https://c.pl", "sta')  # ucięta linia
+
+        self.assertEqual(journal.completed_urls(), {"https://a.pl"})
+
+    @patch("inwestor_pro.process_site")
+    def test_run_batch_resumes_from_checkpoint(self, mock_process):
+        """Test wznawiania - ukończone URL nie są przetwarzane ponownie."""
+        checkpoint = os.path.join(self.tmp_dir, "cp.jsonl")
+        CheckpointJournal(checkpoint).record(SiteResult(url="https://a.pl", ok=True))
+        mock_process.side_effect = lambda url, *args: SiteResult(
+            url=url, ok=url != "https://c.pl", error="blad"
+        )
+        urls = ["https://a.pl", "https://b.pl", "https://c.pl"]
+
+        with patch("sys.stdout", new_callable=StringIO):
+            results = run_batch(urls, RunOptions(api_key="k"), 2, checkpoint)
+
+        processed = sorted(call.args[0] for call in mock_process.call_args_list)
+        self.assertEqual(processed, ["https://b.pl", "https://c.pl"])
+        self.assertEqual([r.url for r in results], urls)
+        self.assertTrue(results[0].skipped)
+        self.assertTrue(results[1].ok)
+        self.assertFalse(results[2].ok)
+        self.assertEqual(
+            CheckpointJournal(checkpoint).completed_urls(),
+            {"https://a.pl", "https://b.pl"},
+        )
+
+    @patch("inwestor_pro.save_markdown_file", return_value=True)
+    @patch("inwestor_pro.generate_brochure", return_value="# Broszura")
+    @patch("inwestor_pro.fetch_html")
+    def test_process_site_uses_shared_clients(self, mock_fetch, mock_gen, _save):
+        """Test przekazywania współdzielonej sesji i klienta OpenAI."""
+        mock_fetch.return_value = "<html><body><p>Tresc strony</p></body></html>"
+        session, client = object(), object()
+        options = RunOptions(api_key="k", quiet=True, session=session, client=client)
+
+        result = process_site("https://example.com", options)
+
+        self.assertTrue(result.ok)
+        self.assertIs(mock_fetch.call_args.kwargs["session"], session)
+        self.assertIs(mock_gen.call_args.kwargs["client"], client)
+
+    @patch("inwestor_pro.fetch_html", return_value=None)
+    def test_process_site_reports_error(self, _fetch):
+        """Test zwracania błędu zamiast przerywania przebiegu."""
+        with patch("sys.stdout", new_callable=StringIO):
+            result = process_site("https://example.com", RunOptions(api_key="k"))
+        self.assertFalse(result.ok)
+        self.assertIn("pobrac", result.error)
+
+    @patch("inwestor_pro.load_api_key", return_value="k")
+    @patch("inwestor_pro.run_batch")
+    def test_cli_urls_file(self, mock_run_batch, _key):
+        """Test uruchomienia trybu wsadowego z CLI."""
+        path = self._write("urls.txt", "https://a.pl\n")
+        mock_run_batch.return_value = [SiteResult(url="https://a.pl", ok=True)]
+
+        with patch("sys.argv", ["inwestor_pro.py", "--urls-file", path]):
+            with patch("sys.stdout", new_callable=StringIO) as output:
+                self.assertEqual(main(), 0)
+
+        urls, options, concurrency, checkpoint, stages, _ = (
+            mock_run_batch.call_args.args
+        )
+        self.assertEqual(urls, ["https://a.pl"])
+        self.assertEqual(concurrency, 4)
+        self.assertEqual(checkpoint, f"{path}.checkpoint.jsonl")
+        self.assertIsNone(stages)
+        self.assertIsNotNone(options.session)
+        self.assertIn("PODSUMOWANIE", output.getvalue())
+
+
+class TestPipeline(unittest.TestCase):
+    """Testy dla potokowego przetwarzania wsadowego."""
+
+    HTML = "<html><body><p>Tresc strony {url}</p></body></html>"
+
+    def setUp(self):
+        """Podmiana funkcji sieciowych, LLM i zapisu."""
+        patchers = [
+            patch("inwestor_pro.fetch_html", side_effect=self._fetch),
+            patch("inwestor_pro.save_markdown_file", return_value=True),
+            patch("sys.stdout", new_callable=StringIO),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.fetched = []
+
+    def _fetch(self, url, **kwargs):
+        self.fetched.append(url)
+        if "blad" in url:
+            return None
+        return self.HTML.format(url=url)
+
+    def test_pipeline_processes_all_urls(self):
+        """Test przetworzenia wszystkich URL i raportowania błędów."""
+        urls = [f"https://site{i}.pl" for i in range(5)] + ["https://blad.pl"]
+        finished = []
+
+        with patch("inwestor_pro.generate_brochure", return_value="# B"):
+            results = run_pipeline(
+                urls,
+                RunOptions(api_key="k", quiet=True),
+                {"fetch": 2, "clean": 1, "llm": 2},
+                queue_size=1,
+                on_result=finished.append,
+            )
+
+        self.assertEqual(sorted(r.url for r in results), sorted(urls))
+        self.assertEqual(len(finished), len(urls))
+        failed = [r for r in results if not r.ok]
+        self.assertEqual([r.url for r in failed], ["https://blad.pl"])
+        self.assertIn("pobrac", failed[0].error)
+
+    def test_pipeline_overlaps_fetch_and_llm(self):
+        """Test - strona N+1 jest pobierana, gdy strona N czeka na model."""
+        second_fetched = threading.Event()
+
+        def slow_generate(text, api_key, client=None, usage=None):
+            # Model "odpowiada" dopiero, gdy kolejna strona została pobrana
+            if "site0" in text:
+                self.assertTrue(second_fetched.wait(timeout=5))
+            return "# B"
+
+        def fetch(url, **kwargs):
+            if "site1" in url:
+                second_fetched.set()
+            return self.HTML.format(url=url)
+
+        with patch("inwestor_pro.fetch_html", side_effect=fetch):
+            with patch("inwestor_pro.generate_brochure", side_effect=slow_generate):
+                results = run_pipeline(
+                    ["https://site0.pl", "https://site1.pl"],
+                    RunOptions(api_key="k", quiet=True),
+                    {"fetch": 1, "clean": 1, "llm": 1},
+                )
+
+        self.assertTrue(all(r.ok for r in results))
+
+    def test_pipeline_stage_exception_is_isolated(self):
+        """Test - wyjątek w etapie kończy tylko jedno zadanie."""
+
+        def flaky_generate(text, api_key, client=None, usage=None):
+            if "site1" in text:
+                raise RuntimeError("awaria")
+            return "# B"
+
+        with patch("inwestor_pro.generate_brochure", side_effect=flaky_generate):
+            results = run_pipeline(
+                ["https://site0.pl", "https://site1.pl", "https://site2.pl"],
+                RunOptions(api_key="k", quiet=True),
+            )
+
+        status = {r.url: r.ok for r in results}
+        self.assertEqual(
+            status,
+            {
+                "https://site0.pl": True,
+                "https://site1.pl": False,
+                "https://site2.pl": True,
+            },
+        )
+
+    @patch("inwestor_pro.load_api_key", return_value="k")
+    @patch("inwestor_pro.run_batch", return_value=[])
+    def test_cli_pipeline_stage_workers(self, mock_run_batch, _key):
+        """Test konfiguracji liczby wątków na etap z CLI."""
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write("https://a.pl\n")
+        self.addCleanup(os.remove, f.name)
+        argv = [
+            "inwestor_pro.py",
+            "--urls-file",
+            f.name,
+            "--pipeline",
+            "--concurrency",
+            "3",
+            "--llm-workers",
+            "2",
+            "--queue-size",
+            "8",
+        ]
+
+        with patch("sys.argv", argv):
+            main()
+
+        stage_workers, queue_size = mock_run_batch.call_args.args[4:]
+        self.assertEqual(stage_workers, {"fetch": 3, "clean": 1, "llm": 2})
+        self.assertEqual(queue_size, 8)
+
+
+class TestWorkQueue(unittest.TestCase):
+    """Testy dla rozproszonej kolejki zadań w SQLite."""
+
+    def setUp(self):
+        """Utworzenie kolejki w katalogu tymczasowym."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmp_dir, "kolejka.db")
+
+    def tearDown(self):
+        """Usunięcie katalogu tymczasowego."""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_enqueue_skips_duplicates(self):
+        """Test - ponowne dodanie tych samych URL nic nie zmienia."""
+        work_queue = WorkQueue(self.db)
+        self.assertEqual(work_queue.enqueue(["https://a.pl", "https://b.pl"]), 2)
+        self.assertEqual(work_queue.enqueue(["https://a.pl", "https://c.pl"]), 1)
+        self.assertEqual(work_queue.stats()["pending"], 3)
+
+    def test_claim_is_atomic_across_nodes(self):
+        """Test - każdy URL jest przejmowany dokładnie raz."""
+        urls = [f"https://site{i}.pl" for i in range(40)]
+        WorkQueue(self.db).enqueue(urls)
+        claimed = []
+        lock = threading.Lock()
+
+        def node(n):
+            # Każdy "węzeł" ma własne połączenie do wspólnego pliku
+            work_queue = WorkQueue(self.db)
+            while True:
+                url = work_queue.claim(f"node-{n}")
+                if url is None:
+                    return
+                with lock:
+                    claimed.append(url)
+
+        threads = [threading.Thread(target=node, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(claimed), sorted(urls))
+        self.assertEqual(WorkQueue(self.db).stats()["leased"], 40)
+
+    def test_expired_lease_is_requeued(self):
+        """Test - zadanie martwego węzła wraca do kolejki."""
+        work_queue = WorkQueue(self.db, lease_seconds=0.05)
+        work_queue.enqueue(["https://a.pl"])
+        self.assertEqual(work_queue.claim("martwy"), "https://a.pl")
+        self.assertIsNone(work_queue.claim("zywy"))
+
+        time.sleep(0.1)
+        self.assertEqual(work_queue.claim("zywy"), "https://a.pl")
+        # Spóźniony wynik martwego węzła jest odrzucany
+        result = SiteResult(url="https://a.pl", ok=True)
+        self.assertFalse(work_queue.complete("https://a.pl", "martwy", result))
+        self.assertTrue(work_queue.complete("https://a.pl", "zywy", result))
+        self.assertEqual(work_queue.stats()["done"], 1)
+
+    def test_heartbeat_extends_lease(self):
+        """Test - heartbeat utrzymuje dzierżawę."""
+        work_queue = WorkQueue(self.db, lease_seconds=0.1)
+        work_queue.enqueue(["https://a.pl"])
+        work_queue.claim("wezel")
+        for _ in range(3):
+            time.sleep(0.05)
+            self.assertTrue(work_queue.heartbeat("https://a.pl", "wezel"))
+        self.assertEqual(work_queue.requeue_expired(), 0)
+        self.assertFalse(work_queue.heartbeat("https://a.pl", "inny"))
+
+    def test_failed_job_retried_until_max_attempts(self):
+        """Test - nieudane zadanie jest ponawiane do limitu prób."""
+        work_queue = WorkQueue(self.db, max_attempts=2)
+        work_queue.enqueue(["https://a.pl"])
+        failure = SiteResult(url="https://a.pl", ok=False, error="blad")
+
+        work_queue.complete(work_queue.claim("w"), "w", failure)
+        self.assertEqual(work_queue.stats()["pending"], 1)
+        work_queue.complete(work_queue.claim("w"), "w", failure)
+        self.assertEqual(work_queue.stats()["failed"], 1)
+        self.assertIsNone(work_queue.claim("w"))
+
+    @patch("inwestor_pro.process_site")
+    def test_run_queue_worker_drains_queue(self, mock_process):
+        """Test - węzeł przetwarza wszystkie zadania i kończy pracę."""
+        urls = [f"https://site{i}.pl" for i in range(6)]
+        work_queue = WorkQueue(self.db)
+        work_queue.enqueue(urls)
+        mock_process.side_effect = lambda url, *args: SiteResult(
+            url=url, ok=True, output_path=f"{url}.md"
+        )
+
+        with patch("sys.stdout", new_callable=StringIO):
+            results = run_queue_worker(
+                work_queue, RunOptions(api_key="k"), 3, poll_interval=0.01
+            )
+
+        self.assertEqual(sorted(r.url for r in results), urls)
+        self.assertEqual(work_queue.stats()["done"], 6)
+
+    def test_cli_enqueue(self):
+        """Test dodawania listy URL do kolejki z CLI."""
+        urls_file = os.path.join(self.tmp_dir, "urls.txt")
+        with open(urls_file, "w", encoding="utf-8") as f:
+            f.write("https://a.pl\nhttps://b.pl\n")
+        argv = ["inwestor_pro.py", "--urls-file", urls_file, "--queue-db", self.db]
+
+        with patch("sys.argv", argv), patch("sys.stdout", new_callable=StringIO):
+            self.assertEqual(main(), 0)
+
+        self.assertEqual(WorkQueue(self.db).stats()["pending"], 2)
+
+
+class TestServiceMode(unittest.TestCase):
+    """Testy dla trybu serwisu HTTP z kolejką zadań."""
+
+    def setUp(self):
+        """Uruchomienie fałszywej strony i serwisu na lokalnych portach."""
+        self.original_cwd = os.getcwd()
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+
+        self.site, self.site_url = start_fake_site(
+            {
+                "/": "<html><body><h1>Firma</h1><p>Opis firmy</p>"
+                "<a href='/o-nas'>O nas</a></body></html>",
+                "/o-nas": "<html><body><p>Zespol ekspertow</p></body></html>",
+            }
+        )
+        self.client = FakeOpenAIClient()
+        options = RunOptions(api_key="k", quiet=True, client=self.client)
+        self.service = BrochureService(options, workers=2)
+        self.service.start()
+        self.server = create_service_server(self.service, "127.0.0.1", 0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        """Zatrzymanie serwerów i usunięcie plików."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.service.stop()
+        self.site.shutdown()
+        self.site.server_close()
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.base + path, data=data, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, response.read().decode("utf-8")
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode("utf-8")
+
+    def _wait_for(self, job_id):
+        for _ in range(100):
+            status, body = self._request("GET", f"/jobs/{job_id}")
+            job = json.loads(body)
+            if job["status"] in ("done", "error"):
+                return job
+            time.sleep(0.05)
+        self.fail("Zadanie nie zakończyło się w czasie")
+
+    def test_submit_status_and_result(self):
+        """Test pełnego cyklu: zgłoszenie, status, pobranie broszury."""
+        status, body = self._request("POST", "/jobs", {"url": self.site_url + "/"})
+        self.assertEqual(status, 202)
+        job_id = json.loads(body)["id"]
+
+        job = self._wait_for(job_id)
+        self.assertEqual(job["status"], "done", job)
+        self.assertTrue(os.path.exists(job["output_path"]))
+
+        status, body = self._request("GET", f"/jobs/{job_id}/result")
+        self.assertEqual(status, 200)
+        self.assertIn("Executive Summary", body)
+        prompt = self.client.calls[0]["messages"][1]["content"]
+        self.assertIn("Zespol ekspertow", prompt)
+
+    def test_invalid_url_rejected(self):
+        """Test odrzucenia nieprawidłowego URL."""
+        status, body = self._request("POST", "/jobs", {"url": "not-a-url"})
+        self.assertEqual(status, 400)
+        self.assertIn("error", json.loads(body))
+
+    def test_unknown_job_and_pending_result(self):
+        """Test nieznanego zadania i wyniku zadania zakończonego błędem."""
+        status, _ = self._request("GET", "/jobs/nieznane")
+        self.assertEqual(status, 404)
+
+        status, body = self._request("POST", "/jobs", {"url": self.site_url + "/brak"})
+        job_id = json.loads(body)["id"]
+        self.assertEqual(self._wait_for(job_id)["status"], "error")
+        status, _ = self._request("GET", f"/jobs/{job_id}/result")
+        self.assertEqual(status, 409)
+
+    def test_output_path_traversal_rejected(self):
+        """Test - output z katalogami nie pozwala pisać poza wyniki/."""
+        escaped = os.path.join(self.tmp_dir, "poza", "evil")
+        for output in (escaped, "../evil", "a/b", "a\\b", "..", ""):
+            with self.subTest(output=output):
+                status, body = self._request(
+                    "POST", "/jobs", {"url": self.site_url + "/", "output": output}
+                )
+                self.assertEqual(status, 400)
+                self.assertIn("error", json.loads(body))
+        self.assertFalse(os.path.exists(os.path.dirname(escaped)))
+
+        status, body = self._request(
+            "POST", "/jobs", {"url": self.site_url + "/", "output": "moja_broszura"}
+        )
+        self.assertEqual(status, 202)
+        job = self._wait_for(json.loads(body)["id"])
+        self.assertEqual(job["output_path"], str(get_output_path("moja_broszura")))
+
+    def test_finished_jobs_are_evicted(self):
+        """Test - serwis pamięta najwyżej max_jobs zadań."""
+        service = BrochureService(RunOptions(api_key="k"), max_jobs=2)
+        first = service.submit("https://a.pl")["id"]
+        second = service.submit("https://b.pl")["id"]
+        service._jobs[first]["status"] = "done"
+
+        third = service.submit("https://c.pl")["id"]
+        self.assertIsNone(service.get_status(first))
+        self.assertIsNotNone(service.get_status(second))
+        self.assertIsNotNone(service.get_status(third))
+
+        # Niezakończone zadania nie są usuwane
+        service.submit("https://d.pl")
+        self.assertIsNotNone(service.get_status(second))
+
+    def test_metrics_content_negotiation(self):
+        """Test - /metrics zwraca OpenMetrics tylko na żądanie klienta."""
+        for accept, content_type, eof in (
+            ("", "text/plain; version=0.0.4", False),
+            (
+                "application/openmetrics-text; version=1.0.0",
+                "application/openmetrics-text",
+                True,
+            ),
+        ):
+            request = urllib.request.Request(
+                self.base + "/metrics", headers={"Accept": accept} if accept else {}
+            )
+            with urllib.request.urlopen(request, timeout=5) as response:
+                self.assertTrue(
+                    response.headers["Content-Type"].startswith(content_type)
+                )
+                body = response.read().decode("utf-8")
+            self.assertEqual(body.endswith("# EOF\n"), eof)
+
+    def test_health(self):
+        """Test endpointu stanu serwisu."""
+        status, body = self._request("GET", "/health")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["workers"], 2)
+
+
+class TestArtifactStore(unittest.TestCase):
+    """Testy dla magazynu artefaktów adresowanych treścią."""
+
+    def setUp(self):
+        """Przygotowanie katalogu tymczasowego."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp_dir, "artefakty")
+
+    def tearDown(self):
+        """Usunięcie katalogu tymczasowego."""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_put_get_roundtrip(self):
+        """Test zapisu i odczytu z kompresją gzip i bez kompresji."""
+        for compression in ("gzip", "none"):
+            with self.subTest(compression=compression):
+                store = ArtifactStore(self.root, compression)
+                digest = store.put("Zażółć gęślą jaźń " * 100)
+                self.assertEqual(store.put("Zażółć gęślą jaźń " * 100), digest)
+                self.assertEqual(store.get_text(digest), "Zażółć gęślą jaźń " * 100)
+        self.assertIsNone(store.get("0" * 64))
+
+    def test_lookup_requires_same_input(self):
+        """Test - wynik etapu jest zwracany tylko dla tego samego wejścia."""
+        store = ArtifactStore(self.root, "gzip")
+        output = store.put("tekst")
+        store.record("https://a.pl", "text", "wejscie-1", output)
+
+        self.assertEqual(store.lookup("https://a.pl", "text", "wejscie-1"), output)
+        self.assertIsNone(store.lookup("https://a.pl", "text", "wejscie-2"))
+        self.assertIsNone(store.lookup("https://b.pl", "text", "wejscie-1"))
+        self.assertIsNone(store.lookup("https://a.pl", "text", "wejscie-1", max_age=-1))
+
+    def test_gc_by_age_and_size(self):
+        """Test usuwania starych obiektów i ograniczania rozmiaru."""
+        store = ArtifactStore(self.root, "none")
+        old = store.put("stary" * 100)
+        new = store.put("nowy" * 100)
+        store.record("https://a.pl", "html", "x", old)
+        old_path = os.path.join(self.root, "objects", old[:2], old)
+        week_ago = time.time() - 7 * 86400
+        os.utime(old_path, (week_ago, week_ago))
+
+        stats = store.gc(max_age_days=1)
+        self.assertEqual(stats["removed"], 1)
+        self.assertIsNone(store.get(old))
+        self.assertIsNotNone(store.get(new))
+        self.assertIsNone(store.lookup("https://a.pl", "html", "x"))
+
+        stats = store.gc(max_bytes=0)
+        self.assertEqual(stats["kept"], 0)
+
+    def test_rerun_skips_unchanged_stages(self):
+        """Test - po błędzie generowania ponowny przebieg nie pobiera stron."""
+        options = RunOptions(
+            api_key="k", quiet=True, artifacts=ArtifactStore(self.root, "gzip")
+        )
+        html = "<html><body><p>Tresc firmy</p></body></html>"
+        stdout_patcher = patch("sys.stdout", new_callable=StringIO)
+        stdout_patcher.start()
+        self.addCleanup(stdout_patcher.stop)
+
+        with patch("inwestor_pro.fetch_html", return_value=html) as mock_fetch:
+            with patch("inwestor_pro.save_markdown_file", return_value=True):
+                with patch("inwestor_pro.generate_brochure", return_value=None):
+                    self.assertFalse(process_site("https://a.pl", options).ok)
+                with patch(
+                    "inwestor_pro.generate_brochure", return_value="# B"
+                ) as mock_generate:
+                    self.assertTrue(process_site("https://a.pl", options).ok)
+                    self.assertTrue(process_site("https://a.pl", options).ok)
+
+        self.assertEqual(mock_fetch.call_count, 1)
+        self.assertEqual(mock_generate.call_count, 1)
+
+    def test_cli_artifact_gc(self):
+        """Test polecenia --artifact-gc."""
+        ArtifactStore(self.root, "none").put("dane")
+        argv = [
+            "inwestor_pro.py",
+            "--artifact-gc",
+            "--artifact-dir",
+            self.root,
+            "--gc-max-size-mb",
+            "0",
+        ]
+        with patch("sys.argv", argv), patch("sys.stdout", new_callable=StringIO):
+            self.assertEqual(main(), 0)
+        self.assertEqual(ArtifactStore(self.root).gc()["kept"], 0)
+
+
+class TestProfiling(unittest.TestCase):
+    """Testy dla pomiarów czasu etapów (--profile)."""
+
+    def setUp(self):
+        """Przejście do katalogu tymczasowego na czas testu."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        """Powrót do poprzedniego katalogu i sprzątanie."""
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_stage_records_time_and_sizes(self):
+        """Test zapisu czasu i rozmiarów danych etapu."""
+        profiler = StageProfiler("https://a.pl")
+        with profiler.stage("clean_and_extract_text") as record:
+            record.io("<p>zażółć</p>", "zażółć")
+
+        report = profiler.report()
+        stage = report["stages"][0]
+        self.assertEqual(stage["stage"], "clean_and_extract_text")
+        self.assertGreaterEqual(stage["wall_s"], 0.0)
+        self.assertEqual(stage["chars_out"], 6)
+        self.assertEqual(stage["bytes_out"], len("zażółć".encode("utf-8")))
+        self.assertEqual(report["totals"]["clean_and_extract_text"]["count"], 1)
+
+    def test_disabled_profiler_records_nothing(self):
+        """Test - wyłączony profiler nie zbiera pomiarów."""
+        profiler = StageProfiler("https://a.pl", enabled=False)
+        with profiler.stage("fetch_html") as record:
+            record.io("a", "b")
+        self.assertEqual(profiler.records, [])
+
+    def test_aggregate_percentiles(self):
+        """Test wyliczania percentyli p50/p95/p99 z wielu stron."""
+        profiles = [
+            {
+                "stages": [
+                    {
+                        "stage": "fetch_html",
+                        "wall_s": float(i),
+                        "cpu_s": 0.0,
+                        "bytes_in": 0,
+                        "bytes_out": 10,
+                    }
+                ]
+            }
+            for i in range(1, 101)
+        ]
+        aggregated = aggregate_profiles(profiles)["fetch_html"]
+        self.assertEqual(aggregated["count"], 100)
+        self.assertEqual(aggregated["wall_s"]["p50"], 50.0)
+        self.assertEqual(aggregated["wall_s"]["p95"], 95.0)
+        self.assertEqual(aggregated["wall_s"]["p99"], 99.0)
+        self.assertEqual(aggregated["bytes_out"], 1000)
+
+    def test_process_site_writes_profile_json(self):
+        """Test zapisu pliku .profile.json obok broszury."""
+        options = RunOptions(api_key="k", quiet=True, profile=True)
+        html = "<html><body><p>Tresc firmy</p></body></html>"
+        stdout_patcher = patch("sys.stdout", new_callable=StringIO)
+        stdout_patcher.start()
+        self.addCleanup(stdout_patcher.stop)
+
+        with patch("inwestor_pro.fetch_html", return_value=html):
+            with patch("inwestor_pro.generate_brochure", return_value="# B"):
+                result = process_site("https://a.pl", options, "broszura")
+
+        self.assertTrue(result.ok)
+        profile_path = os.path.splitext(result.output_path)[0] + ".profile.json"
+        with open(profile_path, encoding="utf-8") as f:
+            profile = json.load(f)
+        stages = {stage["stage"] for stage in profile["stages"]}
+        for name in ("fetch_html", "clean_and_extract_text", "generate_brochure"):
+            self.assertIn(name, stages)
+        self.assertTrue(profile["ok"])
+
+        report = write_batch_profile([result])
+        self.assertEqual(report["sites"], 1)
+        self.assertIn("generate_brochure", report["stages"])
+
+
+class TestUsageAccounting(unittest.TestCase):
+    """Testy dla rozliczania tokenów i kosztu wywołań modelu."""
+
+    USAGE = SimpleNamespace(
+        prompt_tokens=1200,
+        completion_tokens=800,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=200),
+    )
+
+    def setUp(self):
+        """Przejście do katalogu tymczasowego na czas testu."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        """Powrót do poprzedniego katalogu i sprzątanie."""
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_estimate_cost(self):
+        """Test szacowania kosztu z uwzględnieniem tokenów z cache."""
+        # 1000 * 0.15 + 200 * 0.075 + 800 * 0.60 = 645 USD / 1 mln tokenów
+        self.assertAlmostEqual(
+            estimate_llm_cost("gpt-4o-mini", 1200, 800, 200), 0.000645
+        )
+        self.assertIsNone(estimate_llm_cost("nieznany-model", 1, 1))
+
+    def test_generate_brochure_reports_usage(self):
+        """Test uzupełniania rekordu zużycia przez generate_brochure."""
+        usage = {}
+        client = FakeOpenAIClient(usage=self.USAGE)
+        brochure = generate_brochure("x" * 500, "k", client=client, usage=usage)
+
+        self.assertIsNotNone(brochure)
+        self.assertEqual(usage["prompt_tokens"], 1200)
+        self.assertEqual(usage["completion_tokens"], 800)
+        self.assertEqual(usage["cached_tokens"], 200)
+        self.assertEqual(usage["prompt_chars"], 500)
+        self.assertEqual(usage["model"], "gpt-4o-mini")
+        self.assertGreaterEqual(usage["latency_s"], 0.0)
+        self.assertFalse(usage["cached_result"])
+
+    def test_process_site_writes_metadata(self):
+        """Test zapisu metadanych wywołania modelu obok broszury."""
+        options = RunOptions(
+            api_key="k", quiet=True, client=FakeOpenAIClient(usage=self.USAGE)
+        )
+        html = "<html><body><p>Tresc firmy</p></body></html>"
+        stdout_patcher = patch("sys.stdout", new_callable=StringIO)
+        stdout_patcher.start()
+        self.addCleanup(stdout_patcher.stop)
+
+        with patch("inwestor_pro.fetch_html", return_value=html):
+            result = process_site("https://a.pl", options, "broszura")
+
+        self.assertTrue(result.ok)
+        meta_path = os.path.splitext(result.output_path)[0] + ".meta.json"
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        self.assertEqual(meta["llm"]["prompt_tokens"], 1200)
+        self.assertGreater(meta["combined_chars"], 0)
+        self.assertEqual(meta["llm"]["prompt_chars"], meta["combined_chars"])
+
+    def test_aggregate_relates_length_to_latency_and_cost(self):
+        """Test agregacji i dopasowania czasu/kosztu do długości treści."""
+        usages = [
+            {
+                "model": "gpt-4o-mini",
+                "prompt_tokens": chars // 4,
+                "completion_tokens": 100,
+                "cached_tokens": 0,
+                "latency_s": 0.5 + chars / 1000,
+                "prompt_chars": chars,
+                "cost_usd": chars / 1_000_000,
+                "cached_result": False,
+            }
+            for chars in (1000, 2000, 4000)
+        ]
+        usages.append({**usages[0], "cached_result": True, "cost_usd": 0.0})
+
+        report = aggregate_llm_usage(usages)
+        self.assertEqual(report["calls"], 3)
+        self.assertEqual(report["cached_results"], 1)
+        self.assertEqual(report["prompt_tokens"], 1750)
+        self.assertEqual(report["chars_per_prompt_token"], 4.0)
+        self.assertAlmostEqual(report["latency_vs_1k_chars"]["slope"], 1.0)
+        self.assertAlmostEqual(report["latency_vs_1k_chars"]["intercept"], 0.5)
+        self.assertAlmostEqual(report["latency_vs_1k_chars"]["r"], 1.0)
+        self.assertAlmostEqual(report["cost_vs_1k_chars"]["slope"], 0.001)
+
+
+class TestMemoryLimits(unittest.TestCase):
+    """Testy dla profilowania pamięci i twardych limitów rozmiaru."""
+
+    def setUp(self):
+        """Przejście do katalogu tymczasowego na czas testu."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        stdout_patcher = patch("sys.stdout", new_callable=StringIO)
+        stdout_patcher.start()
+        self.addCleanup(stdout_patcher.stop)
+
+    def tearDown(self):
+        """Powrót do poprzedniego katalogu i sprzątanie."""
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_truncate_helpers(self):
+        """Test skracania po bajtach UTF-8 i po granicy słowa."""
+        self.assertEqual(truncate_utf8("żółw", 3), "ż")
+        self.assertEqual(truncate_utf8("abc", 10), "abc")
+        self.assertEqual(truncate_text("ala ma kota", 8), "ala ma")
+        self.assertEqual(truncate_text("alamakota", 4), "alam")
+
+    @unittest.skipUnless(hasattr(tracemalloc, "reset_peak"), "wymaga Python 3.9+")
+    def test_memprofile_records_peak_and_retained(self):
+        """Test pomiaru szczytu i przyrostu pamięci etapu."""
+        self.addCleanup(tracemalloc.stop)
+        profiler = StageProfiler("https://a.pl", enabled=False, memory=True)
+        kept = []
+        with profiler.stage("clean_and_extract_text"):
+            temporary = bytearray(2_000_000)
+            kept.append(bytearray(500_000))
+            del temporary
+
+        stage = profiler.report()["stages"][0]
+        self.assertGreaterEqual(stage["mem_peak_bytes"], 2_000_000)
+        self.assertGreaterEqual(stage["mem_retained_bytes"], 500_000)
+        self.assertLess(stage["mem_retained_bytes"], 2_000_000)
+
+    def test_caps_degrade_instead_of_failing(self):
+        """Test - przekroczenie limitów skraca dane zamiast przerywać pracę."""
+        html = "<html><body>" + "<p>slowo tresc</p>" * 20000 + "</body></html>"
+        prompts = []
+
+        def generate(text, api_key, client=None, usage=None):
+            prompts.append(text)
+            return "# B"
+
+        options = RunOptions(
+            api_key="k",
+            quiet=True,
+            max_html_bytes=50_000,
+            max_text_chars=10_000,
+            max_combined_chars=5_000,
+        )
+        with patch("inwestor_pro.fetch_html", return_value=html):
+            with patch("inwestor_pro.generate_brochure", side_effect=generate):
+                result = process_site("https://a.pl", options, "broszura")
+
+        self.assertTrue(result.ok)
+        self.assertLessEqual(len(prompts[0]), 5_000)
+        caps = [entry["cap"] for entry in result.degraded]
+        self.assertEqual(
+            caps, ["max_html_bytes", "max_text_chars", "max_combined_chars"]
+        )
+
+    def test_html_cap_bounds_download(self):
+        """Test - limit HTML przerywa pobieranie zamiast skracać całą stronę."""
+        page = "<html><body>" + "<p>slowo tresc</p>" * 100_000 + "</body></html>"
+        server, base_url = start_fake_site({"/": page})
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        session = create_http_session()
+        original_get = session.get
+        read = []
+
+        def get(url, **kwargs):
+            response = original_get(url, **kwargs)
+            iter_content = response.iter_content
+
+            def counting_iter(chunk_size=1, decode_unicode=False):
+                for chunk in iter_content(chunk_size, decode_unicode):
+                    read.append(len(chunk))
+                    yield chunk
+
+            response.iter_content = counting_iter
+            return response
+
+        session.get = get
+        html = fetch_html(base_url + "/", session=session, max_bytes=10_000)
+
+        self.assertEqual(len(html), 10_001)
+        self.assertLess(sum(read), 10_000 + 65536 + 1)
+        self.assertLess(sum(read), len(page))
+
+        options = RunOptions(api_key="k", quiet=True, max_html_bytes=10_000)
+        with patch("inwestor_pro.generate_brochure", return_value="# B"):
+            result = process_site(base_url + "/", options, "broszura")
+        self.assertEqual(result.degraded[0]["cap"], "max_html_bytes")
+
+
+class TestTracing(unittest.TestCase):
+    """Testy dla eksportu śladów w formacie OTLP/JSON."""
+
+    def setUp(self):
+        """Przejście do katalogu tymczasowego na czas testu."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        stdout_patcher = patch("sys.stdout", new_callable=StringIO)
+        stdout_patcher.start()
+        self.addCleanup(stdout_patcher.stop)
+
+    def tearDown(self):
+        """Powrót do poprzedniego katalogu i sprzątanie."""
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_site_trace_hierarchy(self):
+        """Test hierarchii site -> subpage -> fetch/clean i atrybutów."""
+        trace_path = os.path.join(self.tmp_dir, "trace.jsonl")
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=50)
+        options = RunOptions(
+            api_key="k",
+            quiet=True,
+            client=FakeOpenAIClient(usage=usage),
+            tracer=TraceExporter(trace_path),
+        )
+        main_html = '<html><body><p>Firma</p><a href="/o-nas">O nas</a></body></html>'
+        sub_html = "<html><body><p>Zespol firmy</p></body></html>"
+
+        with patch("inwestor_pro.fetch_html", return_value=main_html):
+            with patch("inwestor_pro.fetch_subpage_content", return_value=sub_html):
+                result = process_site("https://a.pl", options, "broszura")
+        self.assertTrue(result.ok)
+
+        with open(trace_path, encoding="utf-8") as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 1)
+        resource = json.loads(lines[0])["resourceSpans"][0]
+        spans = resource["scopeSpans"][0]["spans"]
+        by_name = {}
+        for span in spans:
+            by_name.setdefault(span["name"], []).append(span)
+
+        site = by_name["site"][0]
+        subpage = by_name["subpage"][0]
+        self.assertNotIn("parentSpanId", site)
+        self.assertEqual(subpage["parentSpanId"], site["spanId"])
+        self.assertEqual(by_name["fetch_html"][0]["parentSpanId"], site["spanId"])
+        self.assertEqual(
+            by_name["fetch_subpage_content"][0]["parentSpanId"], subpage["spanId"]
+        )
+        clean_parents = {s["parentSpanId"] for s in by_name["clean_and_extract_text"]}
+        self.assertEqual(clean_parents, {site["spanId"], subpage["spanId"]})
+        self.assertEqual(len({span["traceId"] for span in spans}), 1)
+        for span in spans:
+            self.assertGreaterEqual(
+                int(span["endTimeUnixNano"]), int(span["startTimeUnixNano"])
+            )
+
+        llm_attributes = {
+            a["key"]: a["value"] for a in by_name["generate_brochure"][0]["attributes"]
+        }
+        self.assertEqual(llm_attributes["llm.prompt_tokens"], {"intValue": "100"})
+        self.assertEqual(site["status"], {"code": 1})
+
+    def test_failed_fetch_sets_error_status(self):
+        """Test - nieudane pobranie oznacza span i stronę statusem ERROR."""
+        trace_path = os.path.join(self.tmp_dir, "trace.jsonl")
+        options = RunOptions(api_key="k", quiet=True, tracer=TraceExporter(trace_path))
+        with patch("inwestor_pro.fetch_html", return_value=None):
+            self.assertFalse(process_site("https://a.pl", options).ok)
+
+        with open(trace_path, encoding="utf-8") as f:
+            spans = json.loads(f.readline())["resourceSpans"][0]["scopeSpans"][0][
+                "spans"
+            ]
+        statuses = {span["name"]: span["status"]["code"] for span in spans}
+        self.assertEqual(statuses, {"site": 2, "fetch_html": 2})
+
+
+class TestMetrics(unittest.TestCase):
+    """Testy dla metryk i eksportu do pliku tekstowego."""
+
+    def setUp(self):
+        """Przejście do katalogu tymczasowego na czas testu."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        stdout_patcher = patch("sys.stdout", new_callable=StringIO)
+        stdout_patcher.start()
+        self.addCleanup(stdout_patcher.stop)
+
+    def tearDown(self):
+        """Powrót do poprzedniego katalogu i sprzątanie."""
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_render_counters_and_histograms(self):
+        """Test formatu tekstowego liczników i histogramów."""
+        registry = MetricsRegistry()
+        registry.counter("test_errors_total", "Bledy")
+        registry.histogram("test_seconds", "Czas", (0.1, 1.0))
+        registry.inc("test_errors_total", type='a"b')
+        registry.inc("test_errors_total", 2, type='a"b')
+        registry.observe("test_seconds", 0.5)
+        registry.observe("test_seconds", 3.0)
+
+        text = registry.render()
+        self.assertIn("# TYPE test_errors_total counter", text)
+        self.assertIn('test_errors_total{type="a\\"b"} 3', text)
+        self.assertIn('test_seconds_bucket{le="0.1"} 0', text)
+        self.assertIn('test_seconds_bucket{le="1"} 1', text)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 2', text)
+        self.assertIn("test_seconds_sum 3.5", text)
+        self.assertIn("test_seconds_count 2", text)
+        self.assertNotIn("# EOF", text)
+
+        text = registry.render(openmetrics=True)
+        self.assertIn("# TYPE test_errors counter", text)
+        self.assertIn('test_errors_total{type="a\\"b"} 3', text)
+        self.assertTrue(text.endswith("# EOF\n"))
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("prometheus_client"),
+        "prometheus_client nie jest zainstalowany",
+    )
+    def test_render_parses_with_prometheus_client(self):
+        """Test - oba formaty są poprawne dla parserów prometheus_client."""
+        from prometheus_client.openmetrics.parser import (
+            text_string_to_metric_families as parse_openmetrics,
+        )
+        from prometheus_client.parser import text_string_to_metric_families
+
+        registry = MetricsRegistry()
+        registry.counter("test_pages_total", "Strony")
+        registry.gauge("test_limit", "Limit")
+        registry.histogram("test_seconds", "Czas", (0.1, 1.0))
+        registry.inc("test_pages_total", kind="main")
+        registry.set("test_limit", 2.5, host="a.pl")
+        registry.observe("test_seconds", 0.5)
+
+        for text, parse in (
+            (registry.render(openmetrics=True), parse_openmetrics),
+            (registry.render(), text_string_to_metric_families),
+        ):
+            families = {family.name: family for family in parse(text)}
+            self.assertEqual(families["test_pages"].type, "counter")
+            sample = families["test_pages"].samples[0]
+            self.assertEqual(sample.name, "test_pages_total")
+            self.assertEqual(sample.labels, {"kind": "main"})
+            self.assertEqual(sample.value, 1.0)
+            self.assertEqual(families["test_limit"].samples[0].value, 2.5)
+            self.assertEqual(families["test_seconds"].type, "histogram")
+
+    def test_textfile_writer_writes_periodically_and_on_exit(self):
+        """Test okresowego i końcowego zapisu pliku metryk."""
+        registry = MetricsRegistry()
+        registry.counter("test_pages_total", "Strony")
+        path = os.path.join(self.tmp_dir, "metryki", "inwestor.prom")
+
+        with MetricsTextfileWriter(path, interval=0.01, registry=registry):
+            registry.inc("test_pages_total")
+            deadline = time.time() + 5
+            while time.time() < deadline:
+                with open(path, encoding="utf-8") as f:
+                    if "test_pages_total 1" in f.read():
+                        break
+                time.sleep(0.01)
+            registry.inc("test_pages_total")
+
+        with open(path, encoding="utf-8") as f:
+            self.assertIn("test_pages_total 2", f.read())
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["inwestor.prom"])
+
+    def test_site_processing_updates_metrics(self):
+        """Test metryk pobierania, błędów HTTP, tokenów i broszur."""
+        pages = {"/": '<html><body><p>Firma</p><a href="/brak">X</a></body></html>'}
+        server, base_url = start_fake_site(pages)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        counters = (
+            ("inwestor_pages_fetched_total", {"kind": "main"}),
+            ("inwestor_fetch_errors_total", {"type": "http_4xx"}),
+            ("inwestor_brochures_written_total", {}),
+            ("inwestor_llm_tokens_total", {"type": "prompt"}),
+            ("inwestor_parse_seconds", {}),
+        )
+        before = [METRICS.value(name, **labels) for name, labels in counters]
+        bytes_before = METRICS.value("inwestor_fetch_bytes_total")
+
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5)
+        options = RunOptions(
+            api_key="k", quiet=True, client=FakeOpenAIClient(usage=usage)
+        )
+        self.assertTrue(process_site(base_url, options, "broszura").ok)
+
+        deltas = [
+            METRICS.value(name, **labels) - value
+            for (name, labels), value in zip(counters, before)
+        ]
+        self.assertEqual(deltas, [1, 1, 1, 10, 1])
+        self.assertGreater(METRICS.value("inwestor_fetch_bytes_total"), bytes_before)
+
+
+class TestCharsetDetection(unittest.TestCase):
+    """Testy dla szybkiego ustalania kodowania i parsowania bajtów."""
+
+    CP1250_PAGE = (
+        '<html><head><meta charset="windows-1250"></head>'
+        "<body><p>Zażółć gęślą jaźń</p></body></html>"
+    ).encode("cp1250")
+
+    def test_sniff_order(self):
+        """Test kolejności: nagłówek, BOM, <meta charset>, UTF-8."""
+        self.assertEqual(
+            sniff_charset(self.CP1250_PAGE, "text/html; charset=ISO-8859-2"),
+            "iso8859-2",
+        )
+        self.assertEqual(sniff_charset(self.CP1250_PAGE, "text/html"), "cp1250")
+        self.assertEqual(sniff_charset(b"\xef\xbb\xbf" + self.CP1250_PAGE), "utf-8-sig")
+        http_equiv = (
+            b'<meta http-equiv="Content-Type" content="text/html; charset=iso-8859-2">'
+        )
+        self.assertEqual(sniff_charset(http_equiv), "iso8859-2")
+        late_meta = b" " * 5000 + b'<meta charset="windows-1250">'
+        self.assertEqual(sniff_charset(late_meta), "utf-8")
+        self.assertEqual(
+            sniff_charset(b"<p>x</p>", "text/html; charset=nieznane"), "utf-8"
+        )
+
+    def test_fetch_decodes_bytes_without_response_text(self):
+        """Test - fetch_html dekoduje bajty i nie używa response.text."""
+
+        class FakeResponse:
+            headers = {"content-type": "text/html"}
+            content = self.CP1250_PAGE
+            status_code = 200
+
+            def raise_for_status(self):
+                pass
+
+            @property
+            def text(self):
+                raise AssertionError("response.text nie powinno byc uzywane")
+
+        with patch("requests.get", return_value=FakeResponse()):
+            html = fetch_html("https://a.pl")
+        self.assertIn("Zażółć gęślą jaźń", html)
+
+    def test_parsers_accept_bytes(self):
+        """Test - parsery przyjmują surowe bajty bez wcześniejszego dekodowania."""
+        text = clean_and_extract_text(self.CP1250_PAGE, "https://a.pl")
+        self.assertIn("Zażółć gęślą jaźń", text)
+        page = b'<html><body><a href="/o-nas">O nas</a></body></html>'
+        self.assertEqual(
+            find_subpage_links(page, "https://a.pl"), ["https://a.pl/o-nas"]
+        )
+
+
+class TestPageRecord(unittest.TestCase):
+    """Testy dla zwartego modelu strony PageRecord."""
+
+    def setUp(self):
+        """Przejście do katalogu tymczasowego na czas testu."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        stdout_patcher = patch("sys.stdout", new_callable=StringIO)
+        stdout_patcher.start()
+        self.addCleanup(stdout_patcher.stop)
+
+    def tearDown(self):
+        """Powrót do poprzedniego katalogu i sprzątanie."""
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_stats_computed_once(self):
+        """Test statystyk, prawdziwości i leniwego wczytywania tekstu."""
+        page = PageRecord("https://a.pl/o-nas", "<p>Zażółć</p>")
+        self.assertEqual(page.status, "fetched")
+        self.assertEqual(page.byte_size, len("<p>Zażółć</p>".encode("utf-8")))
+        self.assertFalse(page)
+
+        page.set_text("Firma rozwija platforme")
+        self.assertTrue(page)
+        self.assertEqual((len(page), page.word_count), (23, 3))
+        self.assertEqual(page.status, "ok")
+
+        calls = []
+        page.offload(lambda: calls.append(1) or "Firma rozwija platforme")
+        self.assertEqual(page.text, "Firma rozwija platforme")
+        self.assertEqual((len(page), calls), (23, [1]))
+        self.assertEqual(PageRecord("https://a.pl", None).status, "fetch_error")
+
+    def test_analysis_accepts_records(self):
+        """Test - analizy dają ten sam wynik dla napisów i rekordów."""
+        texts = ["Firma rozwija platforme danych", "", "Zespol i inwestycje"]
+        records = []
+        for i, text in enumerate(texts):
+            record = PageRecord(f"https://a.pl/{i}", "<p></p>")
+            record.set_text(text)
+            records.append(record)
+
+        self.assertEqual(
+            analyze_subpages_content(records), analyze_subpages_content(texts)
+        )
+        self.assertEqual(
+            combine_content_from_pages(records[0], records[1:], "https://a.pl"),
+            combine_content_from_pages(texts[0], texts[1:], "https://a.pl"),
+        )
+
+    def test_pipeline_offloads_texts_to_artifacts(self):
+        """Test - przy magazynie artefaktów teksty stron są zwalniane z pamięci."""
+        pages = {
+            "https://a.pl": '<html><body><p>Firma</p><a href="/o-nas">O</a>'
+            "</body></html>",
+            "https://a.pl/o-nas": "<html><body><p>Zespol firmy</p></body></html>",
+        }
+
+        def fetch(url, session=None):
+            return pages.get(url)
+
+        options = RunOptions(
+            api_key="k",
+            quiet=True,
+            artifacts=ArtifactStore(os.path.join(self.tmp_dir, "a"), "gzip"),
+        )
+        job = new_site_job("https://a.pl", options)
+        with patch("inwestor_pro.fetch_html", side_effect=fetch):
+            with patch("inwestor_pro.fetch_subpage_content", side_effect=fetch):
+                self.assertTrue(stage_fetch(job, options))
+                self.assertTrue(stage_clean(job, options))
+
+        self.assertEqual([p.url for p in job.pages()], list(pages))
+        for page in job.pages():
+            self.assertIsNone(page.html)
+            self.assertEqual(page._text, "")
+        self.assertEqual(job.subpages[0].text, "Zespol firmy")
+        self.assertIn("Zespol firmy", job.combined_text)
+
+
+class TestCorpusStore(unittest.TestCase):
+    """Testy dla korpusu tekstów odczytywanego przez mmap."""
+
+    def setUp(self):
+        """Utworzenie katalogu tymczasowego na korpus."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+
+    def test_append_and_read_zero_copy(self):
+        """Test zapisu, deduplikacji treści i odczytu przez memoryview."""
+        writer = CorpusWriter(self.root)
+        writer.append("https://a.pl", "Firma rozwija platforme")
+        writer.append("https://a.pl/o-nas", "Zespół ekspertów", site="https://a.pl")
+        writer.append("https://b.pl", "Firma rozwija platforme")
+        self.assertIsNone(writer.append("https://c.pl", ""))
+
+        with CorpusReader(self.root) as reader:
+            self.assertEqual(len(reader), 3)
+            entry, view = next(reader.iter_pages())
+            self.assertIsInstance(view, memoryview)
+            self.assertEqual(reader.text(entry), "Firma rozwija platforme")
+            urls = [entry["url"] for entry, _ in reader.iter_texts(unique=True)]
+            self.assertEqual(urls, ["https://a.pl", "https://a.pl/o-nas"])
+            self.assertEqual(
+                reader.text(reader.latest()["https://a.pl/o-nas"]), "Zespół ekspertów"
+            )
+            del view
+
+        size = os.path.getsize(os.path.join(self.root, "corpus.dat"))
+        self.assertEqual(size, len("Firma rozwija platformeZespół ekspertów".encode()))
+
+    def test_truncated_index_and_reopen(self):
+        """Test - ucięta linia indeksu jest pomijana, a zapis można wznowić."""
+        CorpusWriter(self.root).append("https://a.pl", "Pierwsza strona")
+        with open(os.path.join(self.root, "corpus.idx"), "a") as f:
+            f.write('{"url": "https://uc')
+
+        writer = CorpusWriter(self.root)
+        writer.append("https://b.pl", "Pierwsza strona")
+        writer.append("https://c.pl", "Druga strona")
+        with CorpusReader(self.root) as reader:
+            texts = [text for _, text in reader.iter_texts()]
+        self.assertEqual(texts, ["Pierwsza strona", "Pierwsza strona", "Druga strona"])
+
+        with CorpusReader(os.path.join(self.root, "brak")) as reader:
+            self.assertEqual(len(reader), 0)
+
+    def test_close_with_live_views(self):
+        """Test - zamknięcie czytnika przy żywych widokach nie zgłasza błędu."""
+        CorpusWriter(self.root).append("https://a.pl", "Pierwsza strona")
+        CorpusWriter(self.root).append("https://b.pl", "Druga strona")
+
+        with CorpusReader(self.root) as reader:
+            for entry, view in reader.iter_pages():
+                kept = bytes(view)
+                break
+        self.assertEqual(kept, "Pierwsza strona".encode("utf-8"))
+        self.assertEqual(view.tobytes(), kept)
+        del view
+
+        reader.close()
+
+    def test_pipeline_writes_corpus_for_offline_analysis(self):
+        """Test - etap czyszczenia dopisuje strony, a analiza działa offline."""
+        pages = {
+            "https://a.pl": "<html><body><p>inwestycja platforma inwestycja</p>"
+            '<a href="/o-nas">O</a></body></html>',
+            "https://a.pl/o-nas": "<html><body><p>zespol inwestycja</p></body></html>",
+        }
+
+        def fetch(url, session=None):
+            return pages.get(url)
+
+        options = RunOptions(api_key="k", quiet=True, corpus=CorpusWriter(self.root))
+        job = new_site_job("https://a.pl", options)
+        with patch("inwestor_pro.fetch_html", side_effect=fetch):
+            with patch("inwestor_pro.fetch_subpage_content", side_effect=fetch):
+                self.assertTrue(stage_fetch(job, options))
+                self.assertTrue(stage_clean(job, options))
+
+        with CorpusReader(self.root) as reader:
+            self.assertEqual([e["url"] for e in reader.entries], list(pages))
+            self.assertEqual({e["site"] for e in reader.entries}, {"https://a.pl"})
+            report = analyze_corpus(reader)
+        self.assertEqual((report["pages"], report["unique_pages"]), (2, 2))
+        self.assertEqual(report["top_phrases"][0], ("inwestycja", 2))
+
+
+class TestFactExtraction(unittest.TestCase):
+    """Testy dla wstępnej ekstrakcji faktów do tabeli dla modelu."""
+
+    TEXT = (
+        "Firma założona w 2015 roku. W 2023 pozyskaliśmy 12 mln zł w rundzie "
+        "seed. Przychody wzrosły o 45% do 1 200 000 PLN, a eksport to €3 mln. "
+        "Zespół 35 specjalistów obsługuje 120+ klientów. NIP: 526-104-08-28, "
+        "NIP 123-456-78-90, KRS 0000123456, kontakt: biuro@firma.pl. "
+        "Katalog: Produkt 1001, cena 20353 PLN."
+    )
+
+    def test_extract_facts(self):
+        """Test rodzajów faktów, walidacji NIP i pomijania fałszywych lat."""
+        facts = extract_facts(self.TEXT)
+        self.assertEqual(
+            facts["money"], ["12 mln zł", "1 200 000 PLN", "€3 mln", "20353 PLN"]
+        )
+        self.assertEqual(facts["percent"], ["45%"])
+        self.assertEqual(facts["funding"], ["pozyskaliśmy 12 mln zł", "rundzie seed"])
+        self.assertEqual(facts["headcount"], ["35 specjalistów"])
+        self.assertEqual(facts["clients"], ["120+ klientów"])
+        self.assertEqual(facts["year"], ["2015", "2023"])
+        self.assertEqual(facts["nip"], ["5261040828"])
+        self.assertEqual(facts["krs"], ["0000123456"])
+        self.assertEqual(facts["email"], ["biuro@firma.pl"])
+        self.assertEqual(extract_facts("Brak liczb w tekscie"), {})
+
+    def test_max_per_kind_and_dedup(self):
+        """Test limitu faktów jednego rodzaju i usuwania powtórzeń."""
+        texts = ["10% 10% 20%", "30% 40%"]
+        self.assertEqual(
+            extract_facts(texts, max_per_kind=3)["percent"], ["10%", "20%", "30%"]
+        )
+
+    def test_adjacent_numbers_are_not_merged(self):
+        """Test - fakt nie zaczyna się w środku sąsiedniej liczby."""
+        facts = extract_facts("W 2023 100 klientów, w 2024 35 osób i 12,5 15%.")
+        self.assertEqual(facts["clients"], ["100 klientów"])
+        self.assertEqual(facts["headcount"], ["35 osób"])
+        self.assertEqual(facts["percent"], ["15%"])
+        self.assertEqual(facts["year"], ["2023", "2024"])
+
+    def test_firm_matches_only_polish_forms(self):
+        """Test - "firmware" nie jest liczbą klientów, "200 firmom" jest."""
+        facts = extract_facts("version 3.14 firmware 100 users")
+        self.assertEqual(facts["clients"], ["100 users"])
+        facts = extract_facts("Pomagamy 200 firmom, w 40 firmach wdrożyliśmy system.")
+        self.assertEqual(facts["clients"], ["200 firmom", "40 firmach"])
+
+    def test_pipeline_sends_fact_table_with_excerpt(self):
+        """Test - z fact_excerpt_chars model dostaje tabelę i krótki fragment."""
+        html = (
+            "<html><body><p>Zespół 35 specjalistów, przychody 2,5 mln EUR.</p>"
+            + "<p>opis oferty firmy</p>" * 2000
+            + "</body></html>"
+        )
+        prompts = []
+
+        def generate(text, api_key, client=None, usage=None):
+            prompts.append(text)
+            return "# B"
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, True)
+        options = RunOptions(
+            api_key="k", quiet=True, profile=True, fact_excerpt_chars=2000
+        )
+        with patch("inwestor_pro.fetch_html", return_value=html):
+            with patch("inwestor_pro.generate_brochure", side_effect=generate):
+                result = process_site(
+                    "https://a.pl", options, os.path.join(tmp_dir, "broszura")
+                )
+
+        self.assertTrue(result.ok)
+        self.assertIn("| Kwoty | 2,5 mln EUR |", prompts[0])
+        self.assertIn("| Zespół | 35 specjalistów |", prompts[0])
+        self.assertLess(len(prompts[0]), 3000)
+        stages = [stage["stage"] for stage in result.profile["stages"]]
+        self.assertIn("extract_facts", stages)
+
+
+class TestPassageRanking(unittest.TestCase):
+    """Testy dla wyboru najtrafniejszych fragmentów dla sekcji broszury."""
+
+    PAGES = [
+        (
+            "https://a.pl",
+            "Firma Alfa tworzy platforme do analizy danych. "
+            "Pogoda w weekend byla sloneczna i ciepla. " * 3,
+        ),
+        (
+            "https://a.pl/zespol",
+            "Nasz zespół to doświadczeni eksperci. Założyciel i prezes "
+            "ma 15 lat doświadczenia w branży.",
+        ),
+        (
+            "https://a.pl/cennik",
+            "Oferujemy subskrypcja w trzech pakietach. Cennik abonament "
+            "zależy od liczby licencji.",
+        ),
+    ]
+
+    def _ranked(self) -> list:
+        passages = chunk_passages(self.PAGES, max_chars=120)
+        index = PassageIndex([text for _, text in passages])
+        queries = [SECTION_QUERIES["Zespół i Kompetencje"], "subskrypcja cennik"]
+        return [[passages[i][0] for i, _ in pairs] for pairs in index.top(queries, 1)]
+
+    def test_chunk_passages(self):
+        """Test podziału tekstu na fragmenty z całych zdań."""
+        text = "Jedno zdanie. Drugie zdanie. Trzecie."
+        self.assertEqual(
+            [passage for _, passage in chunk_passages([("u", text)], 20)],
+            ["Jedno zdanie.", "Drugie zdanie.", "Trzecie."],
+        )
+        self.assertEqual(chunk_passages([("u", "")]), [])
+
+    def test_ranking_without_numpy(self):
+        """Test rankingu TF-IDF w czystym Pythonie."""
+        with patch("inwestor_pro._numpy_module", return_value=None):
+            ranked = self._ranked()
+        self.assertEqual(ranked, [["https://a.pl/zespol"], ["https://a.pl/cennik"]])
+
+    @unittest.skipUnless(_numpy_module(), "numpy nie jest zainstalowany")
+    def test_numpy_matches_python(self):
+        """Test - wersja NumPy daje te same wyniki co czysty Python."""
+        passages = [text for _, text in chunk_passages(self.PAGES, 80)]
+        queries = list(SECTION_QUERIES.values())
+        numpy_scores = PassageIndex(passages).scores(queries).tolist()
+        with patch("inwestor_pro._numpy_module", return_value=None):
+            python_scores = PassageIndex(passages).scores(queries)
+        for numpy_row, python_row in zip(numpy_scores, python_scores):
+            for a, b in zip(numpy_row, python_row):
+                self.assertAlmostEqual(a, b)
+        self.assertEqual(
+            self._ranked(), [["https://a.pl/zespol"], ["https://a.pl/cennik"]]
+        )
+
+    def test_pipeline_sends_ranked_passages(self):
+        """Test - z passages_top_k model dostaje fragmenty pogrupowane wg sekcji."""
+        pages = {
+            url: f"<html><body><p>{text}</p></body></html>" for url, text in self.PAGES
+        }
+        pages["https://a.pl"] = pages["https://a.pl"].replace(
+            "</p>", '</p><a href="/zespol">Z</a><a href="/cennik">C</a>'
+        )
+        prompts = []
+
+        def generate(text, api_key, client=None, usage=None):
+            prompts.append(text)
+            return "# B"
+
+        def fetch(url, session=None):
+            return pages.get(url)
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, True)
+        options = RunOptions(api_key="k", quiet=True, passages_top_k=1)
+        with patch("inwestor_pro.fetch_html", side_effect=fetch):
+            with patch("inwestor_pro.fetch_subpage_content", side_effect=fetch):
+                with patch("inwestor_pro.generate_brochure", side_effect=generate):
+                    result = process_site(
+                        "https://a.pl", options, os.path.join(tmp_dir, "broszura")
+                    )
+
+        self.assertTrue(result.ok)
+        self.assertIn(
+            "=== FRAGMENTY: Zespół i Kompetencje ===\n[https://a.pl/zespol]",
+            prompts[0],
+        )
+        self.assertIn("[https://a.pl/cennik] Oferujemy", prompts[0])
+        self.assertNotIn("=== TREŚĆ GŁÓWNEJ STRONY ===", prompts[0])
+
+
+class TestLinkScoring(unittest.TestCase):
+    """Testy dla priorytetyzacji linków do podstron."""
+
+    def test_investor_pages_beat_menu_order(self):
+        """Test - strony o firmie i inwestorach wygrywają z linkami z menu."""
+        html = """
+        <html><body>
+        <nav>
+        <a href="/polityka-prywatnosci">Polityka prywatności</a>
+        <a href="/cookies">Ustawienia cookies</a>
+        <a href="/logowanie">Zaloguj</a>
+        <a href="/sklep/koszyk">Koszyk</a>
+        <a href="/galeria">Galeria</a>
+        </nav>
+        <main>
+        <a href="/blog/nowy-wpis">Nowy wpis</a>
+        <a href="/relacje-inwestorskie">Dla inwestorów</a>
+        <a href="/o-nas">O nas</a>
+        <a href="/strona-12">Nasz zespół</a>
+        </main>
+        </body></html>
+        """
+        links = find_subpage_links(html, "https://a.pl", max_links=4)
+        self.assertEqual(
+            links,
+            [
+                "https://a.pl/relacje-inwestorskie",
+                "https://a.pl/o-nas",
+                "https://a.pl/strona-12",
+                "https://a.pl/blog/nowy-wpis",
+            ],
+        )
+
+    def test_excluded_stems_match_longer_words(self):
+        """Test - wykluczenia działają, gdy budżet przekracza liczbę linków."""
+        html = """
+        <a href="/cookies">Informacje</a>
+        <a href="/rejestracja">Dołącz</a>
+        <a href="/logowanie">Panel</a>
+        <a href="/kategorie/nowosci">Nowości</a>
+        <a href="/o-nas">O nas</a>
+        """
+        links = find_subpage_links(html, "https://a.pl", max_links=5)
+        self.assertEqual(links, ["https://a.pl/o-nas"])
+
+    def test_score_subpage_link(self):
+        """Test wykluczeń, głębokości, stopki i tekstu linku."""
+        self.assertIsNone(score_subpage_link("https://a.pl/regulamin"))
+        self.assertIsNone(score_subpage_link("https://a.pl/x", "Zaloguj się"))
+        self.assertGreater(
+            score_subpage_link("https://a.pl/zespol"),
+            score_subpage_link("https://a.pl/o/zespol/anna"),
+        )
+        self.assertGreater(
+            score_subpage_link("https://a.pl/kariera"),
+            score_subpage_link("https://a.pl/kariera", in_footer=True),
+        )
+        self.assertGreater(
+            score_subpage_link("https://a.pl/zespol"),
+            score_subpage_link("https://a.pl/strona", "Zespół"),
+        )
+
+    def test_fetch_budget_spread_across_sections(self):
+        """Test - kolejne linki z tej samej sekcji ustępują innym sekcjom."""
+        posts = "".join(f'<a href="/blog/wpis-{i}">Wpis {i}</a>' for i in range(10))
+        html = f'<html><body>{posts}<a href="/kariera">Kariera</a></body></html>'
+        links = find_subpage_links(html, "https://a.pl", max_links=3)
+        self.assertEqual(
+            links,
+            [
+                "https://a.pl/kariera",
+                "https://a.pl/blog/wpis-0",
+                "https://a.pl/blog/wpis-1",
+            ],
+        )
+
+
+class TestContentBudget(unittest.TestCase):
+    """Testy dla przerywania pobierania po zebraniu budżetu treści."""
+
+    def test_budget_counts_unique_sentences(self):
+        """Test - powtarzające się zdania (menu, stopka) liczą się raz."""
+        budget = ContentBudget(40)
+        self.assertEqual(budget.add("Menu główne. Firma Alfa."), 23)
+        self.assertEqual(budget.add("Menu główne. Zespół."), 7)
+        self.assertFalse(budget.exhausted)
+        budget.add("Nowa oferta dla klientów biznesowych.")
+        self.assertTrue(budget.exhausted)
+
+    def test_pipeline_stops_fetching_after_budget(self):
+        """Test - po wyczerpaniu budżetu dalsze podstrony nie są pobierane."""
+        links = "".join(f'<a href="/strona-{i}">S{i}</a>' for i in range(4))
+        main_html = f"<html><body><p>Firma Alfa.</p>{links}</body></html>"
+        fetched = []
+
+        def fetch_subpage(url, session=None):
+            fetched.append(url)
+            return f"<html><body><p>Unikalna tresc podstrony {url}.</p></body></html>"
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, True)
+        skipped = METRICS.value("inwestor_pages_skipped_total", reason="budget")
+        options = RunOptions(api_key="k", quiet=True, profile=True, content_budget=30)
+        patchers = [
+            patch("inwestor_pro.fetch_html", return_value=main_html),
+            patch("inwestor_pro.fetch_subpage_content", side_effect=fetch_subpage),
+            patch("inwestor_pro.generate_brochure", return_value="# B"),
+            patch("sys.stdout", new_callable=StringIO),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        clean = patch(
+            "inwestor_pro.clean_and_extract_text", wraps=clean_and_extract_text
+        ).start()
+        self.addCleanup(patch.stopall)
+
+        result = process_site("https://a.pl", options, os.path.join(tmp_dir, "b"))
+
+        self.assertTrue(result.ok)
+        self.assertEqual(fetched, ["https://a.pl/strona-0"])
+        self.assertEqual(clean.call_count, 2)
+        self.assertEqual(
+            result.profile["skipped_subpages"],
+            [f"https://a.pl/strona-{i}" for i in range(1, 4)],
+        )
+        self.assertEqual(
+            METRICS.value("inwestor_pages_skipped_total", reason="budget") - skipped,
+            3,
+        )
+
+
+class TestSiteDeadline(unittest.TestCase):
+    """Testy dla limitu czasu całej strony (--site-deadline)."""
+
+    def setUp(self):
+        self.clock = [100.0]
+        patcher = patch("time.perf_counter", side_effect=lambda: self.clock[0])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, True)
+        self.output = os.path.join(tmp_dir, "b")
+
+    def test_deadline_timeout(self):
+        """Test - timeout żądania jest ograniczany pozostałym czasem."""
+        self.assertEqual(_deadline_timeout(None), {})
+        self.assertEqual(_deadline_timeout(5.0), {"timeout": 5.0})
+        self.assertEqual(_deadline_timeout(100.0), {"timeout": 30.0})
+        self.assertEqual(_deadline_timeout(-2.0), {"timeout": 1.0})
+
+        job = SiteJob(url="https://a.pl")
+        self.assertIsNone(job.time_left())
+        job.start_deadline(10)
+        self.clock[0] += 2
+        self.assertEqual(job.time_left(), 8.0)
+        self.assertEqual(job.time_left(fetch=True), 3.0)
+
+    def _run(self, main_delay, generate=None):
+        """Uruchamia process_site z podstronami pobieranymi po 3 sekundy."""
+        links = "".join(f'<a href="/strona-{i}">S{i}</a>' for i in range(4))
+        main_html = f"<html><body><p>Firma Alfa.</p>{links}</body></html>"
+        self.timeouts = []
+        self.deadlines = []
+
+        def fetch_main(url, session=None, timeout=30, deadline=None):
+            self.clock[0] += main_delay
+            return main_html
+
+        def fetch_subpage(url, session=None, timeout=30, deadline=None):
+            self.timeouts.append(timeout)
+            self.deadlines.append(deadline)
+            self.clock[0] += 3
+            return f"<html><body><p>Tresc {url}.</p></body></html>"
+
+        options = RunOptions(api_key="k", quiet=True, site_deadline=10)
+        with patch("inwestor_pro.fetch_html", side_effect=fetch_main):
+            with patch("inwestor_pro.fetch_subpage_content", side_effect=fetch_subpage):
+                with patch(
+                    "inwestor_pro.generate_brochure", side_effect=generate
+                ) as mock_gen:
+                    with patch("sys.stdout", new_callable=StringIO):
+                        result = process_site("https://a.pl", options, self.output)
+        return result, mock_gen
+
+    def test_slow_subpages_are_skipped_at_fetch_cutoff(self):
+        """Test - po połowie limitu podstrony są pomijane, a model dostaje resztę."""
+        skipped = METRICS.value("inwestor_pages_skipped_total", reason="deadline")
+        result, mock_gen = self._run(0, generate=lambda *a, **kw: "# B")
+
+        self.assertTrue(result.ok)
+        self.assertEqual(self.timeouts, [5.0, 2.0])
+        self.assertEqual(self.deadlines, [105.0, 105.0])
+        self.assertEqual(mock_gen.call_args.kwargs["timeout"], 4.0)
+        self.assertEqual(mock_gen.call_args.kwargs["max_retries"], 0)
+        self.assertIn("strona-1", mock_gen.call_args.args[0])
+        self.assertEqual(
+            METRICS.value("inwestor_pages_skipped_total", reason="deadline") - skipped,
+            2,
+        )
+
+    def test_deadline_disables_client_retries(self):
+        """Test - przy limicie strony klient OpenAI nie ponawia żądań."""
+        client = unittest.mock.MagicMock()
+        retrying = client.with_options.return_value
+        retrying.chat.completions.create.return_value.choices[0].message.content = "# B"
+
+        with patch("sys.stdout", new_callable=StringIO):
+            brochure = generate_brochure(
+                "Tresc", "k", client=client, timeout=4.0, max_retries=0
+            )
+
+        self.assertIsNotNone(brochure)
+        client.with_options.assert_called_once_with(max_retries=0)
+        client.chat.completions.create.assert_not_called()
+        self.assertEqual(
+            retrying.chat.completions.create.call_args.kwargs["timeout"], 4.0
+        )
+
+    def test_trickling_body_stops_at_deadline(self):
+        """Test - wolno wysyłana treść jest przerywana po terminie strony."""
+        clock = self.clock
+        response = unittest.mock.MagicMock()
+        response.status_code = 200
+        response.headers = {"content-type": "text/html"}
+
+        def trickle(chunk_size=1, decode_unicode=False):
+            # Każda porcja mieści się w timeout odczytu, ale razem trwają 20 s
+            for _ in range(10):
+                clock[0] += 2
+                yield b"<p>x</p>"
+
+        response.iter_content = trickle
+        session = unittest.mock.MagicMock()
+        session.get.return_value = response
+        timeouts = METRICS.value("inwestor_fetch_errors_total", type="timeout")
+
+        with patch("sys.stdout", new_callable=StringIO):
+            html = fetch_html(
+                "https://a.pl", timeout=5, session=session, deadline=clock[0] + 5
+            )
+
+        self.assertIsNone(html)
+        self.assertEqual(clock[0], 106.0)
+        self.assertTrue(session.get.call_args.kwargs["stream"])
+        response.close.assert_called_once()
+        self.assertEqual(
+            METRICS.value("inwestor_fetch_errors_total", type="timeout") - timeouts, 1
+        )
+
+    def test_generation_fails_after_deadline(self):
+        """Test - bez czasu na wywołanie modelu zadanie kończy się błędem."""
+        result, mock_gen = self._run(20)
+
+        self.assertFalse(result.ok)
+        self.assertIn("limit czasu", result.error)
+        self.assertEqual(self.timeouts, [])
+        mock_gen.assert_not_called()
+
+
+class TestHostConcurrencyLimiter(unittest.TestCase):
+    """Testy dla adaptacyjnego limitu połączeń do hosta (AIMD)."""
+
+    def test_additive_increase_multiplicative_decrease(self):
+        """Test - sukces zwiększa limit o 1/limit, przeciążenie go połowi."""
+        limiter = HostConcurrencyLimiter(initial=2, maximum=4)
+        self.assertTrue(limiter.acquire("a.pl", timeout=0))
+        self.assertTrue(limiter.acquire("a.pl", timeout=0))
+        self.assertFalse(limiter.acquire("a.pl", timeout=0))
+        self.assertTrue(limiter.acquire("b.pl", timeout=0))
+
+        started = time.perf_counter()
+        limiter.release("a.pl", started, "ok")
+        self.assertEqual(limiter.limit("a.pl"), 2.5)
+        self.assertEqual(
+            METRICS.value("inwestor_fetch_concurrency_limit", host="a.pl"), 2.5
+        )
+
+        # Dwa odrzucenia z tego samego okna zmniejszają limit tylko raz
+        limiter.release("a.pl", started, "throttled")
+        limiter.release("b.pl", started, "ok")
+        self.assertEqual(limiter.limit("a.pl"), 1.25)
+        self.assertTrue(limiter.acquire("a.pl", timeout=0))
+        limiter.release("a.pl", started, "timeout")
+        self.assertEqual(limiter.limit("a.pl"), 1.25)
+
+        # Błędy inne niż przeciążenie nie zmieniają limitu
+        self.assertTrue(limiter.acquire("a.pl", timeout=0))
+        limiter.release("a.pl", time.perf_counter(), "error")
+        self.assertEqual(limiter.limit("a.pl"), 1.25)
+
+    def test_slow_response_backs_off(self):
+        """Test - odpowiedź wolniejsza niż latency_target zmniejsza limit."""
+        limiter = HostConcurrencyLimiter(initial=4, latency_target=1.0)
+        limiter.acquire("a.pl")
+        limiter.release("a.pl", time.perf_counter() - 2.0, "ok")
+        self.assertEqual(limiter.limit("a.pl"), 2.0)
+
+    def _hammer(self, capacity, limiter, requests_count=60, threads=8):
+        """Pobiera podstrony z wielu wątków przez wspólny limiter."""
+        server, base_url, stats = start_capacity_site(capacity)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        urls = [f"{base_url}/strona-{i}" for i in range(requests_count)]
+
+        def worker():
+            while True:
+                try:
+                    url = urls.pop()
+                except IndexError:
+                    return
+                fetch_subpage_content(url, timeout=5, limiter=limiter)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        with patch("sys.stdout", new_callable=StringIO):
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+        return urlparse(base_url).netloc, stats
+
+    def test_backs_off_on_small_host(self):
+        """Test - host obsługujący 2 żądania naraz obniża limit."""
+        limiter = HostConcurrencyLimiter(initial=8, maximum=8)
+        host, stats = self._hammer(2, limiter)
+
+        # Bez limitera 8 wątków dostaje ok. 80% odpowiedzi 503
+        self.assertGreater(stats["rejected"], 0)
+        self.assertLess(stats["rejected"], 30)
+        self.assertLess(limiter.limit(host), 8)
+        self.assertGreater(
+            METRICS.value("inwestor_fetch_backoffs_total", reason="throttled"), 0
+        )
+
+    def test_grows_on_fast_host(self):
+        """Test - szybki host bez odrzuceń podnosi limit do maksimum."""
+        limiter = HostConcurrencyLimiter(initial=2, maximum=6)
+        host, stats = self._hammer(100, limiter)
+
+        self.assertEqual(stats["rejected"], 0)
+        self.assertEqual(stats["ok"], 60)
+        self.assertEqual(limiter.limit(host), 6)
+
+    def _process_site(self, capacity, limiter):
+        """Przetwarza stronę z 5 podstronami z serwera o danej przepustowości."""
+        server, base_url, stats = start_capacity_site(capacity, delay=0.2)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        links = "".join(f'<a href="/strona-{i}">S{i}</a>' for i in range(5))
+        main_html = f"<html><body><p>Firma Alfa.</p>{links}</body></html>"
+        options = RunOptions(api_key="k", quiet=True, fetch_limiter=limiter)
+        with patch("inwestor_pro.fetch_html", return_value=main_html):
+            with patch("inwestor_pro.generate_brochure", return_value="# B"):
+                with patch("sys.stdout", new_callable=StringIO):
+                    result = process_site(base_url, options, "broszura")
+        return urlparse(base_url).netloc, stats, result
+
+    def test_subpages_are_fetched_concurrently(self):
+        """Test - podstrony jednej strony są pobierane równolegle do limitu."""
+        limiter = HostConcurrencyLimiter(initial=3, maximum=4)
+        _, stats, result = self._process_site(100, limiter)
+
+        self.assertTrue(result.ok)
+        self.assertEqual(stats["ok"], 5)
+        self.assertGreater(stats["max_in_flight"], 1)
+        self.assertLessEqual(stats["max_in_flight"], 4)
+
+    def test_subpage_throttling_backs_off(self):
+        """Test - odpowiedzi 503 przy równoległym pobieraniu obniżają limit."""
+        backoffs = METRICS.value("inwestor_fetch_backoffs_total", reason="throttled")
+        limiter = HostConcurrencyLimiter(initial=4, maximum=4)
+        host, stats, _ = self._process_site(1, limiter)
+
+        self.assertGreater(stats["rejected"], 0)
+        self.assertLess(limiter.limit(host), 4)
+        self.assertGreater(
+            METRICS.value("inwestor_fetch_backoffs_total", reason="throttled"),
+            backoffs,
+        )
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Testy dla łączenia równoczesnych, identycznych wywołań."""
+
+    def _concurrent(self, flights, key, fn, count=2):
+        """Uruchamia count wywołań flights.do; pierwsze blokuje resztę."""
+        entered, release = threading.Event(), threading.Event()
+        outcomes = []
+
+        def leader():
+            entered.set()
+            self.assertTrue(release.wait(timeout=5))
+            return fn()
+
+        def call(work):
+            try:
+                outcomes.append(flights.do(key, work))
+            except ValueError as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=call, args=(leader,))]
+        threads[0].start()
+        self.assertTrue(entered.wait(timeout=5))
+        for _ in range(count - 1):
+            threads.append(threading.Thread(target=call, args=(fn,)))
+            threads[-1].start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_concurrent_calls_share_one_result(self):
+        """Test - równoczesne wywołania wykonują operację raz."""
+        flights = SingleFlight()
+        calls = []
+
+        def work():
+            calls.append(1)
+            return "wynik"
+
+        outcomes = self._concurrent(flights, ("html", "k"), work, count=3)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(outcomes), [("wynik", False)] + [("wynik", True)] * 2)
+        # Po zakończeniu klucz jest zwolniony - kolejne wywołanie liczy od nowa
+        self.assertEqual(flights.do(("html", "k"), work), ("wynik", False))
+        self.assertEqual(len(calls), 2)
+
+    def test_error_is_shared(self):
+        """Test - wyjątek lidera trafia do wszystkich oczekujących."""
+
+        def work():
+            raise ValueError("awaria")
+
+        outcomes = self._concurrent(SingleFlight(), "k", work)
+
+        self.assertEqual(len(outcomes), 2)
+        self.assertTrue(all(isinstance(o, ValueError) for o in outcomes))
+
+    def test_normalize_url(self):
+        """Test - warianty tego samego adresu dają jeden klucz."""
+        for url in ("https://A.pl", "https://a.pl:443/", "HTTPS://a.pl/#top"):
+            self.assertEqual(normalize_url(url), "https://a.pl/")
+        self.assertEqual(
+            normalize_url("http://a.pl:8080/o-nas?x=1#y"),
+            "http://a.pl:8080/o-nas?x=1",
+        )
+
+    def test_batch_coalesces_duplicate_fetches(self):
+        """Test - dwa zadania z tym samym URL pobierają stronę raz."""
+        fetched = []
+
+        def fetch(url, **kwargs):
+            fetched.append(url)
+            time.sleep(0.3)
+            return "<html><body><p>Tresc strony.</p></body></html>"
+
+        options = RunOptions(api_key="k", quiet=True, single_flight=SingleFlight())
+        shared = METRICS.value("inwestor_coalesced_total", stage="html")
+        with patch("inwestor_pro.fetch_html", side_effect=fetch):
+            with patch("inwestor_pro.generate_brochure", return_value="# B"):
+                with patch("inwestor_pro.save_markdown_file", return_value=True):
+                    with patch("sys.stdout", new_callable=StringIO):
+                        results = run_batch(
+                            ["https://a.pl", "https://A.pl/"], options, concurrency=2
+                        )
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(len(fetched), 1)
+        self.assertEqual(
+            METRICS.value("inwestor_coalesced_total", stage="html") - shared, 1
+        )
+
+    def test_url_variants_share_one_llm_call(self):
+        """Test - warianty URL przetwarzane naraz wywołują model raz."""
+        ticks = iter(range(1000))
+
+        class TickingDatetime(datetime):
+            """Zegar przesuwający się o sekundę przy każdym odczycie."""
+
+            @classmethod
+            def now(cls, tz=None):
+                return datetime(2026, 1, 1, 12, 0, next(ticks) % 60)
+
+        html = (
+            "<html><body><p>Alfa buduje platforme dla firm.</p>"
+            '<a href="/o-nas">O nas</a></body></html>'
+        )
+        options = RunOptions(api_key="k", quiet=True, single_flight=SingleFlight())
+
+        def generate(text, api_key, **kwargs):
+            time.sleep(0.3)
+            return "# B"
+
+        with patch("inwestor_pro.datetime", TickingDatetime):
+            with patch("inwestor_pro.fetch_html", return_value=html):
+                with patch(
+                    "inwestor_pro.fetch_subpage_content",
+                    return_value="<p>Zespol ekspertow.</p>",
+                ):
+                    with patch(
+                        "inwestor_pro.generate_brochure", side_effect=generate
+                    ) as mock_gen:
+                        with patch(
+                            "inwestor_pro.save_markdown_file", return_value=True
+                        ):
+                            with patch("sys.stdout", new_callable=StringIO):
+                                results = run_batch(
+                                    ["https://a.pl", "https://A.pl/"],
+                                    options,
+                                    concurrency=2,
+                                )
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(mock_gen.call_count, 1)
+
+
+class TestWatchMode(unittest.TestCase):
+    """Testy dla trybu obserwacji (--watch)."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_content_change(self):
+        """Test - zmiana treści to odsetek dodanych lub usuniętych zdań."""
+        old = content_fingerprint(["Firma Alfa. Zespół 12 osób.", "Firma Alfa."])
+        self.assertEqual(len(old), 2)
+        self.assertEqual(content_change(old, old), 0.0)
+        self.assertEqual(content_change(None, old), 1.0)
+        new = content_fingerprint(["firma alfa. Zespół 15 osób."])
+        self.assertAlmostEqual(content_change(old, new), 2 / 3)
+
+    def test_schedule_adapts_interval_and_persists(self):
+        """Test - zmiana skraca interwał, brak zmian go wydłuża."""
+        schedule = WatchSchedule("watch.json", interval=86400)
+        schedule.sync(["https://a.pl", "https://b.pl"], now=0)
+        self.assertEqual(schedule.pop_due(0), ["https://a.pl", "https://b.pl"])
+        self.assertEqual(schedule.pop_due(0), [])
+
+        schedule.record("https://a.pl", "changed", {"etag": '"v2"'}, now=10)
+        schedule.record("https://b.pl", "unchanged", {}, now=10)
+        self.assertEqual(schedule.sites["https://a.pl"]["interval"], 43200)
+        self.assertEqual(schedule.sites["https://b.pl"]["interval"], 129600)
+
+        reloaded = WatchSchedule("watch.json")
+        self.assertEqual(reloaded.next_due(), 43210)
+        self.assertEqual(reloaded.sites["https://a.pl"]["etag"], '"v2"')
+        self.assertEqual(reloaded.pop_due(50000), ["https://a.pl"])
+        reloaded.sync(["https://a.pl"], now=50000)
+        self.assertIsNone(reloaded.next_due())
+        self.assertNotIn("https://b.pl", reloaded.sites)
+
+    def test_fetch_html_conditional(self):
+        """Test - walidator ETag daje odpowiedź 304 przy kolejnej wizycie."""
+
+        class ETagHandler(BaseHTTPRequestHandler):
+            def do_GET(self):  # noqa: N802
+                if self.headers.get("If-None-Match") == '"v1"':
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                data = b"<html><body><p>Tresc.</p></body></html>"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("ETag", '"v1"')
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), ETagHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+        validators = {}
+        html, not_modified = fetch_html_conditional(url, validators, timeout=5)
+        self.assertIn("Tresc", html)
+        self.assertFalse(not_modified)
+        self.assertEqual(validators, {"etag": '"v1"'})
+        self.assertEqual(
+            fetch_html_conditional(url, validators, timeout=5), (None, True)
+        )
+
+    def test_watch_regenerates_only_on_change(self):
+        """Test - broszura powstaje tylko dla nowej lub zmienionej treści."""
+        pages = ["Firma Alfa. Zespol 12 osob. Klienci w Polsce."]
+        clock = [1000.0]
+
+        def fetch(url, validators, **kwargs):
+            if validators.get("etag") == '"stale"':
+                return None, True
+            validators["etag"] = '"v1"'
+            return f"<html><body><p>{pages[-1]}</p></body></html>", False
+
+        schedule = WatchSchedule("watch.json", interval=3600)
+        options = RunOptions(api_key="k", quiet=True)
+
+        def visit():
+            with patch("inwestor_pro.fetch_html_conditional", side_effect=fetch):
+                with patch(
+                    "inwestor_pro.generate_brochure", return_value="# B"
+                ) as mock_gen:
+                    with patch("sys.stdout", new_callable=StringIO):
+                        visits = run_watch(
+                            ["https://a.pl"],
+                            options,
+                            schedule,
+                            once=True,
+                            clock=lambda: clock[0],
+                        )
+            clock[0] += schedule.sites["https://a.pl"]["interval"]
+            return visits, mock_gen.call_count
+
+        self.assertEqual(visit(), ([("https://a.pl", "new")], 1))
+        self.assertTrue(get_output_path("broszura_a_pl").exists())
+
+        # Ta sama treść (inny HTML) - bez wywołania modelu
+        pages.append(pages[0] + " ")
+        self.assertEqual(visit(), ([("https://a.pl", "unchanged")], 0))
+        self.assertEqual(schedule.sites["https://a.pl"]["interval"], 5400)
+
+        schedule.sites["https://a.pl"]["etag"] = '"stale"'
+        self.assertEqual(visit(), ([("https://a.pl", "not_modified")], 0))
+        self.assertEqual(schedule.sites["https://a.pl"]["etag"], '"stale"')
+
+        schedule.sites["https://a.pl"]["etag"] = '"v1"'
+        pages.append("Firma Alfa. Zespol 40 osob. Klienci w Europie.")
+        self.assertEqual(visit(), ([("https://a.pl", "changed")], 1))
+        entry = WatchSchedule("watch.json").sites["https://a.pl"]
+        self.assertEqual(entry["changes"], 1)
+        self.assertEqual(entry["visits"], 4)
+        self.assertEqual(entry["interval"], 4050)
+
+    def test_failed_generation_does_not_keep_validators(self):
+        """Test - po błędzie generowania kolejna wizyta nie kończy się 304."""
+
+        def fetch(url, validators, **kwargs):
+            if validators.get("etag") == '"v1"':
+                return None, True
+            validators["etag"] = '"v1"'
+            return "<html><body><p>Firma Alfa. Zespol 12 osob.</p></body></html>", False
+
+        schedule = WatchSchedule("watch.json", interval=3600)
+        options = RunOptions(api_key="k", quiet=True)
+
+        def visit(brochure, now):
+            with patch("inwestor_pro.fetch_html_conditional", side_effect=fetch):
+                with patch("inwestor_pro.generate_brochure", return_value=brochure):
+                    with patch("sys.stdout", new_callable=StringIO):
+                        return run_watch(
+                            ["https://a.pl"],
+                            options,
+                            schedule,
+                            once=True,
+                            clock=lambda: now,
+                        )
+
+        self.assertEqual(visit(None, 0), [("https://a.pl", "error")])
+        entry = schedule.sites["https://a.pl"]
+        self.assertIsNone(entry.get("etag"))
+        self.assertNotIn("fingerprint", entry)
+
+        self.assertEqual(visit("# B", 4000), [("https://a.pl", "new")])
+        self.assertEqual(schedule.sites["https://a.pl"]["etag"], '"v1"')
+        self.assertEqual(visit("# B", 20000), [("https://a.pl", "not_modified")])
+
+    def test_subpage_change_is_detected_behind_root_304(self):
+        """Test - 304 strony głównej nie ukrywa zmiany podstrony."""
+        site = {
+            "https://a.pl": [
+                '"m1"',
+                '<html><body><p>Firma Alfa.</p><a href="/zespol">Zespół</a></body>'
+                "</html>",
+            ],
+            "https://a.pl/zespol": [
+                '"z1"',
+                "<html><body><p>Zespol 12 osob. Dwoch zalozycieli.</p></body></html>",
+            ],
+        }
+        requests_log = []
+
+        def fetch(url, validators, **kwargs):
+            etag, html = site[url]
+            conditional = bool(validators.get("etag"))
+            requests_log.append((url, conditional))
+            if validators.get("etag") == etag:
+                return None, True
+            validators["etag"] = etag
+            return html, False
+
+        schedule = WatchSchedule("watch.json", interval=3600)
+        options = RunOptions(api_key="k", quiet=True)
+
+        def visit(now):
+            requests_log.clear()
+            with patch("inwestor_pro.fetch_html_conditional", side_effect=fetch):
+                with patch(
+                    "inwestor_pro.generate_brochure", return_value="# B"
+                ) as mock_gen:
+                    with patch("sys.stdout", new_callable=StringIO):
+                        visits = run_watch(
+                            ["https://a.pl"],
+                            options,
+                            schedule,
+                            once=True,
+                            clock=lambda: now,
+                        )
+            return visits[0][1], mock_gen.call_count
+
+        self.assertEqual(visit(0), ("new", 1))
+        entry = schedule.sites["https://a.pl"]
+        self.assertEqual(entry["subpages"], {"https://a.pl/zespol": {"etag": '"z1"'}})
+
+        # Obie strony bez zmian - dwa żądania warunkowe i koniec wizyty
+        self.assertEqual(visit(10**6), ("not_modified", 0))
+        self.assertEqual(
+            requests_log, [("https://a.pl", True), ("https://a.pl/zespol", True)]
+        )
+
+        site["https://a.pl/zespol"] = [
+            '"z2"',
+            "<html><body><p>Zespol 40 osob. Nowy zarzad i rada.</p></body></html>",
+        ]
+        self.assertEqual(visit(2 * 10**6), ("changed", 1))
+        self.assertEqual(
+            schedule.sites["https://a.pl"]["subpages"],
+            {"https://a.pl/zespol": {"etag": '"z2"'}},
+        )
+        self.assertEqual(visit(3 * 10**6), ("not_modified", 0))
+
+
+class TestIncrementalBrochure(unittest.TestCase):
+    """Testy dla przyrostowej regeneracji sekcji broszury (--incremental)."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _brochure(names, version):
+        return "\n\n".join(f"## {name}\n\n{version} {name}" for name in names)
+
+    def test_split_and_join_sections(self):
+        """Test - podział broszury na sekcje pomija nagłówek i stopkę."""
+        brochure = enhance_brochure_formatting(
+            "## 1. **Tytuł Broszury**\n# Alfa\n\n"
+            + self._brochure(BROCHURE_SECTIONS[1:], "v1")
+        )
+        sections = split_brochure_sections(brochure)
+
+        self.assertEqual(list(sections), list(BROCHURE_SECTIONS))
+        self.assertEqual(sections["Tytuł Broszury"], "## 1. **Tytuł Broszury**\n# Alfa")
+        self.assertNotIn("automatycznie", sections["Rekomendacja Inwestycyjna"])
+        joined = join_brochure_sections(sections)
+        self.assertEqual(split_brochure_sections(joined), sections)
+
+    def test_title_without_section_heading(self):
+        """Test - tytuł przed pierwszą sekcją to sekcja tytułu broszury."""
+        title = "# Firma Alfa – Inwestycja w cyfrową przyszłość logistyki"
+        brochure = enhance_brochure_formatting(
+            f"{title}\n\n" + self._brochure(BROCHURE_SECTIONS[1:], "v1")
+        )
+        sections = split_brochure_sections(brochure)
+
+        self.assertEqual(list(sections), list(BROCHURE_SECTIONS))
+        self.assertEqual(sections["Tytuł Broszury"], title)
+        self.assertNotIn("Broszura Inwestycyjna", sections["Tytuł Broszury"])
+        self.assertEqual(
+            split_brochure_sections(join_brochure_sections(sections)), sections
+        )
+
+    def test_title_containing_section_name(self):
+        """Test - tytuł z nazwą sekcji nie jest brany za tę sekcję."""
+        for title in (
+            "# Rekomendacja Inwestycyjna dla TechCorp",
+            "# TechCorp – Perspektywy Rozwoju AI",
+        ):
+            with self.subTest(title=title):
+                brochure = f"{title}\n\n" + self._brochure(
+                    ["1. **Executive Summary**", *BROCHURE_SECTIONS[2:]], "v1"
+                )
+                sections = split_brochure_sections(brochure)
+
+                self.assertEqual(list(sections), list(BROCHURE_SECTIONS))
+                self.assertEqual(sections["Tytuł Broszury"], title)
+                self.assertEqual(
+                    sections["Rekomendacja Inwestycyjna"],
+                    "## Rekomendacja Inwestycyjna\n\nv1 Rekomendacja Inwestycyjna",
+                )
+                self.assertEqual(
+                    sections["Executive Summary"],
+                    "## 1. **Executive Summary**\n\nv1 1. **Executive Summary**",
+                )
+
+    def test_affected_sections(self):
+        """Test - zmiana jednej strony dotyka jej sekcji i sekcji podsumowań."""
+        team = {"fingerprint": ["a", "b"], "sections": ["Zespół i Kompetencje"]}
+        main = {"fingerprint": ["c"], "sections": list(MAIN_PAGE_SECTIONS)}
+        previous = {"https://a.pl": main, "https://a.pl/zespol": team}
+
+        self.assertEqual(affected_sections(previous, previous), [])
+        changed = dict(previous)
+        changed["https://a.pl/zespol"] = dict(team, fingerprint=["a", "x"])
+        self.assertEqual(
+            affected_sections(previous, changed),
+            [
+                "Executive Summary",
+                "Analiza Podstron",
+                "Zespół i Kompetencje",
+                "Rekomendacja Inwestycyjna",
+            ],
+        )
+
+    def test_attribute_sections(self):
+        """Test - strona zespołu zasila tylko sekcję o zespole."""
+        attribution = attribute_sections(
+            [
+                ("https://a.pl", "Alfa buduje platformę dla firm."),
+                ("https://a.pl/zespol", "Założyciele to eksperci z doświadczeniem."),
+                ("https://a.pl/oferta", "Oferta i cennik subskrypcji."),
+            ]
+        )
+
+        self.assertEqual(attribution["https://a.pl"], list(MAIN_PAGE_SECTIONS))
+        self.assertEqual(attribution["https://a.pl/zespol"], ["Zespół i Kompetencje"])
+        self.assertIn("Model Biznesowy", attribution["https://a.pl/oferta"])
+
+    def test_regenerates_only_affected_sections(self):
+        """Test - po zmianie strony zespołu regenerowane są tylko jej sekcje."""
+        main_html = (
+            "<html><body><p>Alfa buduje platformę dla firm.</p>"
+            '<a href="/zespol">Zespół</a><a href="/oferta">Oferta</a></body></html>'
+        )
+        subpages = {
+            "https://a.pl/zespol": "Założyciele to eksperci z doświadczeniem.",
+            "https://a.pl/oferta": "Oferta i cennik subskrypcji.",
+        }
+        calls = []
+
+        def generate(text, api_key, sections=None, **kwargs):
+            calls.append(sections)
+            if sections:
+                return self._brochure(sections, "v2")
+            return enhance_brochure_formatting(self._brochure(BROCHURE_SECTIONS, "v1"))
+
+        def run():
+            with patch("inwestor_pro.fetch_html", return_value=main_html):
+                with patch(
+                    "inwestor_pro.fetch_subpage_content",
+                    side_effect=lambda url, **kw: f"<p>{subpages[url]}</p>",
+                ):
+                    with patch("inwestor_pro.generate_brochure", side_effect=generate):
+                        with patch("sys.stdout", new_callable=StringIO):
+                            result = process_site(
+                                "https://a.pl",
+                                RunOptions(api_key="k", quiet=True, incremental=True),
+                            )
+            self.assertTrue(result.ok)
+            with open(result.output_path, encoding="utf-8") as f:
+                return f.read()
+
+        first = run()
+        self.assertEqual(calls, [None])
+        self.assertIn("v1 Zespół i Kompetencje", first)
+
+        # Treść bez zmian - broszura z zapisanych sekcji, bez wywołania modelu
+        self.assertIn("v1 Model Biznesowy", run())
+        self.assertEqual(len(calls), 1)
+
+        subpages["https://a.pl/zespol"] = "Nowi założyciele i eksperci w zarządzie."
+        third = run()
+        self.assertEqual(
+            calls[-1],
+            [
+                "Executive Summary",
+                "Analiza Podstron",
+                "Zespół i Kompetencje",
+                "Rekomendacja Inwestycyjna",
+            ],
+        )
+        self.assertIn("v2 Zespół i Kompetencje", third)
+        self.assertIn("v1 Model Biznesowy", third)
+        self.assertLess(third.index("v1 Tytuł"), third.index("v2 Executive"))
+
+    def test_generated_title_persists_between_runs(self):
+        """Test - broszura z samym tytułem "#" nie wymusza ponownej generacji."""
+        title = "# Firma Alfa – Platforma, która skaluje sprzedaż B2B"
+        main_html = (
+            "<html><body><p>Alfa buduje platformę dla firm.</p>"
+            '<a href="/zespol">Zespół</a></body></html>'
+        )
+        team = ["Założyciele to eksperci z doświadczeniem."]
+        calls = []
+
+        def generate(text, api_key, sections=None, **kwargs):
+            calls.append(sections)
+            if sections:
+                return "Oto zaktualizowane sekcje:\n\n" + self._brochure(sections, "v2")
+            return enhance_brochure_formatting(
+                f"{title}\n\n" + self._brochure(BROCHURE_SECTIONS[1:], "v1")
+            )
+
+        def run():
+            with patch("inwestor_pro.fetch_html", return_value=main_html):
+                with patch(
+                    "inwestor_pro.fetch_subpage_content",
+                    side_effect=lambda url, **kw: f"<p>{team[-1]}</p>",
+                ):
+                    with patch("inwestor_pro.generate_brochure", side_effect=generate):
+                        with patch("sys.stdout", new_callable=StringIO):
+                            result = process_site(
+                                "https://a.pl",
+                                RunOptions(api_key="k", quiet=True, incremental=True),
+                            )
+            self.assertTrue(result.ok)
+            with open(result.output_path, encoding="utf-8") as f:
+                return f.read()
+
+        run()
+        self.assertIn(title, run())
+        self.assertEqual(calls, [None])
+
+        team.append("Nowi założyciele i eksperci w zarządzie.")
+        third = run()
+        self.assertNotIn("Tytuł Broszury", calls[-1])
+        self.assertIn(title, third)
+        self.assertNotIn("Oto zaktualizowane", third)
+        self.assertIn("v2 Zespół i Kompetencje", third)
+
+
+class TestCassette(unittest.TestCase):
+    """Testy dla nagrywania i odtwarzania przebiegów (--record / --replay)."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        self.root = os.path.join(self.tmp_dir, "kaseta")
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _llm_client(content):
+        response = unittest.mock.MagicMock()
+        response.choices[0].message.content = content
+        response.usage.prompt_tokens = 1200
+        response.usage.completion_tokens = 300
+        response.usage.prompt_tokens_details.cached_tokens = 0
+        client = unittest.mock.MagicMock()
+        client.chat.completions.create.return_value = response
+        return client
+
+    def _record_entry(self, elapsed):
+        """Nagrywa jedną odpowiedź HTTP i zwraca jej klucz."""
+        response = unittest.mock.MagicMock()
+        response.status_code = 200
+        response.reason = "OK"
+        response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        response.content = "<p>Zażółć</p>".encode("utf-8")
+        key = Cassette.http_key("https://a.pl/")
+        Cassette(self.root, "record").record_http(
+            key, "https://a.pl/", response, elapsed
+        )
+        return key
+
+    def test_record_then_replay_offline(self):
+        """Test - przebieg nagrany z sieci jest odtwarzany bez sieci i API."""
+        server, base_url = start_fake_site(
+            {
+                "/": "<html><body><p>Alfa buduje platformę.</p>"
+                '<a href="/o-nas">O nas</a></body></html>',
+                "/o-nas": "<html><body><p>Zespół ekspertów.</p></body></html>",
+            }
+        )
+        client = self._llm_client("## Broszura Alfa\n\nTresc broszury.")
+        recorder = Cassette(self.root, "record")
+        try:
+            with patch("sys.stdout", new_callable=StringIO):
+                recorded = process_site(
+                    base_url,
+                    RunOptions(
+                        api_key="k",
+                        quiet=True,
+                        session=recorder.session(),
+                        client=recorder.client(lambda: client),
+                    ),
+                    "nagranie",
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertTrue(recorded.ok)
+        self.assertEqual(len(os.listdir(os.path.join(self.root, "http"))), 4)
+
+        player = Cassette(self.root, "replay", latency=0)
+        factory = unittest.mock.MagicMock()
+        with patch("requests.get", side_effect=AssertionError("siec")):
+            with patch("sys.stdout", new_callable=StringIO):
+                replayed = process_site(
+                    base_url,
+                    RunOptions(
+                        api_key="k",
+                        quiet=True,
+                        session=player.session(),
+                        client=player.client(factory),
+                    ),
+                    "odtworzenie",
+                )
+
+        self.assertTrue(replayed.ok)
+        factory.assert_not_called()
+        self.assertEqual(client.chat.completions.create.call_count, 1)
+        self.assertEqual(replayed.usage["prompt_tokens"], 1200)
+        with open(replayed.output_path, encoding="utf-8") as f:
+            self.assertIn("Broszura Alfa", f.read())
+
+    def test_replay_miss_is_fetch_error(self):
+        """Test - brak nagrania jest zgłaszany jak błąd połączenia."""
+        os.makedirs(self.root)
+        player = Cassette(self.root, "replay")
+        before = METRICS.value("inwestor_cassette_misses_total", kind="http")
+
+        with patch("sys.stdout", new_callable=StringIO):
+            html = fetch_html("https://brak.pl", session=player.session())
+
+        self.assertIsNone(html)
+        self.assertEqual(
+            METRICS.value("inwestor_cassette_misses_total", kind="http"), before + 1
+        )
+        with self.assertRaises(ValueError):
+            Cassette(os.path.join(self.tmp_dir, "nie-ma"), "replay")
+
+    def test_replay_latency(self):
+        """Test - opóźnienie nagrane, stałe lub przekraczające timeout."""
+        import requests
+
+        key = self._record_entry(elapsed=0.8)
+        sleeps = []
+
+        recorded = Cassette(self.root, "replay", sleep=sleeps.append)
+        response = recorded.replay_http(key, "https://a.pl/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "text/html; charset=utf-8")
+        self.assertEqual(response.content.decode("utf-8"), "<p>Zażółć</p>")
+
+        Cassette(self.root, "replay", 0.25, sleep=sleeps.append).replay_http(
+            key, "https://a.pl/"
+        )
+        Cassette(self.root, "replay", 0, sleep=sleeps.append).replay_http(
+            key, "https://a.pl/"
+        )
+        self.assertEqual(sleeps, [0.8, 0.25])
+
+        with self.assertRaises(requests.exceptions.Timeout):
+            recorded.replay_http(key, "https://a.pl/", timeout=0.5)
+        self.assertEqual(sleeps[-1], 0.5)
+
+    def test_keys(self):
+        """Test - klucze ignorują znacznik czasu i rozróżniają żądania warunkowe."""
+        request = {
+            "model": "gpt-4o-mini",
+            "messages": [{"role": "user", "content": "DATA: 2025-01-01 10:00:00"}],
+        }
+        later = {
+            "model": "gpt-4o-mini",
+            "messages": [{"role": "user", "content": "DATA: 2026-10-19 23:59:59"}],
+        }
+        self.assertEqual(Cassette.llm_key(request), Cassette.llm_key(later))
+        self.assertNotEqual(
+            Cassette.llm_key(request), Cassette.llm_key(dict(request, max_tokens=10))
+        )
+        self.assertEqual(
+            Cassette.http_key("https://A.pl:443/"), Cassette.http_key("https://a.pl")
+        )
+        self.assertNotEqual(
+            Cassette.http_key("https://a.pl", {"If-None-Match": '"v1"'}),
+            Cassette.http_key("https://a.pl"),
+        )
+
+    def test_replay_does_not_need_api_key(self):
+        """Test - --replay nie wymaga klucza OPENAI_API_KEY."""
+        args = SimpleNamespace(replay=self.root, record=None)
+        with patch.dict(os.environ, {}, clear=True):
+            with patch("inwestor_pro.load_dotenv"):
+                self.assertEqual(load_cli_api_key(args), REPLAY_API_KEY)
+
+
+class TestLazyImports(unittest.TestCase):
+    """Testy szybkiego startu - ciężkie zależności ładowane leniwie."""
+
+    HEAVY_MODULES = ("openai", "requests", "bs4", "dotenv", "sqlite3")
+
+    def _loaded_after(self, code):
+        script = (
+            f"{code}\nimport sys\n"
+            f"print(','.join(m for m in {self.HEAVY_MODULES!r} if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ""
+
+    def test_import_does_not_load_heavy_modules(self):
+        """Test - sam import modułu nie ładuje openai, requests, bs4 ani dotenv."""
+        self.assertEqual(self._loaded_after("import inwestor_pro"), "")
+
+    def test_invalid_url_does_not_load_heavy_modules(self):
+        """Test - błąd walidacji URL jest zgłaszany bez importu zależności."""
+        code = (
+            "import sys, inwestor_pro\n"
+            "sys.argv = ['inwestor_pro.py', '--url', 'zly-url']\n"
+            "try:\n    inwestor_pro.main()\nexcept SystemExit:\n    pass"
+        )
+        self.assertEqual(self._loaded_after(code), "")
+
+    def test_heavy_modules_loaded_on_first_use(self):
+        """Test - zależności są importowane przy pierwszym użyciu."""
+        code = "import inwestor_pro\ninwestor_pro.clean_and_extract_text('<p>x</p>')"
+        self.assertEqual(self._loaded_after(code), "bs4")
+
+
 class TestFileOperations(unittest.TestCase):
     """Testy dla operacji na plikach."""
 
@@ -715,6 +3516,30 @@ def run_tests():
     suite.addTests(loader.loadTestsFromTestCase(TestWebScraping))
     suite.addTests(loader.loadTestsFromTestCase(TestAIFunctions))
     suite.addTests(loader.loadTestsFromTestCase(TestSubpageFunctionality))
+    suite.addTests(loader.loadTestsFromTestCase(TestBatchMode))
+    suite.addTests(loader.loadTestsFromTestCase(TestPipeline))
+    suite.addTests(loader.loadTestsFromTestCase(TestWorkQueue))
+    suite.addTests(loader.loadTestsFromTestCase(TestServiceMode))
+    suite.addTests(loader.loadTestsFromTestCase(TestLazyImports))
+    suite.addTests(loader.loadTestsFromTestCase(TestArtifactStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestProfiling))
+    suite.addTests(loader.loadTestsFromTestCase(TestUsageAccounting))
+    suite.addTests(loader.loadTestsFromTestCase(TestMemoryLimits))
+    suite.addTests(loader.loadTestsFromTestCase(TestTracing))
+    suite.addTests(loader.loadTestsFromTestCase(TestMetrics))
+    suite.addTests(loader.loadTestsFromTestCase(TestCharsetDetection))
+    suite.addTests(loader.loadTestsFromTestCase(TestPageRecord))
+    suite.addTests(loader.loadTestsFromTestCase(TestCorpusStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestFactExtraction))
+    suite.addTests(loader.loadTestsFromTestCase(TestPassageRanking))
+    suite.addTests(loader.loadTestsFromTestCase(TestLinkScoring))
+    suite.addTests(loader.loadTestsFromTestCase(TestContentBudget))
+    suite.addTests(loader.loadTestsFromTestCase(TestSiteDeadline))
+    suite.addTests(loader.loadTestsFromTestCase(TestHostConcurrencyLimiter))
+    suite.addTests(loader.loadTestsFromTestCase(TestSingleFlight))
+    suite.addTests(loader.loadTestsFromTestCase(TestWatchMode))
+    suite.addTests(loader.loadTestsFromTestCase(TestIncrementalBrochure))
+    suite.addTests(loader.loadTestsFromTestCase(TestCassette))
     suite.addTests(loader.loadTestsFromTestCase(TestFileOperations))
     suite.addTests(loader.loadTestsFromTestCase(TestIntegration))
 